@@ -1,5 +1,11 @@
 import frida
 import sys
+import os
+import json
+import hashlib
+import uuid
+import threading
+import time
 
 # 目標進程的包名
 
@@ -42,26 +48,610 @@ package_name = "天堂M助手+"
 #     }}); 
 #     """
 
-def create_main_monitor_script(session, c0391_class_name, socket_utils_method, use_item_method_name, auto_method_name, skill_use_method_name, target_method_name, attack_pickup_method_name, moveto_classname):
+def _app_dir():
+    """程式所在的目錄: pyinstaller 打包時為執行檔所在目錄，否則為本檔案所在目錄 (不受工作目錄影響)。"""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+# 已編譯腳本 (bytecode) 的快取目錄，鍵為 frida 版本 + 裝置執行環境 + 腳本原始碼 (已包含所有混淆名稱) 的雜湊
+SCRIPT_CACHE_DIR = os.path.join(_app_dir(), "script_cache")
+# 快取目錄最多保留的 bytecode 數量 (依最近使用時間)，多個執行環境不同的模擬器可同時保有各自的快取
+SCRIPT_CACHE_KEEP = 4
+
+def describe_runtime(device):
+    """
+    裝置端執行環境的識別字串 (作業系統版本、架構等)，作為 bytecode 快取鍵的一部分。
+    bytecode 由裝置上的 frida-server 編譯，不同的裝置環境不共用快取。
+    """
+    try:
+        return json.dumps(device.query_system_parameters(), sort_keys=True, ensure_ascii=False, default=str)
+    except Exception:
+        # 離線模擬 agent 等沒有 query_system_parameters 的裝置
+        return str(getattr(device, "name", ""))
+
+def create_cached_script(session, script_code, runtime_id=""):
+    """
+    以快取的 bytecode 建立腳本，省去每次連接時重新編譯 JavaScript。
+    快取不存在時以 session.compile_script 編譯後寫入；快取失效或編譯失敗時退回以原始碼建立。
+    runtime_id 為 describe_runtime(device) 的結果，裝置環境不同時使用不同的快取。
+    """
+    cache_key = hashlib.sha256(f"{frida.__version__}\n{runtime_id}\n{script_code}".encode("utf-8")).hexdigest()
+    cache_path = os.path.join(SCRIPT_CACHE_DIR, f"{cache_key}.bin")
+
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                script = session.create_script_from_bytes(f.read())
+            # 更新使用時間，清理快取時以此判斷新舊
+            os.utime(cache_path)
+            return script
+        except Exception:
+            # frida-server 版本不同等原因導致 bytecode 無法載入，刪除後重新編譯
+            try:
+                os.remove(cache_path)
+            except OSError:
+                pass
+
+    try:
+        bytecode = session.compile_script(script_code)
+    except Exception:
+        return session.create_script(script_code)
+
+    try:
+        os.makedirs(SCRIPT_CACHE_DIR, exist_ok=True)
+        # 多個模擬器可能同時連接，先寫入暫存檔再替換
+        tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(bytecode)
+        os.replace(tmp_path, cache_path)
+        prune_script_cache()
+    except OSError:
+        pass
+    return session.create_script_from_bytes(bytecode)
+
+def prune_script_cache(keep=None):
+    """只保留最近使用的 keep 個 bytecode 快取 (預設 SCRIPT_CACHE_KEEP)，其餘刪除。"""
+    keep = SCRIPT_CACHE_KEEP if keep is None else keep
+    entries = []
+    try:
+        for entry in os.scandir(SCRIPT_CACHE_DIR):
+            if entry.is_file() and entry.name.endswith(".bin"):
+                entries.append((entry.stat().st_mtime, entry.path))
+    except OSError:
+        return
+    entries.sort(reverse=True)
+    for _, path in entries[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            # 其他模擬器可能同時在清理
+            pass
+
+def create_main_monitor_script(session, c0391_class_name, socket_utils_method, use_item_method_name, auto_method_name, skill_use_method_name, target_method_name, attack_pickup_method_name, moveto_classname, runtime_id=""):
     """創建一個整合的、包含多個 RPC 功能的監控腳本。"""
     script_code = f"""
         var SocketUtils, C0391, GameHelper, Long;
+        var socketInfoMethod, useItemMethod, autoMethod, skillUseMethod, targetMethod, attackPickupMethod, movetoMethod;
         Java.perform(function() {{
             SocketUtils = Java.use("com.lineagem.botv3.util.SocketUtils");
             C0391 = Java.use(eval('"' + "{c0391_class_name}" + '"'));
             GameHelper = Java.use("com.lineagem.botv3.plugin.GameHelper");
             Long = Java.use("java.lang.Long");
+
+            // 載入時一次解析各混淆方法的 overload，之後每次呼叫不再做屬性查找與型別檢查
+            socketInfoMethod = resolveMethod(SocketUtils, "SocketUtils", "{socket_utils_method}", 2);
+            useItemMethod = resolveMethod(GameHelper, "GameHelper", "{use_item_method_name}", 1);
+            autoMethod = resolveMethod(GameHelper, "GameHelper", "{auto_method_name}", 1);
+            skillUseMethod = resolveMethod(GameHelper, "GameHelper", "{skill_use_method_name}", 2);
+            targetMethod = resolveMethod(GameHelper, "GameHelper", "{target_method_name}", 1);
+            attackPickupMethod = resolveMethod(GameHelper, "GameHelper", "{attack_pickup_method_name}", 0);
+            movetoMethod = resolveMethod(GameHelper, "GameHelper", "{moveto_classname}", 2);
         }});
 
+        // 依參數數量選出 overload 並綁定到類別 (靜態方法)；找不到時回傳呼叫即拋出錯誤的函式。
+        // 混淆後的方法常有多個參數數量相同的 overload (例如 (int,long) 與 (long,int))，
+        // 只以數量無法判斷該用哪一個，此時改用 Frida 的分派函式，每次呼叫依參數型別選擇 (與原本的呼叫方式相同)。
+        function resolveMethod(klass, className, methodName, argCount) {{
+            var method = methodName ? klass[methodName] : undefined;
+            if (method && method.overloads) {{
+                var overloads = method.overloads;
+                var matches = [];
+                for (var i = 0; i < overloads.length; i++) {{
+                    if (overloads[i].argumentTypes.length === argCount) {{
+                        matches.push(overloads[i]);
+                    }}
+                }}
+                if (matches.length === 1) {{
+                    return bindOverload(klass, matches[0], argCount);
+                }}
+                var signatures = matches.map(function(overload) {{
+                    return "(" + overload.argumentTypes.map(function(t) {{ return t.className; }}).join(",") + ")";
+                }});
+                send("[Error] " + className + "." + methodName + " 有 " + matches.length + " 個 " + argCount +
+                     " 參數的 overload " + signatures.join(" ") + "，改由 Frida 依參數型別選擇。");
+                return function() {{
+                    return klass[methodName].apply(klass, arguments);
+                }};
+            }}
+            var message = className + "." + methodName + " 不是一個函數！請檢查 Classname 設定。";
+            send("[Error] " + message);
+            return function() {{
+                throw new Error(message);
+            }};
+        }}
+
+        function bindOverload(klass, overload, argCount) {{
+            if (argCount === 0) {{
+                return function() {{ return overload.call(klass); }};
+            }}
+            if (argCount === 1) {{
+                return function(a) {{ return overload.call(klass, a); }};
+            }}
+            return function(a, b) {{ return overload.call(klass, a, b); }};
+        }}
+
+        function fetchInfo(code) {{
+            try {{
+                var instance = C0391.$new(parseInt(code));
+                var result = socketInfoMethod(6444, instance);
+                return result;
+            }} catch (e) {{
+                return e.message;
+            }}
+        }}
+
+        // objectKey / itemKey 等 long 可能超過 JS 安全整數範圍:
+        // 解析前先把 16 位數以上的整數轉成字串，序列化時再還原成數字，避免精度遺失
+        function safeParse(raw) {{
+            return JSON.parse(raw.replace(/([:\\[,]\\s*)(-?\\d{{16,}})(?=\\s*[,\\]\\}}])/g, '$1"$2"'));
+        }}
+
+        function safeStringify(value) {{
+            return JSON.stringify(value).replace(/"(-?\\d{{16,}})"/g, '$1');
+        }}
+
+        // 依 options 過濾 data 陣列: types 為允許的物件類型，fields 為保留的欄位白名單
+        function project(parsed, options) {{
+            var list = parsed.data;
+            if (!options || !(list instanceof Array)) {{
+                return parsed;
+            }}
+            var types = options.types || null;
+            var fields = options.fields || null;
+            var out = [];
+            for (var i = 0; i < list.length; i++) {{
+                var obj = list[i];
+                if (types && types.indexOf(obj.type) < 0) {{
+                    continue;
+                }}
+                if (fields) {{
+                    var picked = {{}};
+                    for (var j = 0; j < fields.length; j++) {{
+                        if (fields[j] in obj) {{
+                            picked[fields[j]] = obj[fields[j]];
+                        }}
+                    }}
+                    obj = picked;
+                }}
+                out.push(obj);
+            }}
+            parsed.data = out;
+            return parsed;
+        }}
+
+        function queryInfo(code, options) {{
+            var raw = fetchInfo(code);
+            if (!options) {{
+                return raw;
+            }}
+            try {{
+                return safeStringify(project(safeParse(raw), options));
+            }} catch (e) {{
+                return raw;
+            }}
+        }}
+
+        // 指令 203 的增量快照: 每個頻道保留上一次的物件列表 (objectKey -> 序列化內容)
+        var worldChannels = {{}};
+
+        function worldDelta(channel, sinceSeq, options) {{
+            var raw = fetchInfo(203);
+            var parsed;
+            try {{
+                parsed = safeParse(raw);
+            }} catch (e) {{
+                return {{ status: "error", message: String(raw) }};
+            }}
+            if (parsed.status !== "success") {{
+                return parsed;
+            }}
+            parsed = project(parsed, options);
+
+            var list = parsed.data || [];
+            var state = worldChannels[channel];
+            var current = {{}};
+            var added = [], changed = [], removed = [];
+            var i, obj, key, sig;
+
+            for (i = 0; i < list.length; i++) {{
+                obj = list[i];
+                if (obj.objectKey === undefined || obj.objectKey === null) {{
+                    // 無法以 objectKey 追蹤，本次改回傳完整快照
+                    delete worldChannels[channel];
+                    return {{ status: "success", seq: -1, full: true, data: list }};
+                }}
+                key = String(obj.objectKey);
+                sig = JSON.stringify(obj);
+                current[key] = sig;
+                if (state) {{
+                    if (!(key in state.objects)) {{
+                        added.push(obj);
+                    }} else if (state.objects[key] !== sig) {{
+                        changed.push(obj);
+                    }}
+                }}
+            }}
+
+            if (!state) {{
+                worldChannels[channel] = {{ seq: 1, objects: current }};
+                return {{ status: "success", seq: 1, full: true, data: list }};
+            }}
+
+            for (key in state.objects) {{
+                if (!(key in current)) {{
+                    removed.push(key);
+                }}
+            }}
+
+            var baseSeq = state.seq;
+            if (added.length || changed.length || removed.length) {{
+                state.seq = baseSeq + 1;
+            }}
+            state.objects = current;
+
+            if (parseInt(sinceSeq) !== baseSeq) {{
+                // 客戶端與 agent 的序號不同步，回傳完整快照讓客戶端重建
+                return {{ status: "success", seq: state.seq, full: true, data: list }};
+            }}
+            return {{ status: "success", seq: state.seq, full: false, added: added, changed: changed, removed: removed }};
+        }}
+
+        // 二進位打包 (little-endian，欄位順序需與 Python 端 world_state.decode_packed_world 一致):
+        //   int32 x4 表頭       : 版本, 物件數 n, buff 總數 m, 名稱表位元組數
+        //   int64 x4 欄 (各 n)  : objectKey, playerID, earthObjectID, attackID
+        //   int32 x7 欄 (各 n)  : type, x, y, curHP, maxHP, 名稱索引, buff 數
+        //   int32 x2 (各 m)     : buff 的 skillID, remainTime (依物件順序排列)
+        //   uint8 (n)           : attackMe
+        //   名稱表              : 不重複的名稱以 UTF-8 編碼、\\0 分隔
+        // 缺少的欄位以該型別的最小值表示
+        var PACK_MISSING_32 = -2147483648;
+        var packMissing64 = null; // 第一次打包時才建立，沒有 BigInt 的執行環境 (如 Duktape) 載入腳本時不會出錯
+
+        function packSupported() {{
+            return typeof BigInt === "function" && typeof BigInt64Array === "function";
+        }}
+
+        function packInt32(value) {{
+            if (value === undefined || value === null || value === "") {{
+                return PACK_MISSING_32;
+            }}
+            return Number(value) | 0;
+        }}
+
+        function packInt64(value) {{
+            if (value === undefined || value === null || value === "") {{
+                return packMissing64;
+            }}
+            try {{
+                return BigInt(String(value));
+            }} catch (e) {{
+                return packMissing64;
+            }}
+        }}
+
+        function packWorld(list) {{
+            if (packMissing64 === null) {{
+                packMissing64 = BigInt("-9223372036854775808");
+            }}
+            var count = list.length;
+            var nameIndex = {{}}, names = [], buffTotal = 0;
+            var i, j, obj, buffList;
+
+            for (i = 0; i < count; i++) {{
+                obj = list[i];
+                if (typeof obj.name === "string" && !(obj.name in nameIndex)) {{
+                    nameIndex[obj.name] = names.length;
+                    names.push(obj.name);
+                }}
+                if (obj.buff instanceof Array) {{
+                    buffTotal += obj.buff.length;
+                }}
+            }}
+            // 每個字元為一個 UTF-8 位元組
+            var nameRaw = unescape(encodeURIComponent(names.join("\\u0000")));
+
+            var offset64 = 16;
+            var offset32 = offset64 + 32 * count;
+            var offsetBuff = offset32 + 28 * count;
+            var offsetFlag = offsetBuff + 8 * buffTotal;
+            var offsetName = offsetFlag + count;
+            var buffer = new ArrayBuffer(offsetName + nameRaw.length);
+
+            new Int32Array(buffer, 0, 4).set([1, count, buffTotal, nameRaw.length]);
+            var cols64 = new BigInt64Array(buffer, offset64, 4 * count);
+            var cols32 = new Int32Array(buffer, offset32, 7 * count);
+            var buffs = new Int32Array(buffer, offsetBuff, 2 * buffTotal);
+            var flags = new Uint8Array(buffer, offsetFlag, count);
+            var nameBytes = new Uint8Array(buffer, offsetName, nameRaw.length);
+
+            var b = 0;
+            for (i = 0; i < count; i++) {{
+                obj = list[i];
+                cols64[i] = packInt64(obj.objectKey);
+                cols64[count + i] = packInt64(obj.playerID);
+                cols64[2 * count + i] = packInt64(obj.earthObjectID);
+                cols64[3 * count + i] = packInt64(obj.attackID);
+                cols32[i] = packInt32(obj.type);
+                cols32[count + i] = packInt32(obj.x);
+                cols32[2 * count + i] = packInt32(obj.y);
+                cols32[3 * count + i] = packInt32(obj.curHP);
+                cols32[4 * count + i] = packInt32(obj.maxHP);
+                cols32[5 * count + i] = (typeof obj.name === "string") ? nameIndex[obj.name] : -1;
+                buffList = (obj.buff instanceof Array) ? obj.buff : [];
+                cols32[6 * count + i] = buffList.length;
+                for (j = 0; j < buffList.length; j++) {{
+                    buffs[b++] = packInt32(buffList[j].skillID);
+                    buffs[b++] = packInt32(buffList[j].remainTime);
+                }}
+                flags[i] = obj.attackMe ? 1 : 0;
+            }}
+            for (i = 0; i < nameRaw.length; i++) {{
+                nameBytes[i] = nameRaw.charCodeAt(i);
+            }}
+            return buffer;
+        }}
+
+        // 名稱比對器 (與 target_matcher.py 相同): 完全相同的名稱放入 exact，以 * 結尾的前綴放入前綴樹
+        // 查詢一個名稱只需一次查表加上沿名稱逐字走訪前綴樹；相同的清單只編譯一次 (以清單內容為鍵快取)
+        var matcherCache = Object.create(null);
+        var matcherCacheSize = 0;
+
+        function newTrieNode() {{
+            return {{ children: Object.create(null), level: -1 }};
+        }}
+
+        // levels: 每一項為一個優先級的名稱陣列 (索引越小越優先)
+        function compileMatcher(levels) {{
+            var matcher = {{ levels: levels, exact: Object.create(null), trie: newTrieNode(), empty: true }};
+            for (var level = 0; level < levels.length; level++) {{
+                for (var i = 0; i < levels[level].length; i++) {{
+                    var pattern = levels[level][i];
+                    matcher.empty = false;
+                    if (pattern.charAt(pattern.length - 1) === "*") {{
+                        var node = matcher.trie;
+                        for (var k = 0; k < pattern.length - 1; k++) {{
+                            var ch = pattern.charAt(k);
+                            node = node.children[ch] || (node.children[ch] = newTrieNode());
+                        }}
+                        if (node.level < 0) {{
+                            node.level = level;
+                        }}
+                    }} else if (!(pattern in matcher.exact)) {{
+                        matcher.exact[pattern] = level;
+                    }}
+                }}
+            }}
+            return matcher;
+        }}
+
+        function cachedMatcher(key, build) {{
+            var matcher = matcherCache[key];
+            if (!matcher) {{
+                if (matcherCacheSize >= 64) {{
+                    matcherCache = Object.create(null);
+                    matcherCacheSize = 0;
+                }}
+                matcher = matcherCache[key] = build();
+                matcherCacheSize++;
+            }}
+            return matcher;
+        }}
+
+        // 單一優先級的名稱清單，每一項為一個名稱
+        function patternMatcher(patterns) {{
+            return cachedMatcher("p\\n" + patterns.join("\\n"), function() {{
+                return compileMatcher([patterns]);
+            }});
+        }}
+
+        // 指定目標的清單: 每一項為一個優先級，可用 | 分隔同級的多個名稱
+        function linesMatcher(lines) {{
+            return cachedMatcher("l\\n" + lines.join("\\n"), function() {{
+                var levels = [];
+                for (var i = 0; i < lines.length; i++) {{
+                    var patterns = [];
+                    var parts = String(lines[i]).split("|");
+                    for (var j = 0; j < parts.length; j++) {{
+                        var part = parts[j].trim();
+                        if (part) {{
+                            patterns.push(part);
+                        }}
+                    }}
+                    if (patterns.length) {{
+                        levels.push(patterns);
+                    }}
+                }}
+                return compileMatcher(levels);
+            }});
+        }}
+
+        // name 符合的最優先級，不符合回傳 -1
+        function matchLevel(matcher, name) {{
+            if (typeof name !== "string") {{
+                return -1;
+            }}
+            var best = (name in matcher.exact) ? matcher.exact[name] : -1;
+            var node = matcher.trie;
+            for (var k = 0; node; k++) {{
+                if (node.level >= 0 && (best < 0 || node.level < best)) {{
+                    best = node.level;
+                }}
+                if (k >= name.length) {{
+                    break;
+                }}
+                node = node.children[name.charAt(k)];
+            }}
+            return best;
+        }}
+
+        function playerPosition() {{
+            var info = safeParse(fetchInfo(201));
+            var data = (info.data && typeof info.data === "object") ? info.data : info;
+            return {{ x: data.x, y: data.y }};
+        }}
+
+        // 依優先順序挑選最近的目標 (與 gui.py 指定最近目標的規則相同)
+        // lines: 每一項為一個優先級，可用 | 分隔同級的多個名稱，名稱以 * 結尾表示前綴比對
+        // usePriority 為 false 時所有優先級合併，直接取全部符合者中最近的一個
+        function selectNearestObject(lines, options) {{
+            var types = options.types || [2, 6, 3];
+            var maxRange = options.maxRange || 0;
+            var pos = playerPosition();
+            if (pos.x === undefined || pos.y === undefined) {{
+                return {{ status: "error", message: "在指令 201 的回傳中找不到玩家座標" }};
+            }}
+            var world = safeParse(fetchInfo(203));
+            if (world.status !== "success") {{
+                return {{ status: "error", message: "獲取周圍物件失敗" }};
+            }}
+            var list = world.data || [];
+            var matcher = linesMatcher(lines);
+            // 未啟用優先級且清單為空時全部符合 (與原本合併成單一空白清單的行為相同)
+            var matchAll = !options.usePriority && matcher.empty;
+
+            // 一次走訪所有物件，各優先級分別保留最近的一個 (未啟用優先級時全部視為同一級)
+            var nearest = [];
+            for (var k = 0; k < list.length; k++) {{
+                var obj = list[k];
+                if (types.indexOf(obj.type) < 0) {{
+                    continue;
+                }}
+                var matched = matchAll ? -1 : matchLevel(matcher, obj.name);
+                if (!matchAll && matched < 0) {{
+                    continue;
+                }}
+                var level = options.usePriority ? matched : 0;
+                // 缺少座標時視為與玩家同位置 (與原本 Python 端的 m.get("x", px) 相同)
+                var dx = (obj.x === undefined ? pos.x : obj.x) - pos.x;
+                var dy = (obj.y === undefined ? pos.y : obj.y) - pos.y;
+                var dist = Math.sqrt(dx * dx + dy * dy);
+                if (maxRange > 0 && dist > maxRange) {{
+                    continue;
+                }}
+                if (!nearest[level] || dist < nearest[level].dist) {{
+                    nearest[level] = {{ obj: obj, dist: dist, matched: matched }};
+                }}
+            }}
+            for (var lv = 0; lv < nearest.length; lv++) {{
+                if (nearest[lv]) {{
+                    var best = nearest[lv].obj;
+                    // pattern: 目標符合的那一級名稱 (以 | 連接，已去除空白的行)，清單為空時為 ""
+                    var pattern = nearest[lv].matched >= 0 ? matcher.levels[nearest[lv].matched].join("|") : "";
+                    return {{ status: "success", objectKey: best.objectKey, name: best.name, type: best.type, distance: nearest[lv].dist, level: lv, pattern: pattern }};
+                }}
+            }}
+            return {{ status: "not_found" }};
+        }}
+
+        // 主動推送模式: 在遊戲進程內定時查詢，以 send() 推送快照，Python 端不必每個迴圈各自輪詢
+        var worldStream = null;
+
+        function stopWorldStream() {{
+            if (worldStream) {{
+                clearInterval(worldStream.timer);
+                worldStream = null;
+            }}
+        }}
+
         rpc.exports = {{
-            getInfo: function(code) {{
-                try {{
-                    var instance = C0391.$new(parseInt(code));
-                    var result = SocketUtils["{socket_utils_method}"](6444, instance);
-                    return result;
-                }} catch (e) {{
-                    return e.message;
+            // options (可省略): {{ types: [6, 2], fields: ["objectKey", "name", "x", "y"] }}
+            getInfo: function(code, options) {{
+                return queryInfo(code, options);
+            }},
+
+            // 一次 RPC 取回多個指令結果，回傳陣列順序與 codes 相同
+            // codes 的每一項可以是指令代碼，或 [指令代碼, options]
+            getInfoBatch: function(codes) {{
+                var results = [];
+                for (var i = 0; i < codes.length; i++) {{
+                    var entry = codes[i];
+                    if (entry instanceof Array) {{
+                        results.push(queryInfo(entry[0], entry[1]));
+                    }} else {{
+                        results.push(fetchInfo(entry));
+                    }}
+                }}
+                return results;
+            }},
+
+            // 指令 203 的增量快照 (以 objectKey 比對 新增/變更/移除)，extraCodes 的結果一併放在 extra 回傳
+            // options 與 getInfo 相同，同一個 channel 應固定使用同一組 options
+            getWorldDelta: function(channel, sinceSeq, extraCodes, options) {{
+                var extra = [];
+                if (extraCodes) {{
+                    for (var i = 0; i < extraCodes.length; i++) {{
+                        extra.push(fetchInfo(extraCodes[i]));
+                    }}
                 }}
+                var result = worldDelta(String(channel), sinceSeq, options);
+                result.extra = extra;
+                return safeStringify(result);
+            }},
+
+            // 每 intervalMs 查詢一次 203 與 extraCodes，推送 {{ type: "world", seq, world, extra }}
+            // world / extra 為 get_info 的原始字串，由 Python 端解析
+            // encoding 為 "packed" 時，203 改以二進位打包放在 send 的 data，payload 的 world 為 null
+            // 執行環境沒有 BigInt 時無法打包，改用 JSON 推送
+            startWorldStream: function(intervalMs, extraCodes, options, encoding) {{
+                stopWorldStream();
+                var codes = extraCodes || [];
+                var packed = (encoding === "packed") && packSupported();
+                var stream = {{ seq: 0, timer: null }};
+                stream.timer = setInterval(function() {{
+                    Java.perform(function() {{
+                        var extra = [];
+                        for (var i = 0; i < codes.length; i++) {{
+                            extra.push(fetchInfo(codes[i]));
+                        }}
+                        stream.seq += 1;
+                        if (packed) {{
+                            var raw = fetchInfo(203);
+                            var parsed = null;
+                            try {{
+                                parsed = safeParse(raw);
+                            }} catch (e) {{
+                                parsed = null;
+                            }}
+                            if (parsed && parsed.status === "success" && parsed.data instanceof Array) {{
+                                parsed = project(parsed, options);
+                                send({{ type: "world", seq: stream.seq, encoding: "packed", world: null, extra: extra }}, packWorld(parsed.data));
+                                return;
+                            }}
+                            // 失敗時改送原始字串，由 Python 端照一般流程處理
+                            send({{ type: "world", seq: stream.seq, world: raw, extra: extra }});
+                            return;
+                        }}
+                        send({{ type: "world", seq: stream.seq, world: queryInfo(203, options), extra: extra }});
+                    }});
+                }}, Math.max(parseInt(intervalMs) || 200, 50));
+                worldStream = stream;
+                return true;
+            }},
+
+            stopWorldStream: function() {{
+                stopWorldStream();
+                return true;
             }},
 
             useItem: function(itemKey) {{
@@ -69,7 +659,7 @@ def create_main_monitor_script(session, c0391_class_name, socket_utils_method, u
                     send('[RPC] useItem 正在執行，Key: ' + itemKey);
                     try {{
                         var key = Long.parseLong(itemKey.toString());
-                        var result = GameHelper["{use_item_method_name}"](key);
+                        var result = useItemMethod(key);
                         send('[RPC] GameHelper["{use_item_method_name}"] 回傳: ' + result);
                         resolve(result);
                     }} catch (e) {{
@@ -83,7 +673,7 @@ def create_main_monitor_script(session, c0391_class_name, socket_utils_method, u
                 return new Promise(function(resolve, reject) {{
                     send('[RPC] toggleAuto 正在執行，enable: ' + enable);
                     try {{
-                        var result = GameHelper["{auto_method_name}"](enable);
+                        var result = autoMethod(enable);
                         send('[RPC] GameHelper["{auto_method_name}"] 回傳: ' + result);
                         resolve(result);
                     }} catch (e) {{
@@ -98,7 +688,7 @@ def create_main_monitor_script(session, c0391_class_name, socket_utils_method, u
                     send('[RPC] useSkill 正在執行，skillId: ' + skillId + ', targetKey: ' + targetKey);
                     try {{
                         var key = Long.parseLong(targetKey.toString());
-                        var result = GameHelper["{skill_use_method_name}"](skillId, key);
+                        var result = skillUseMethod(skillId, key);
                         send('[RPC] GameHelper["{skill_use_method_name}"] 回傳: ' + result);
                         resolve(result);
                     }} catch (e) {{
@@ -113,7 +703,7 @@ def create_main_monitor_script(session, c0391_class_name, socket_utils_method, u
                     send('[RPC] setTarget 正在執行，objectKey: ' + objectKey);
                     try {{
                         var key = Long.parseLong(objectKey.toString());
-                        var result = GameHelper["{target_method_name}"](key);
+                        var result = targetMethod(key);
                         send('[RPC] GameHelper["{target_method_name}"] 回傳: ' + result);
                         resolve(result);
                     }} catch (e) {{
@@ -127,7 +717,7 @@ def create_main_monitor_script(session, c0391_class_name, socket_utils_method, u
                 return new Promise(function(resolve, reject) {{
                     send('[RPC] attackPickup 正在執行');
                     try {{
-                        var result = GameHelper["{attack_pickup_method_name}"]();
+                        var result = attackPickupMethod();
                         send('[RPC] GameHelper["{attack_pickup_method_name}"] 回傳: ' + result);
                         resolve(result);
                     }} catch (e) {{
@@ -137,17 +727,112 @@ def create_main_monitor_script(session, c0391_class_name, socket_utils_method, u
                 }});
             }},
 
-            moveto: function(x, y) {{
+            // 組合動作: 在遊戲進程內連續執行，省去第二次 RPC，也避免兩次呼叫之間目標被切換
+            targetAndAttack: function(objectKey) {{
                 return new Promise(function(resolve, reject) {{
-                    // send('[RPC] moveto 正在執行: ' + x + ', ' + y); // Optional logging
+                    send('[RPC] targetAndAttack 正在執行，objectKey: ' + objectKey);
                     try {{
-                        // 檢查方法是否存在
-                        if (typeof GameHelper["{moveto_classname}"] !== 'function') {{
-                            send("[Error] GameHelper.{moveto_classname} 不是一個函數！請檢查 Classname 設定。");
-                            reject("Method not found");
+                        var key = Long.parseLong(objectKey.toString());
+                        targetMethod(key);
+                        var result = attackPickupMethod();
+                        send('[RPC] targetAndAttack 回傳: ' + result);
+                        resolve(result);
+                    }} catch (e) {{
+                        send('[RPC] targetAndAttack 發生錯誤: ' + e.message);
+                        reject(e.message);
+                    }}
+                }});
+            }},
+
+            targetAndSkill: function(objectKey, skillId) {{
+                return new Promise(function(resolve, reject) {{
+                    send('[RPC] targetAndSkill 正在執行，objectKey: ' + objectKey + ', skillId: ' + skillId);
+                    try {{
+                        var key = Long.parseLong(objectKey.toString());
+                        targetMethod(key);
+                        var result = skillUseMethod(skillId, key);
+                        send('[RPC] targetAndSkill 回傳: ' + result);
+                        resolve(result);
+                    }} catch (e) {{
+                        send('[RPC] targetAndSkill 發生錯誤: ' + e.message);
+                        reject(e.message);
+                    }}
+                }});
+            }},
+
+            // 撿取最近且名稱符合 patterns 的掉落物 (type 3)，maxRange <= 0 表示不限距離
+            // 回傳 JSON 字串: {{ status: "success", objectKey, name, distance }} 或 {{ status: "not_found" }}
+            pickupNearest: function(patterns, maxRange) {{
+                return new Promise(function(resolve, reject) {{
+                    try {{
+                        var pos = playerPosition();
+                        var world = safeParse(fetchInfo(203));
+                        var list = (world.status === "success" && world.data instanceof Array) ? world.data : [];
+                        var best = null, bestDist = Infinity;
+                        // patterns 為空時全部符合
+                        var matcher = (patterns && patterns.length) ? patternMatcher(patterns) : null;
+                        for (var i = 0; i < list.length; i++) {{
+                            var obj = list[i];
+                            if (obj.type !== 3 || (matcher && matchLevel(matcher, obj.name) < 0)) {{
+                                continue;
+                            }}
+                            var dist = Infinity;
+                            if (obj.x !== undefined && obj.y !== undefined && pos.x !== undefined && pos.y !== undefined) {{
+                                dist = Math.sqrt(Math.pow(obj.x - pos.x, 2) + Math.pow(obj.y - pos.y, 2));
+                                if (maxRange > 0 && dist > maxRange) {{
+                                    continue;
+                                }}
+                            }}
+                            // 沒有座標的掉落物視為可撿取，但排在有座標的之後
+                            if (best === null || dist < bestDist) {{
+                                best = obj;
+                                bestDist = dist;
+                            }}
+                        }}
+                        if (best === null) {{
+                            resolve(JSON.stringify({{ status: "not_found" }}));
                             return;
                         }}
-                        var result = GameHelper["{moveto_classname}"](x, y);
+                        send('[RPC] pickupNearest 撿取: ' + best.name);
+                        var key = Long.parseLong(best.objectKey.toString());
+                        targetMethod(key);
+                        attackPickupMethod();
+                        resolve(safeStringify({{ status: "success", objectKey: best.objectKey, name: best.name, distance: (bestDist === Infinity ? -1 : bestDist) }}));
+                    }} catch (e) {{
+                        send('[RPC] pickupNearest 發生錯誤: ' + e.message);
+                        reject(e.message);
+                    }}
+                }});
+            }},
+
+            // 在 agent 端挑選最近的目標，只回傳結果，不必把整個 203 列表傳回 Python
+            // options: {{ usePriority: bool, types: [2, 6, 3], maxRange: 0, action: "none" | "target" | "attack" }}
+            // 回傳 JSON 字串: {{ status: "success", objectKey, name, type, distance, level }}、{{ status: "not_found" }} 或 error
+            selectNearest: function(lines, options) {{
+                return new Promise(function(resolve, reject) {{
+                    try {{
+                        var opts = options || {{}};
+                        var result = selectNearestObject(lines || [], opts);
+                        if (result.status === "success" && opts.action && opts.action !== "none") {{
+                            var key = Long.parseLong(result.objectKey.toString());
+                            targetMethod(key);
+                            if (opts.action === "attack") {{
+                                attackPickupMethod();
+                            }}
+                        }}
+                        resolve(safeStringify(result));
+                    }} catch (e) {{
+                        send('[RPC] selectNearest 發生錯誤: ' + e.message);
+                        reject(e.message);
+                    }}
+                }});
+            }},
+
+            moveto: function(x, y) {{
+                return new Promise(function(resolve, reject) {{
+                    // send('[RPC] moveto 正在執行: ' + x + ', ' + y); // Optional logging
+                    try {{
+                        var result = movetoMethod(x, y);
                         // send('[RPC] GameHelper["{moveto_classname}"] 回傳: ' + result);
                         resolve(result);
                     }} catch (e) {{
@@ -158,8 +843,7 @@ def create_main_monitor_script(session, c0391_class_name, socket_utils_method, u
             }}
         }};
     """
-    script = session.create_script(script_code)
-    return script
+    return create_cached_script(session, script_code, runtime_id)
 
 # [已棄用] 請改用 RPC 模式 (create_main_monitor_script) 以避免記憶體洩漏
 # # Frida 腳本
@@ -232,20 +916,109 @@ def create_main_monitor_script(session, c0391_class_name, socket_utils_method, u
 #     script = session.create_script(script_code)
 #     return script
 
-def get_pid_by_package(package_name, port, logger=print):
-    """根據 Android 包名尋找並返回進程 ID 和裝置物件。"""
-    try:
-        device = None
-        manager = frida.get_device_manager()
-        device = manager.add_remote_device(f"127.0.0.1:{port}")
+class DeviceRegistry:
+    """
+    DeviceRegistry 類別 - 以 port 為鍵保存遠端 frida 裝置
 
-        processes = device.enumerate_processes()
+    重複連接同一個模擬器時沿用已加入的裝置物件，不再每次 add_remote_device；
+    裝置的執行環境識別字串 (describe_runtime) 也隨裝置物件保存，重新連接時不再查詢；
+    找到的 PID 會快取 pid_ttl 秒，快取期間只以 enumerate_processes(pids=[pid]) 確認該進程仍存在，
+    不必列舉裝置上的所有進程。
+    """
+
+    def __init__(self, pid_ttl=30.0):
+        self.pid_ttl = pid_ttl
+        self.devices = {}
+        self.pids = {}
+        self.runtimes = {}
+        self.lock = threading.Lock()
+
+    def get_device(self, port):
+        port = str(port)
+        with self.lock:
+            device = self.devices.get(port)
+            if device is None:
+                device = frida.get_device_manager().add_remote_device(f"127.0.0.1:{port}")
+                self.devices[port] = device
+            return device
+
+    def forget(self, port):
+        """移除裝置與 PID 快取 (frida-server 重啟或裝置失效時)。"""
+        port = str(port)
+        with self.lock:
+            self.devices.pop(port, None)
+            self.runtimes.pop(port, None)
+            for key in [k for k in self.pids if k[0] == port]:
+                del self.pids[key]
+        try:
+            frida.get_device_manager().remove_remote_device(f"127.0.0.1:{port}")
+        except Exception:
+            pass
+
+    def runtime_id(self, port, device):
+        """回傳裝置的 describe_runtime，同一個裝置物件只查詢一次。"""
+        port = str(port)
+        with self.lock:
+            cached = self.runtimes.get(port)
+        if cached is not None and cached[0] is device:
+            return cached[1]
+        runtime_id = describe_runtime(device)
+        with self.lock:
+            self.runtimes[port] = (device, runtime_id)
+        return runtime_id
+
+    def _cached_pid(self, device, key):
+        with self.lock:
+            cached = self.pids.get(key)
+        if not cached or time.time() - cached[0] > self.pid_ttl:
+            return None
+        try:
+            processes = device.enumerate_processes(pids=[cached[1]])
+        except TypeError:
+            # 舊版 frida 不支援 pids 參數
+            return None
         for process in processes:
-            if process.name.lower() == package_name.lower():
-                logger(f"找到進程 '{package_name}'，PID 為: {process.pid}")
-                return process.pid, device
+            if process.pid == cached[1] and process.name.lower() == key[1]:
+                return process.pid
+        return None
+
+    def find_pid(self, port, package_name):
+        """回傳 (pid, device)，找不到進程時 pid 為 None。"""
+        key = (str(port), package_name.lower())
+        for attempt in range(2):
+            device = self.get_device(port)
+            try:
+                pid = self._cached_pid(device, key)
+                if pid is None:
+                    for process in device.enumerate_processes():
+                        if process.name.lower() == key[1]:
+                            pid = process.pid
+                            break
+            except (frida.InvalidOperationError, frida.ServerNotRunningError, frida.TransportError):
+                # 裝置物件已失效，重新加入一次
+                self.forget(port)
+                if attempt:
+                    raise
+                continue
+            with self.lock:
+                if pid is None:
+                    self.pids.pop(key, None)
+                else:
+                    self.pids[key] = (time.time(), pid)
+            return pid, device
+        return None, None
+
+device_registry = DeviceRegistry()
+
+def get_pid_by_package(package_name, port, logger=print):
+    """根據 Android 包名尋找並返回進程 ID 和裝置物件 (透過 device_registry 沿用裝置與 PID 快取)。"""
+    try:
+        pid, device = device_registry.find_pid(port, package_name)
+        if pid:
+            logger(f"找到進程 '{package_name}'，PID 為: {pid}")
+            return pid, device
 
-        logger(f"在裝置 {device.name} 上未找到包名為 '{package_name}' 的進程。")
+        logger(f"在裝置 {device.name if device else port} 上未找到包名為 '{package_name}' 的進程。")
         return None, None
     except Exception as e:
         logger(f"獲取 PID 時發生錯誤: {e}")
@@ -0,0 +1,169 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+from rpc_client import ACTION_METHODS, SINGLE_FLIGHT_METHODS, RpcTimeoutError
+
+
+class AsyncRpcClient:
+    """
+    AsyncRpcClient 類別 - RpcClient 的非同步版本，以 script.exports_async 呼叫 agent
+
+    等待 agent 回應時不佔用任何執行緒: exports_async 的呼叫由 Frida 在回應到達時喚醒協程，
+    每次呼叫以 asyncio.wait_for 加上期限，逾時拋出 RpcTimeoutError (與 RpcClient 相同)。
+
+    與同一實例的 RpcClient (client) 共用狀態，同步與非同步的呼叫端行為一致:
+    - SINGLE_FLIGHT_METHODS 的查詢在事件迴圈內合併 (相同參數的協程共用同一次 RPC)
+    - ACTION_METHODS 交給 client.actions (ActionQueue)，與其他執行緒的動作依同一個順序、限速與合併規則排隊；
+      輪到時佇列的執行緒把呼叫交回事件迴圈以 exports_async 送出 (不使用共用的執行緒池)，
+      協程以 asyncio.wrap_future 等待結果；emergency 不排隊，直接送出
+    - 執行中的呼叫登記在 client.pending，由共用的看門狗判斷 agent 是否無回應
+    - client.close() 後不再接受呼叫
+
+    參數:
+    client: RpcClient        同一實例的同步介面
+    exports: script.exports_async (錄製時為 CaptureRecorder.async_exports 的結果)
+    """
+
+    def __init__(self, client, exports):
+        self._client = client
+        self._exports = exports
+        self.inflight = {} # 合併中的查詢: (method_name, repr(args)) -> asyncio.Task
+
+    def __getattr__(self, method_name):
+        if method_name.startswith("_"):
+            raise AttributeError(method_name)
+
+        async def call(*args, **kwargs):
+            return await self.call(method_name, *args, **kwargs)
+
+        return call
+
+    async def call(self, method_name, *args, timeout=None, lane=None):
+        client = self._client
+        if client.closed.is_set():
+            raise RuntimeError("RPC 連線已關閉")
+        deadline = timeout or client.timeout
+        if method_name in ACTION_METHODS:
+            lane = lane or "normal"
+            if lane != "emergency":
+                return await self._call_queued(method_name, args, lane, deadline)
+            if client.limiter is not None:
+                # emergency 不等待額度 (見 ActionRateLimiter)
+                client.limiter.try_acquire(lane)
+        if method_name not in SINGLE_FLIGHT_METHODS:
+            return await self._invoke_with_deadline(method_name, args, deadline)
+
+        key = (method_name, repr(args))
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._invoke(method_name, args))
+            self.inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        try:
+            # shield: 單一呼叫端逾時不取消其他呼叫端仍在等待的查詢
+            result = await asyncio.wait_for(asyncio.shield(task), deadline)
+        except asyncio.TimeoutError:
+            raise RpcTimeoutError(f"RPC 呼叫 {method_name} 逾時 ({deadline} 秒)") from None
+        # get_info_batch 的 list 由多個呼叫端共用，各自取得一份複本
+        return list(result) if isinstance(result, list) else result
+
+    def _forget(self, key, task):
+        # 完成後移除，之後的呼叫會發出新的 RPC；所有呼叫端都已逾時時也取出例外，避免未處理的警告
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+    async def _call_queued(self, method_name, args, lane, deadline):
+        loop = asyncio.get_running_loop()
+
+        def run(method_name, args, timeout):
+            # 在 ActionQueue 的執行緒呼叫: 等待事件迴圈送出，佇列中的下一個動作在此之後才送出
+            timeout = timeout or self._client.timeout
+            future = asyncio.run_coroutine_threadsafe(self._invoke_with_deadline(method_name, args, timeout), loop)
+            try:
+                return future.result(timeout + 1)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                raise RpcTimeoutError(f"RPC 呼叫 {method_name} 逾時 ({timeout} 秒)") from None
+
+        future = self._client.actions.submit(method_name, args, lane, timeout=deadline, run=run)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), deadline)
+        except asyncio.TimeoutError:
+            future.cancel() # 尚未送出就不再送出，避免過時的動作晚到
+            raise RpcTimeoutError(f"RPC 呼叫 {method_name} 逾時 ({deadline} 秒)") from None
+
+    async def _invoke_with_deadline(self, method_name, args, deadline):
+        try:
+            return await asyncio.wait_for(self._invoke(method_name, args), deadline)
+        except asyncio.TimeoutError:
+            raise RpcTimeoutError(f"RPC 呼叫 {method_name} 逾時 ({deadline} 秒)") from None
+
+    async def _invoke(self, method_name, args):
+        client = self._client
+        method = getattr(self._exports, method_name)
+        token = object()
+        with client.lock:
+            client.pending[token] = (method_name, time.time())
+        try:
+            return await method(*args)
+        finally:
+            with client.lock:
+                client.pending.pop(token, None)
+
+
+class AsyncRpcHub:
+    """
+    AsyncRpcHub 類別 - 以單一 asyncio 事件迴圈驅動所有模擬器的 RPC 協程
+
+    事件迴圈在一條背景執行緒中執行，各實例的週期性功能以協程 (coroutine) 提交；
+    協程以 AsyncRpcClient 等待 RPC 回應、以 asyncio.sleep 休眠，等待期間不佔用執行緒，
+    所有實例的協程共用這一條執行緒輪流執行，單一實例無法獨占。
+    (排隊的動作仍由各實例的 ActionQueue 執行緒依序送出，與同步的呼叫端共用同一個順序。)
+
+    協程內呼叫 RPC 應使用實例的 AsyncRpcClient (await api.get_info(...))，
+    不可直接呼叫 RpcClient 或 exports_sync，否則會阻塞整個事件迴圈。
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.loop is not None:
+                return
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self._run, name="AsyncRpcHub", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """提交協程，回傳 concurrent.futures.Future (可由其他執行緒查詢結果)。"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def task_count(self):
+        """目前在事件迴圈中執行的協程數量。"""
+        if self.loop is None:
+            return 0
+        try:
+            return len(asyncio.all_tasks(self.loop))
+        except RuntimeError:
+            return 0
+
+    def stop(self):
+        with self.lock:
+            if self.loop is None:
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=1)
+            self.loop = None
+            self.thread = None
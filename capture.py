@@ -0,0 +1,373 @@
+import base64
+import bisect
+import gzip
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+
+from fake_agent import FakeSession
+
+
+
+def _app_dir():
+    """程式所在的目錄 (與 LineageM.SCRIPT_CACHE_DIR 相同的規則，不受工作目錄影響)。"""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+# 錄製檔目錄，每次連線寫入一個新檔案，程式中斷後重新連接不會接在不完整的檔案後面
+CAPTURE_DIR = os.path.join(_app_dir(), "captures")
+# 在 gui 的端口欄位輸入 "replay:<錄製檔路徑>" 即以錄製檔重播代替 Frida
+REPLAY_PORT_PREFIX = "replay:"
+
+
+_capture_serial = itertools.count(1)
+
+
+def capture_path(name):
+    """本次連線的錄製檔路徑: 實例名稱-時間-PID-序號，同一秒內重新連接也不會重複。"""
+    return os.path.join(CAPTURE_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_capture_serial)}.jsonl.gz")
+
+
+def _args_key(method_name, args):
+    return method_name, json.dumps(list(args), ensure_ascii=False, default=str)
+
+
+def _decompress_chunks(f):
+    """
+    逐段解壓 gzip 檔 (可為多段串接)，遇到不完整或損毀的資料時先回傳損毀處之前解出的內容再停止。
+    gzip.GzipFile 讀到損毀處會拋出 zlib.error，同一次讀取中已解出的內容也會一併遺失。
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    while True:
+        data = f.read(1 << 16)
+        if not data:
+            return
+        while data:
+            before = decompressor.copy()
+            try:
+                out = decompressor.decompress(data)
+            except zlib.error:
+                # 逐位元組重試，取得損毀處之前的內容
+                for i in range(len(data)):
+                    try:
+                        yield before.decompress(data[i:i + 1])
+                    except zlib.error:
+                        return
+                return
+            yield out
+            if decompressor.eof:
+                data = decompressor.unused_data
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                data = b""
+
+
+def read_capture(path):
+    """
+    逐筆讀出錄製檔的紀錄 (dict)。
+    程式中斷時最後一段 gzip 可能不完整，或 (舊版以附加模式錄製時) 後面接著下一段，
+    讀到該處即停止，只回傳之前完整的紀錄。
+    """
+    with open(path, "rb") as f:
+        pending = b""
+        for chunk in _decompress_chunks(f):
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    return
+
+
+class CaptureRecorder:
+    """
+    CaptureRecorder 類別 - 包在 script.exports_sync 外層，記錄每一次 RPC 與 agent 推送的快照
+
+    每筆紀錄為一行 JSON，寫入 gzip 壓縮的錄製檔:
+      RPC:  {"t": 呼叫時間, "m": 方法, "a": 參數, "r": 回傳值 (或 "e": 錯誤訊息), "ms": 耗時毫秒}
+      快照: {"t": 接收時間, "m": "frame", "p": payload, "d": 打包資料 (base64) 或 null}
+
+    寫入最多延遲 1 秒才 flush，程式異常結束時錄製檔仍可讀取 (見 read_capture)。
+    """
+
+    def __init__(self, exports, path):
+        self._exports = exports
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = gzip.open(path, "wt", encoding="utf-8")
+        self.lock = threading.Lock()
+        self.last_flush = time.time()
+        self.closed = False
+
+    def __getattr__(self, method_name):
+        if method_name.startswith("_"):
+            raise AttributeError(method_name)
+        method = getattr(self._exports, method_name)
+
+        def call(*args):
+            start = time.time()
+            try:
+                result = method(*args)
+            except Exception as e:
+                self._write({"t": start, "m": method_name, "a": args, "e": str(e)})
+                raise
+            self._write({"t": start, "m": method_name, "a": args, "r": result,
+                         "ms": round((time.time() - start) * 1000, 2)})
+            return result
+
+        return call
+
+    def async_exports(self, exports):
+        """包裝 script.exports_async，與 exports_sync 的呼叫寫入同一個錄製檔。"""
+        return _AsyncCaptureExports(self, exports)
+
+    def record_frame(self, payload, data=None):
+        self._write({"t": time.time(), "m": "frame", "p": payload,
+                     "d": base64.b64encode(data).decode("ascii") if data else None})
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self.lock:
+            if self.closed:
+                return
+            self.file.write(line + "\n")
+            now = time.time()
+            if now - self.last_flush >= 1:
+                self.file.flush()
+                self.last_flush = now
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.file.close()
+
+
+class _AsyncCaptureExports:
+    """CaptureRecorder.async_exports 的結果: 記錄每一次 await 的 RPC (紀錄格式與同步呼叫相同)。"""
+
+    def __init__(self, recorder, exports):
+        self._recorder = recorder
+        self._exports = exports
+
+    def __getattr__(self, method_name):
+        if method_name.startswith("_"):
+            raise AttributeError(method_name)
+        method = getattr(self._exports, method_name)
+
+        async def call(*args):
+            start = time.time()
+            try:
+                result = await method(*args)
+            except Exception as e:
+                self._recorder._write({"t": start, "m": method_name, "a": args, "e": str(e)})
+                raise
+            self._recorder._write({"t": start, "m": method_name, "a": args, "r": result,
+                                   "ms": round((time.time() - start) * 1000, 2)})
+            return result
+
+        return call
+
+
+class ReplayExports:
+    """
+    ReplayExports 類別 - 以錄製檔代替 agent，回傳錄製時的查詢結果
+
+    speed 為重播倍率 (1 為原速)；speed 為 None 時以最快速度重播: 時間只隨呼叫推進，
+    每次查詢取得同一查詢在目前時間之後的下一筆紀錄。
+    查詢以 (方法, 參數) 比對錄製的紀錄；動作不會影響重播內容，只記錄在 actions 中
+    ([(重播時間, 方法, 參數)])，可與錄製時實際送出的動作比較。
+
+    get_world_delta 依序套用錄製的增量重建周圍物件，一律以完整快照 (seq = -1) 回傳；
+    錄製檔中有 agent 推送的快照時，start_world_stream 依時間重新推送。
+    """
+
+    def __init__(self, records, script, speed=1.0):
+        self._script = script
+        self.speed = speed
+        self.index = {}
+        self.by_method = {}
+        self.deltas = {}
+        self.frames = []
+        for record in records:
+            if record["m"] == "frame":
+                self.frames.append(record)
+            elif record["m"] == "get_world_delta":
+                self.deltas.setdefault(str(record["a"][0]), []).append(record)
+            else:
+                times, entries = self.index.setdefault(_args_key(record["m"], record["a"]), ([], []))
+                times.append(record["t"])
+                entries.append(record)
+                self.by_method.setdefault(record["m"], []).append(record)
+        all_times = [r["t"] for r in records]
+        self.t0 = min(all_times) if all_times else time.time()
+        self.t_end = max(all_times) if all_times else self.t0
+        self.start = time.time()
+        # 最快速重播從第一筆紀錄之前開始，第一次查詢取得第一筆紀錄
+        self.max_clock = self.t0 - 1
+        self.channels = {}
+        self.actions = []
+        self.lock = threading.Lock()
+        self._stream_stop = None
+
+    def clock(self):
+        if self.speed:
+            return self.t0 + (time.time() - self.start) * self.speed
+        return self.max_clock
+
+    @property
+    def finished(self):
+        return self.clock() >= self.t_end
+
+    def _select(self, times, entries):
+        with self.lock:
+            clock = self.clock()
+            if self.speed:
+                i = bisect.bisect_right(times, clock) - 1
+                return entries[max(i, 0)]
+            i = bisect.bisect_right(times, clock)
+            if i >= len(times):
+                return entries[-1]
+            self.max_clock = times[i]
+            return entries[i]
+
+    @staticmethod
+    def _result(record):
+        if "e" in record:
+            raise Exception(record["e"])
+        return record.get("r")
+
+    def _lookup(self, method_name, args):
+        found = self.index.get(_args_key(method_name, args))
+        if found is None:
+            return None
+        return self._result(self._select(*found))
+
+    def get_info(self, code, options=None):
+        args = (code,) if options is None else (code, options)
+        result = self._lookup("get_info", args)
+        if result is None:
+            return json.dumps({"status": "error", "message": f"錄製檔中沒有查詢 {code}"}, ensure_ascii=False)
+        return result
+
+    def get_info_batch(self, codes):
+        result = self._lookup("get_info_batch", (codes,))
+        if result is None:
+            return [self.get_info(*(entry if isinstance(entry, list) else [entry])) for entry in codes]
+        return result
+
+    def get_world_delta(self, channel, since_seq, extra_codes, options=None):
+        records = self.deltas.get(str(channel)) or next(iter(self.deltas.values()), [])
+        state = self.channels.setdefault(str(channel), {"applied": 0, "objects": {}, "extra": []})
+        times = [r["t"] for r in records]
+        with self.lock:
+            clock = self.clock()
+            end = bisect.bisect_right(times, clock)
+            if not self.speed and end <= state["applied"] < len(times):
+                end = state["applied"] + 1
+                self.max_clock = max(self.max_clock, times[end - 1])
+            for record in records[state["applied"]:end]:
+                self._apply_delta(state, record)
+            state["applied"] = max(state["applied"], end)
+        extra = state["extra"] if len(state["extra"]) == len(extra_codes or []) else [self.get_info(code) for code in extra_codes or []]
+        return json.dumps({"status": "success", "seq": -1, "full": True,
+                           "data": list(state["objects"].values()), "extra": extra}, ensure_ascii=False)
+
+    @staticmethod
+    def _apply_delta(state, record):
+        if "e" in record:
+            return
+        try:
+            payload = json.loads(record["r"])
+        except (TypeError, ValueError):
+            return
+        state["extra"] = payload.get("extra", [])
+        if payload.get("status") != "success":
+            return
+        if payload.get("full"):
+            state["objects"] = {str(obj.get("objectKey", i)): obj for i, obj in enumerate(payload.get("data", []))}
+            return
+        for key in payload.get("removed", []):
+            state["objects"].pop(str(key), None)
+        for obj in payload.get("added", []) + payload.get("changed", []):
+            state["objects"][str(obj.get("objectKey"))] = obj
+
+    def start_world_stream(self, interval_ms, extra_codes, options=None, encoding="json"):
+        self.stop_world_stream()
+        stop = threading.Event()
+        self._stream_stop = stop
+        interval = max(int(interval_ms or 200), 50) / 1000
+
+        def run():
+            if not self.frames:
+                # 錄製時沒有使用推送模式，改以錄製的查詢結果組成快照
+                seq = 0
+                while not stop.wait(interval):
+                    seq += 1
+                    self._script._emit({"type": "world", "seq": seq, "world": self.get_info(203, options),
+                                        "extra": [self.get_info(code) for code in extra_codes or []]})
+                return
+            times = [r["t"] for r in self.frames]
+            i = bisect.bisect_right(times, self.clock())
+            while i < len(self.frames) and not stop.is_set():
+                frame = self.frames[i]
+                if self.speed:
+                    delay = (frame["t"] - self.clock()) / self.speed
+                    if delay > 0 and stop.wait(delay):
+                        return
+                else:
+                    if stop.wait(0.005):
+                        return
+                    with self.lock:
+                        self.max_clock = max(self.max_clock, frame["t"])
+                data = base64.b64decode(frame["d"]) if frame.get("d") else None
+                self._script._emit(frame["p"], data)
+                i += 1
+
+        threading.Thread(target=run, name="replay-world-stream", daemon=True).start()
+        return True
+
+    def stop_world_stream(self):
+        if self._stream_stop is not None:
+            self._stream_stop.set()
+            self._stream_stop = None
+        return True
+
+    def __getattr__(self, method_name):
+        if method_name.startswith("_"):
+            raise AttributeError(method_name)
+
+        def call(*args):
+            self.actions.append((self.clock(), method_name, args))
+            result = self._lookup(method_name, args)
+            if result is None and method_name in self.by_method:
+                result = self._result(self.by_method[method_name][-1])
+            return result
+
+        return call
+
+
+class ReplayDevice:
+    """attach 時讀入錄製檔並建立重播用的 session (與 fake_agent.FakeDevice 相同介面)。"""
+
+    name = "錄製檔重播"
+
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+
+    def attach(self, pid):
+        records = list(read_capture(self.path))
+        if not records:
+            raise Exception(f"錄製檔沒有任何紀錄: {self.path}")
+        return FakeSession(lambda script: ReplayExports(records, script, self.speed))
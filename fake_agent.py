@@ -0,0 +1,626 @@
+import json
+import math
+import random
+import threading
+import time
+
+from target_matcher import compile_lines, compile_patterns
+
+# 在 gui 的端口欄位輸入 "fake" 即改為連接本模組的離線模擬 agent，不需要模擬器與 Frida
+FAKE_PORT = "fake"
+FAKE_PID = 1
+
+TOWN_MAP = ("說話之島村莊", 1, 0)      # (mapName, mapId, zone)
+FIELD_MAP = ("說話之島", 2, 0)
+FIELD_CENTER = (32600, 32900)
+FIELD_RADIUS = 40
+
+MONSTER_KINDS = [
+    # (名稱, 等級, 最大 HP, 攻擊力, 是否主動攻擊)
+    ("哥布林", 5, 60, 3, False),
+    ("妖魔", 8, 90, 5, True),
+    ("狼", 6, 70, 4, True),
+    ("史萊姆", 2, 30, 1, False),
+    ("骷髏", 12, 140, 7, True),
+]
+ITEMS = [
+    # (名稱, itemID, 數量)
+    ("傳送回家的卷軸(刻印)", 40100, 20),
+    ("遺忘之傳送回家的卷軸(刻印)", 40101, 5),
+    ("瞬間移動卷軸(刻印)", 40102, 50),
+    ("魔法卷軸(魔法屏障)(刻印)", 40103, 10),
+    ("紅色藥水", 40010, 100),
+]
+SKILLS = [
+    # (skillID, 名稱, 冷卻毫秒, 耗魔, 傷害 (0 表示 BUFF), BUFF 持續毫秒)
+    (1, "光箭", 1000, 2, 25, 0),
+    (4, "地獄之牙", 2000, 6, 45, 0),
+    (43, "加速術", 1000, 10, 0, 300000),
+    (55, "魔法屏障", 1000, 15, 0, 960000),
+    (148, "火焰武器", 1000, 12, 0, 640000),
+]
+DROP_NAMES = ["金幣", "紅色藥水", "妖魔的牙齒", "狼皮"]
+
+AGGRO_RANGE = 6
+MONSTER_SPEED = 1.5     # 格/秒
+PLAYER_SPEED = 4.0
+ATTACK_RANGE = 1.5
+ATTACK_INTERVAL = 1.0
+DROP_LIFETIME = 30.0
+RESPAWN_TIME = 5.0
+
+
+def _match_name(name, patterns):
+    """與 agent 的 patternMatcher / matchLevel 相同: 完全相同，或以 * 結尾表示前綴比對；patterns 為空時全部符合。"""
+    return not patterns or compile_patterns(patterns).matches(name)
+
+
+def _project(parsed, options):
+    """與 agent 的 project 相同，依 types / fields 過濾 data 陣列。"""
+    data = parsed.get("data")
+    if not options or not isinstance(data, list):
+        return parsed
+    types = options.get("types")
+    fields = options.get("fields")
+    out = []
+    for obj in data:
+        if types and obj.get("type") not in types:
+            continue
+        if fields:
+            obj = {field: obj[field] for field in fields if field in obj}
+        out.append(obj)
+    parsed["data"] = out
+    return parsed
+
+
+class FakeWorld:
+    """
+    FakeWorld 類別 - 簡化的遊戲世界
+
+    怪物在野外隨機走動，主動怪或被攻擊的怪會追擊並攻擊玩家；
+    玩家對目標自動走近並攻擊，怪物死亡後留下掉落物並在數秒後重生。
+    狀態在每次查詢時依經過時間推進 (不需要背景執行緒)，所有方法都以 lock 保護。
+    座標內部以浮點數移動，查詢時四捨五入成整數格。
+    """
+
+    def __init__(self, monster_count=30, seed=None):
+        self.rng = random.Random(seed)
+        self.lock = threading.RLock()
+        self.now = time.time()
+        self.next_key = 1000000000000000000 # 超過 JS 安全整數範圍，與真實 objectKey 相同
+        self.player = {
+            "objectKey": self._new_key(), "name": "模擬玩家", "level": 52,
+            "x": FIELD_CENTER[0], "y": FIELD_CENTER[1],
+            "curHP": 600, "maxHP": 600, "curMP": 200, "maxMP": 200,
+        }
+        self.map = FIELD_MAP
+        self.target_key = None
+        self.is_attacking = False
+        self.auto_on = False
+        self.move_goal = None
+        self.last_player_attack = 0
+        self.buffs = {}  # skillID -> 到期時間
+        self.skill_ready = {}  # skillID -> 可再次施放的時間
+        self.inventory = {}
+        for name, item_id, count in ITEMS:
+            self.inventory[self._new_key()] = {"itemName": name, "itemID": item_id, "count": count}
+        self.monsters = {}
+        self.drops = {}
+        self.respawns = []
+        for _ in range(monster_count):
+            self._spawn_monster()
+
+    def _new_key(self):
+        self.next_key += self.rng.randint(1, 97)
+        return self.next_key
+
+    def _random_field_pos(self):
+        return (FIELD_CENTER[0] + self.rng.randint(-FIELD_RADIUS, FIELD_RADIUS),
+                FIELD_CENTER[1] + self.rng.randint(-FIELD_RADIUS, FIELD_RADIUS))
+
+    def _spawn_monster(self):
+        name, level, max_hp, power, aggressive = self.rng.choice(MONSTER_KINDS)
+        x, y = self._random_field_pos()
+        key = self._new_key()
+        self.monsters[key] = {
+            "objectKey": key, "type": 6, "name": name, "level": level, "x": x, "y": y,
+            "curHP": max_hp, "maxHP": max_hp, "power": power, "aggressive": aggressive,
+            "angry": False, "last_attack": 0, "wander": None,
+        }
+
+    def _distance(self, obj):
+        return math.hypot(obj["x"] - self.player["x"], obj["y"] - self.player["y"])
+
+    @staticmethod
+    def _step(obj, goal_x, goal_y, distance):
+        dx, dy = goal_x - obj["x"], goal_y - obj["y"]
+        length = math.hypot(dx, dy)
+        if length <= distance or length == 0:
+            obj["x"], obj["y"] = goal_x, goal_y
+        else:
+            obj["x"] += dx / length * distance
+            obj["y"] += dy / length * distance
+
+    def advance(self):
+        """推進到目前時間 (以 0.1 秒為一步)。"""
+        with self.lock:
+            now = time.time()
+            steps = min(int((now - self.now) / 0.1), 600)
+            for _ in range(steps):
+                self.now += 0.1
+                self._tick(0.1)
+            if steps == 600:
+                self.now = now
+
+    def _tick(self, dt):
+        player = self.player
+        in_field = self.map == FIELD_MAP
+
+        # 玩家移動: 移動指令優先，否則走向攻擊目標
+        target = self.monsters.get(self.target_key) or self.drops.get(self.target_key)
+        if self.move_goal:
+            self._step(player, self.move_goal[0], self.move_goal[1], PLAYER_SPEED * dt)
+            if (player["x"], player["y"]) == self.move_goal:
+                self.move_goal = None
+        elif target and self.is_attacking and self._distance(target) > ATTACK_RANGE:
+            self._step(player, target["x"], target["y"], PLAYER_SPEED * dt)
+
+        # 玩家攻擊 / 撿取
+        if target and self.is_attacking and self._distance(target) <= ATTACK_RANGE:
+            if target["type"] == 3:
+                self._pick_up(target)
+            elif self.now - self.last_player_attack >= ATTACK_INTERVAL:
+                self.last_player_attack = self.now
+                self._damage_monster(target, self.rng.randint(12, 20))
+
+        # AUTO: 沒有目標時自動攻擊最近的怪物
+        if self.auto_on and in_field and not (target and self.is_attacking) and self.monsters:
+            nearest = min(self.monsters.values(), key=self._distance)
+            self.target_key = nearest["objectKey"]
+            self.is_attacking = True
+
+        # 怪物: 追擊或隨機走動
+        for monster in list(self.monsters.values()):
+            distance = self._distance(monster)
+            if in_field and (monster["angry"] or (monster["aggressive"] and distance <= AGGRO_RANGE)):
+                monster["angry"] = True
+                if distance > ATTACK_RANGE:
+                    self._step(monster, player["x"], player["y"], MONSTER_SPEED * dt)
+                elif self.now - monster["last_attack"] >= ATTACK_INTERVAL:
+                    monster["last_attack"] = self.now
+                    damage = max(1, monster["power"] - (3 if 55 in self.buffs else 0))
+                    player["curHP"] = max(0, player["curHP"] - damage)
+            else:
+                if monster["wander"] is None or self.rng.random() < 0.01:
+                    monster["wander"] = self._random_field_pos()
+                self._step(monster, monster["wander"][0], monster["wander"][1], MONSTER_SPEED * dt * 0.5)
+
+        # 回復、BUFF 到期、重生、掉落物消失
+        player["curMP"] = min(player["maxMP"], player["curMP"] + 2 * dt)
+        if not any(m["angry"] for m in self.monsters.values()):
+            player["curHP"] = min(player["maxHP"], player["curHP"] + 5 * dt)
+        if player["curHP"] <= 0:
+            self._teleport_to_town()
+            player["curHP"] = player["maxHP"]
+        self.buffs = {skill_id: end for skill_id, end in self.buffs.items() if end > self.now}
+        while self.respawns and self.respawns[0] <= self.now:
+            self.respawns.pop(0)
+            self._spawn_monster()
+        for key, drop in list(self.drops.items()):
+            if drop["expire"] <= self.now:
+                del self.drops[key]
+
+    def _damage_monster(self, monster, damage):
+        monster["curHP"] = max(0, monster["curHP"] - damage)
+        monster["angry"] = True
+        if monster["curHP"] > 0:
+            return
+        del self.monsters[monster["objectKey"]]
+        self.respawns.append(self.now + RESPAWN_TIME)
+        self.respawns.sort()
+        key = self._new_key()
+        self.drops[key] = {"objectKey": key, "type": 3, "name": self.rng.choice(DROP_NAMES),
+                           "x": monster["x"], "y": monster["y"], "expire": self.now + DROP_LIFETIME}
+        if self.target_key == monster["objectKey"]:
+            self.target_key = None
+            self.is_attacking = False
+
+    def _pick_up(self, drop):
+        del self.drops[drop["objectKey"]]
+        for item in self.inventory.values():
+            if item["itemName"] == drop["name"]:
+                item["count"] += 1
+                break
+        else:
+            self.inventory[self._new_key()] = {"itemName": drop["name"], "itemID": 49000, "count": 1}
+        self.target_key = None
+        self.is_attacking = False
+
+    def _teleport_to_town(self):
+        self.map = TOWN_MAP
+        self.player["x"], self.player["y"] = 32580, 32930
+        self.target_key = None
+        self.is_attacking = False
+        self.move_goal = None
+        for monster in self.monsters.values():
+            monster["angry"] = False
+
+    # --- 查詢 (回傳與遊戲相同結構的 dict) ---
+
+    def player_info(self):
+        player = self.player
+        target = self.monsters.get(self.target_key) or self.drops.get(self.target_key)
+        data = {key: player[key] for key in ("objectKey", "name", "level", "maxHP", "maxMP")}
+        data.update({
+            "x": round(player["x"]), "y": round(player["y"]),
+            "curHP": int(player["curHP"]), "curMP": int(player["curMP"]),
+            "mapName": self.map[0], "mapId": self.map[1], "zone": self.map[2],
+            "targetType": target["type"] if target else 0,
+        })
+        return {"status": "success", "zone": self.map[2], "data": data}
+
+    def objects(self):
+        if self.map != FIELD_MAP:
+            return {"status": "success", "data": []}
+        objects = []
+        for monster in self.monsters.values():
+            obj = {key: monster[key] for key in ("objectKey", "type", "name", "level", "curHP", "maxHP")}
+            obj.update({"x": round(monster["x"]), "y": round(monster["y"]), "attackMe": monster["angry"], "attackID": self.player["objectKey"] if monster["angry"] else 0,
+                        "isMine": False, "buff": []})
+            objects.append(obj)
+        for drop in self.drops.values():
+            objects.append({"objectKey": drop["objectKey"], "type": 3, "name": drop["name"],
+                            "x": round(drop["x"]), "y": round(drop["y"])})
+        return {"status": "success", "data": objects}
+
+    def info(self, code):
+        with self.lock:
+            code = int(code)
+            if code == 201:
+                return self.player_info()
+            if code == 202:
+                return {"status": "success", "data": [dict(item, itemKey=key) for key, item in self.inventory.items()]}
+            if code == 203:
+                return self.objects()
+            if code == 206:
+                return {"status": "success", "data": [{"skillID": skill_id, "remainTime": int((end - self.now) * 1000)}
+                                                      for skill_id, end in self.buffs.items()]}
+            if code == 218:
+                return {"status": "success", "data": [{"skillID": s[0], "skillName": s[1], "cooldown": s[2]} for s in SKILLS]}
+            return {"status": "error", "message": f"模擬 agent 不支援指令 {code}"}
+
+    # --- 動作 ---
+
+    def set_target(self, key):
+        with self.lock:
+            key = int(key)
+            if key not in self.monsters and key not in self.drops:
+                return False
+            self.target_key = key
+            return True
+
+    def attack_pickup(self):
+        with self.lock:
+            if self.target_key is None:
+                return False
+            self.is_attacking = True
+            return True
+
+    def use_skill(self, skill_id, target_key):
+        with self.lock:
+            skill = next((s for s in SKILLS if s[0] == int(skill_id)), None)
+            if skill is None or self.skill_ready.get(skill[0], 0) > self.now or self.player["curMP"] < skill[3]:
+                return False
+            self.player["curMP"] -= skill[3]
+            self.skill_ready[skill[0]] = self.now + skill[2] / 1000
+            if skill[4] == 0:
+                self.buffs[skill[0]] = self.now + skill[5] / 1000
+                return True
+            monster = self.monsters.get(int(target_key))
+            if monster is None or self._distance(monster) > 10:
+                return False
+            self._damage_monster(monster, skill[4])
+            return True
+
+    def use_item(self, item_key):
+        with self.lock:
+            item = self.inventory.get(int(item_key))
+            if item is None or item["count"] <= 0:
+                return False
+            item["count"] -= 1
+            name = item["itemName"]
+            if "傳送回家" in name:
+                self._teleport_to_town()
+            elif "瞬間移動" in name:
+                self.map = FIELD_MAP
+                self.player["x"], self.player["y"] = self._random_field_pos()
+                self.move_goal = None
+                for monster in self.monsters.values():
+                    monster["angry"] = False
+            elif "魔法屏障" in name:
+                self.buffs[55] = self.now + 960
+            elif "藥水" in name:
+                self.player["curHP"] = min(self.player["maxHP"], self.player["curHP"] + 50)
+            return True
+
+    def moveto(self, x, y):
+        with self.lock:
+            if self.map != FIELD_MAP:
+                # 從村莊移動時直接回到野外入口
+                self.map = FIELD_MAP
+                self.player["x"], self.player["y"] = FIELD_CENTER
+            self.move_goal = (int(x), int(y))
+            return True
+
+    def toggle_auto(self, enable):
+        with self.lock:
+            self.auto_on = bool(enable)
+            if not self.auto_on:
+                self.is_attacking = False
+            return True
+
+
+class FakeExports:
+    """
+    FakeExports 類別 - 與 create_main_monitor_script 的 exports_sync 相同的方法 (snake_case)
+
+    回傳值與真實 agent 相同 (get_info 為 JSON 字串，pickup_nearest / select_nearest 為 JSON 字串)。
+    call_counts 記錄各方法被呼叫的次數，可用來量測迴圈的 RPC 次數。
+    startWorldStream 的 encoding="packed" 一律以 JSON 推送 (WorldStream 會照一般流程解析)。
+    """
+
+    def __init__(self, world, script):
+        self._world = world
+        self._script = script
+        self._channels = {}
+        self._stream_stop = None
+        self.call_counts = {}
+
+    def _count(self, method_name):
+        self.call_counts[method_name] = self.call_counts.get(method_name, 0) + 1
+
+    def _query(self, code, options=None):
+        self._world.advance()
+        return json.dumps(_project(self._world.info(code), options), ensure_ascii=False)
+
+    def get_info(self, code, options=None):
+        self._count("get_info")
+        return self._query(code, options)
+
+    def get_info_batch(self, codes):
+        self._count("get_info_batch")
+        return [self._query(entry[0], entry[1]) if isinstance(entry, list) else self._query(entry) for entry in codes]
+
+    def get_world_delta(self, channel, since_seq, extra_codes, options=None):
+        self._count("get_world_delta")
+        extra = [self._query(code) for code in (extra_codes or [])]
+        parsed = json.loads(self._query(203, options))
+        data = parsed.get("data", [])
+        current = {str(obj["objectKey"]): json.dumps(obj, sort_keys=True) for obj in data}
+        state = self._channels.get(channel)
+        if state is None:
+            self._channels[channel] = {"seq": 1, "objects": current}
+            result = {"status": "success", "seq": 1, "full": True, "data": data}
+        else:
+            added = [obj for obj in data if str(obj["objectKey"]) not in state["objects"]]
+            changed = [obj for obj in data if str(obj["objectKey"]) in state["objects"]
+                       and state["objects"][str(obj["objectKey"])] != current[str(obj["objectKey"])]]
+            removed = [key for key in state["objects"] if key not in current]
+            base_seq = state["seq"]
+            if added or changed or removed:
+                state["seq"] = base_seq + 1
+            state["objects"] = current
+            if int(since_seq) != base_seq:
+                result = {"status": "success", "seq": state["seq"], "full": True, "data": data}
+            else:
+                result = {"status": "success", "seq": state["seq"], "full": False,
+                          "added": added, "changed": changed, "removed": removed}
+        result["extra"] = extra
+        return json.dumps(result, ensure_ascii=False)
+
+    def start_world_stream(self, interval_ms, extra_codes, options=None, encoding="json"):
+        self._count("start_world_stream")
+        self.stop_world_stream()
+        stop = threading.Event()
+        self._stream_stop = stop
+        interval = max(int(interval_ms or 200), 50) / 1000
+
+        def run():
+            seq = 0
+            while not stop.wait(interval):
+                seq += 1
+                extra = [self._query(code) for code in (extra_codes or [])]
+                self._script._emit({"type": "world", "seq": seq, "world": self._query(203, options), "extra": extra})
+
+        threading.Thread(target=run, name="fake-world-stream", daemon=True).start()
+        return True
+
+    def stop_world_stream(self):
+        if self._stream_stop is not None:
+            self._stream_stop.set()
+            self._stream_stop = None
+        return True
+
+    def use_item(self, item_key):
+        self._count("use_item")
+        return self._world.use_item(item_key)
+
+    def toggle_auto(self, enable):
+        self._count("toggle_auto")
+        return self._world.toggle_auto(enable)
+
+    def use_skill(self, skill_id, target_key):
+        self._count("use_skill")
+        return self._world.use_skill(skill_id, target_key)
+
+    def set_target(self, object_key):
+        self._count("set_target")
+        return self._world.set_target(object_key)
+
+    def attack_pickup(self):
+        self._count("attack_pickup")
+        return self._world.attack_pickup()
+
+    def target_and_attack(self, object_key):
+        self._count("target_and_attack")
+        self._world.set_target(object_key)
+        return self._world.attack_pickup()
+
+    def target_and_skill(self, object_key, skill_id):
+        self._count("target_and_skill")
+        self._world.set_target(object_key)
+        return self._world.use_skill(skill_id, object_key)
+
+    def pickup_nearest(self, patterns, max_range):
+        self._count("pickup_nearest")
+        player = json.loads(self._query(201))["data"]
+        best, best_dist = None, math.inf
+        for obj in json.loads(self._query(203))["data"]:
+            if obj.get("type") != 3 or not _match_name(obj.get("name"), patterns):
+                continue
+            dist = math.hypot(obj["x"] - player["x"], obj["y"] - player["y"])
+            if max_range > 0 and dist > max_range:
+                continue
+            if dist < best_dist:
+                best, best_dist = obj, dist
+        if best is None:
+            return json.dumps({"status": "not_found"})
+        self._world.set_target(best["objectKey"])
+        self._world.attack_pickup()
+        return json.dumps({"status": "success", "objectKey": best["objectKey"], "name": best["name"], "distance": best_dist},
+                          ensure_ascii=False)
+
+    def select_nearest(self, lines, options=None):
+        self._count("select_nearest")
+        options = options or {}
+        types = options.get("types") or [2, 6, 3]
+        max_range = options.get("maxRange") or 0
+        player = json.loads(self._query(201))["data"]
+        objects = json.loads(self._query(203))["data"]
+        matcher = compile_lines(lines or [])
+        use_priority = options.get("usePriority")
+        # 未啟用優先級且清單為空時全部符合
+        match_all = not use_priority and not matcher
+        # 一次走訪所有物件，各優先級分別保留最近的一個 (未啟用優先級時全部視為同一級)
+        nearest = {}
+        for obj in objects:
+            if obj.get("type") not in types:
+                continue
+            matched = None if match_all else matcher.level(obj.get("name"))
+            if not match_all and matched is None:
+                continue
+            level = matched if use_priority else 0
+            dist = math.hypot(obj.get("x", player["x"]) - player["x"], obj.get("y", player["y"]) - player["y"])
+            if max_range > 0 and dist > max_range:
+                continue
+            if level not in nearest or dist < nearest[level][1]:
+                nearest[level] = (obj, dist, matched)
+        if not nearest:
+            return json.dumps({"status": "not_found"})
+        level = min(nearest)
+        best, best_dist, matched = nearest[level]
+        action = options.get("action")
+        if action and action != "none":
+            self._world.set_target(best["objectKey"])
+            if action == "attack":
+                self._world.attack_pickup()
+        return json.dumps({"status": "success", "objectKey": best["objectKey"], "name": best.get("name"),
+                           "type": best.get("type"), "distance": best_dist, "level": level,
+                           "pattern": "" if matched is None else "|".join(matcher.levels[matched])}, ensure_ascii=False)
+
+    def moveto(self, x, y):
+        self._count("moveto")
+        return self._world.moveto(x, y)
+
+
+class AsyncExports:
+    """exports_sync 的非同步介面 (與 frida 的 exports_async 相同，方法回傳可 await 的協程)，模擬的呼叫直接在事件迴圈中執行。"""
+
+    def __init__(self, exports):
+        self._exports = exports
+
+    def __getattr__(self, method_name):
+        if method_name.startswith("_"):
+            raise AttributeError(method_name)
+        method = getattr(self._exports, method_name)
+
+        async def call(*args):
+            return method(*args)
+
+        return call
+
+
+class FakeScript:
+    """
+    與 frida Script 相同的介面 (on / load / unload / exports_sync / exports_async)。
+    make_exports(script) 建立 exports_sync，推送訊息時呼叫 script._emit(payload, data)。
+    """
+
+    def __init__(self, make_exports):
+        self.handlers = {"message": [], "destroyed": []}
+        self.exports_sync = make_exports(self)
+        self.exports_async = AsyncExports(self.exports_sync)
+        self.is_destroyed = False
+
+    def on(self, signal, callback):
+        self.handlers.setdefault(signal, []).append(callback)
+
+    def load(self):
+        self._emit("[RPC] 模擬 agent 已載入")
+
+    def _emit(self, payload, data=None):
+        for callback in list(self.handlers["message"]):
+            callback({"type": "send", "payload": payload}, data)
+
+    def unload(self):
+        if self.is_destroyed:
+            return
+        self.is_destroyed = True
+        self.exports_sync.stop_world_stream()
+        for callback in list(self.handlers["destroyed"]):
+            callback()
+
+
+class FakeSession:
+    """與 frida Session 相同的介面；沒有 compile_script，create_cached_script 呼叫失敗後會改用 create_script。"""
+
+    def __init__(self, make_exports):
+        self.make_exports = make_exports
+        self.scripts = []
+        self.handlers = []
+        self.detached = False
+
+    def on(self, signal, callback):
+        if signal == "detached":
+            self.handlers.append(callback)
+
+    def create_script(self, source):
+        script = FakeScript(self.make_exports)
+        self.scripts.append(script)
+        return script
+
+    def is_detached(self):
+        return self.detached
+
+    def detach(self, reason="application-requested"):
+        if self.detached:
+            return
+        self.detached = True
+        for script in self.scripts:
+            script.unload()
+        for callback in list(self.handlers):
+            callback(reason, None)
+
+
+class FakeDevice:
+    """attach 時建立新的模擬世界，每個連接的實例各自獨立。"""
+
+    name = "離線模擬 agent"
+
+    def __init__(self, monster_count=30, seed=None):
+        self.monster_count = monster_count
+        self.seed = seed
+
+    def attach(self, pid):
+        world = FakeWorld(self.monster_count, self.seed)
+        return FakeSession(lambda script: FakeExports(world, script))
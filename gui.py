@@ -2,6 +2,8 @@ import tkinter as tk
 from tkinter import ttk
 from tkinter import scrolledtext, messagebox, simpledialog, Listbox
 import threading
+import concurrent.futures
+import asyncio
 import frida
 import LineageM  # 匯入我們的主邏輯
 import time
@@ -18,9 +20,31 @@ import shutil
 from tkinter import filedialog
 import psutil # type: ignore
 from overlay import Overlay
+from world_state import WorldDeltaTracker, WorldStream, WorldState, MonsterGeometry, SpatialGrid
+from async_rpc import AsyncRpcClient, AsyncRpcHub
+from rpc_client import RpcClient, ActionRateLimiter
+import fake_agent
+import capture
+import json_codec
+from target_matcher import compile_patterns
 
 CONFIG_FILE = "config.json"
 
+# agent 端過濾 (types / fields)，只傳回各功能實際讀取的欄位
+MONSTER_HP_PROJECTION = {"types": [6], "fields": ["objectKey", "type", "name", "curHP", "maxHP"]}
+MONSTER_POSITION_PROJECTION = {"types": [6], "fields": ["type", "x", "y"]}
+
+# 斷線重連後會自動恢復的迴圈: 執行旗標 -> (執行緒欄位, 顯示名稱)
+# 跟隨攻擊在未連接時只會等待，重連後自行繼續，不需要列在這裡
+RESUMABLE_LOOPS = {
+    "is_priority_targeting": ("priority_targeting_thread", "自動聚怪"),
+    "is_monitoring": ("monitor_thread", "監控"),
+    "is_patrolling": ("patrol_thread", "自動巡邏"),
+    "is_general_afk_running": ("general_afk_thread", "一般掛機"),
+}
+RECONNECT_INITIAL_DELAY = 2  # 第一次重連前等待秒數，之後每次加倍
+RECONNECT_MAX_DELAY = 60
+
 class App:
     def __init__(self, root, style):
         self.root = root
@@ -36,6 +60,8 @@ class App:
         # --- 多實例管理 ---
         self.instances = {} # Key: emu_name, Value: dict of state and UI elements
         self.config = {} # Holds the entire config
+        self.rpc_hub = AsyncRpcHub() # 所有實例共用的 asyncio 事件迴圈 (定時類功能的協程)
+        self.is_closing = False # 關閉程式時不再自動重連
 
         # --- 主框架 ---
         self.main_frame = ttk.Frame(root, padding="2")
@@ -57,6 +83,9 @@ class App:
         self.save_all_button = ttk.Button(self.global_controls_frame, text="儲存所有設定", command=self.save_config, style='Taller.TButton')
         self.save_all_button.pack(side=tk.LEFT, padx=(0, 0))
 
+        self.connect_all_button = ttk.Button(self.global_controls_frame, text="全部連接", command=self.connect_all, style='Taller.TButton')
+        self.connect_all_button.pack(side=tk.LEFT, padx=(5, 0))
+
         # --- 全域樣式設定 ---
         style_settings_frame = ttk.Frame(self.global_controls_frame)
         style_settings_frame.pack(side=tk.LEFT, padx=(5, 0))
@@ -99,6 +128,7 @@ class App:
         # --- 初始化 ---
         self.log_message("--- 初始化 ---")
         self.log_message(f"Frida 版本: {frida.__version__}")
+        self.log_message(f"JSON 解析器: {json_codec.BACKEND}")
         self.load_and_create_tabs()
         
         # --- 環境自檢 ---
@@ -120,12 +150,14 @@ class App:
             mem_info = self.process.memory_info()
             mem_mb = mem_info.rss / (1024 * 1024)  # RSS in MB
             thread_count = threading.active_count()
+            task_count = self.rpc_hub.task_count()
             width = self.root.winfo_width()
             height = self.root.winfo_height()
 
             new_title = (f"{self.base_title} | "
                          f"記憶體: {mem_mb:.2f} MB | "
                          f"執行緒: {thread_count} | "
+                         f"協程: {task_count} | "
                          f"[{width}x{height}]")
 
             if self.root.title() != new_title:
@@ -227,11 +259,14 @@ class App:
         instance = self.instances[name]
         overlay = instance["overlay"]
         ui = instance["ui"]
+        world_sub = {"stream": None, "seq": 0}
+        target_matcher = compile_patterns(target_list) # 名稱以 * 結尾表示前綴比對
         
         while instance.get("is_overlay_scanning", False):
+            scan_start = time.time()
             try:
                 api = instance.get("script_api")
-                if not api:
+                if not api or not instance.get("world_stream"):
                     overlay.update_text(f"未連接\n模擬器: {name}", font_color=(128, 128, 128))
                     time.sleep(1)
                     continue
@@ -241,12 +276,15 @@ class App:
                     time.sleep(1)
                     continue
 
-                # 呼叫 201 指令獲取玩家自身資訊 (用於計算方位+距離)
-                player_info_str = api.get_info(201)
+                # 等待 agent 推送的下一幀: 201 (玩家自身資訊，用於計算方位+距離) 與 203 (周圍物件)
+                extra, result = self._next_world_frame(instance, world_sub)
+                if result is None:
+                    continue
+                player_info_str = extra[0] if extra else None
                 px, py = None, None
                 if player_info_str:
                     try:
-                        p_json = json.loads(player_info_str)
+                        p_json = json_codec.loads(player_info_str)
                         if p_json.get("status") == "success":
                             p_data = p_json.get("data", {})
                             if isinstance(p_data, dict) and "x" in p_data:
@@ -258,19 +296,12 @@ class App:
                     except:
                         pass
 
-                # 呼叫 203 指令獲取周圍物件
-                result_str = api.get_info(203)
-                if not result_str:
-                    time.sleep(0.5)
-                    continue
-
-                result = json.loads(result_str)
                 data = result.get("data", [])
                 
                 # 🚀 改用距離排序：儲存 (顯示文字, 距離) 配對
                 found_targets_with_dist = []
                 for obj in data:
-                    if obj.get("name") in target_list:
+                    if target_matcher.matches(obj.get("name")):
                         ox, oy = obj.get("x"), obj.get("y")
                         
                         # 計算歐幾里德距離
@@ -353,12 +384,42 @@ class App:
 
             except Exception as e:
                 print(f"Overlay check loop error: {e}")
-            
-            time.sleep(0.5) # 掃描間隔 0.5 秒
+
+            # 掃描間隔 0.5 秒 (等待推送的時間也計入)
+            time.sleep(max(0.0, 0.5 - (time.time() - scan_start)))
         
+        self._release_world_frame(world_sub)
         # 迴圈結束後確保隱藏
         overlay.hide()
 
+    def _next_world_frame(self, instance, world_sub, timeout=1.0):
+        """
+        等待實例 world_stream 推送的下一幀。
+
+        world_sub 由呼叫的迴圈保存 ({"stream": None, "seq": 0})，記錄已訂閱的 stream 與上次處理的序號；
+        重新連線後 world_stream 會被替換，這裡自動改訂閱新的 stream。
+
+        Returns:
+            tuple: (extra, world)，extra[0] 為 201 的原始字串；未連接或逾時時 world 為 None
+        """
+        stream = instance.get("world_stream")
+        if world_sub["stream"] is not stream:
+            self._release_world_frame(world_sub)
+            if stream is not None:
+                stream.acquire()
+                world_sub["stream"] = stream
+        if stream is None:
+            time.sleep(timeout) # 未連接，避免呼叫端空轉
+            return [], None
+        world_sub["seq"], extra, world = stream.wait_next(world_sub["seq"], timeout)
+        return extra, world
+
+    def _release_world_frame(self, world_sub):
+        if world_sub["stream"] is not None:
+            world_sub["stream"].release()
+            world_sub["stream"] = None
+            world_sub["seq"] = 0
+
     def _get_direction_arrow(self, px, py, tx, ty):
         if px is None or py is None or tx is None or ty is None:
             return ""
@@ -408,9 +469,9 @@ class App:
             "last_notification_time": 0,
             "last_notified_target": None,
             "is_timed_targeting": False, 
-            "timed_target_thread": None,
+            "timed_target_task": None,
             "is_timed_skilling": False, 
-            "timed_skill_thread": None,
+            "timed_skill_task": None,
             "is_auto_barrier_running": False,
             "auto_barrier_thread": None,
             "is_general_afk_running": False,
@@ -958,6 +1019,7 @@ class App:
             "global_settings": {
                 "button_padding": self.button_padding_entry.get(),
                 "log_height": self.log_height_entry.get(),
+                "connect_all_workers": getattr(self, "config", {}).get("global_settings", {}).get("connect_all_workers", "3"),
                 # Monster HP Detection Settings
                 "monster_hp_detection_monster_name": getattr(self, "monster_name_entry", tk.Entry()).get(),
                 "monster_hp_detection_threshold": getattr(self, "hp_threshold_entry", tk.Entry()).get(),
@@ -1042,6 +1104,16 @@ class App:
             emu_conf["timed_target_interval"] = instance["config"].get("timed_target_interval", "1")
             emu_conf["timed_skill_interval"] = instance["config"].get("timed_skill_interval", "1")
             emu_conf["skill_id"] = instance["config"].get("skill_id", "")
+            emu_conf["world_stream_interval"] = instance["config"].get("world_stream_interval", "200")
+            emu_conf["world_state_max_age"] = instance["config"].get("world_state_max_age", "0.3")
+            emu_conf["world_stream_encoding"] = instance["config"].get("world_stream_encoding", "json")
+            emu_conf["auto_reconnect"] = instance["config"].get("auto_reconnect", True)
+            emu_conf["rpc_timeout"] = instance["config"].get("rpc_timeout", "5")
+            emu_conf["action_rate"] = instance["config"].get("action_rate", "10")
+            emu_conf["action_burst"] = instance["config"].get("action_burst", "5")
+            emu_conf["capture_enabled"] = instance["config"].get("capture_enabled", False)
+            emu_conf["replay_speed"] = instance["config"].get("replay_speed", "1")
+            emu_conf["auto_reconnect_max_attempts"] = instance["config"].get("auto_reconnect_max_attempts", "10")
 
             # Save priority targeting (auto-gather) settings
             emu_conf["priority_attacker_threshold"] = instance["config"].get("priority_attacker_threshold", "3")
@@ -1142,6 +1214,7 @@ class App:
         self.log_area.config(state='disabled')
 
     def on_closing(self):
+        self.is_closing = True
         try:
             self.save_config()
         except Exception as e:
@@ -1149,8 +1222,7 @@ class App:
         for name, instance in self.instances.items():
             if instance.get("is_monitoring"):
                 instance["is_monitoring"] = False
-            if instance.get("monitor_thread"):
-                instance["monitor_thread"].join(timeout=1)
+            self._join_loop(instance.get("monitor_thread"), 1)
             if instance.get("is_seq_moving"):
                 instance["is_seq_moving"] = False
             if instance.get("seq_move_thread"):
@@ -1165,8 +1237,6 @@ class App:
                 instance["monster_detect_thread"].join(timeout=1)
             if instance.get("is_timed_skilling"):
                 instance["is_timed_skilling"] = False
-            if instance.get("timed_skill_thread"):
-                instance["timed_skill_thread"].join(timeout=1)
             if instance.get("is_auto_barrier_running"):
                 instance["is_auto_barrier_running"] = False
             if instance.get("auto_barrier_thread"):
@@ -1179,14 +1249,13 @@ class App:
             # 定時指定目標
             if instance.get("is_timed_targeting"):
                 instance["is_timed_targeting"] = False
-            if instance.get("timed_target_thread"):
-                instance["timed_target_thread"].join(timeout=1)
             # 自動巡邏
             if instance.get("is_patrolling"):
                 instance["is_patrolling"] = False
-            if instance.get("patrol_thread"):
-                instance["patrol_thread"].join(timeout=1)
+            self._join_loop(instance.get("patrol_thread"), 1)
             
+            if instance.get("capture"):
+                instance["capture"].close()
             # --- Fix: Explicitly detach session on close ---
             if instance.get("session"):
                 try:
@@ -1196,6 +1265,7 @@ class App:
                     print(f"Error detaching session for {name}: {e}")
             # -----------------------------------------------
 
+        self.rpc_hub.stop()
         self.root.destroy()
 
     def open_adb_commands_dialog(self):
@@ -1767,7 +1837,7 @@ class App:
             if not world_info_str:
                 raise Exception("獲取周圍物件失敗 (RPC get_info(203) 未返回任何資料)")
 
-            world_json = json.loads(world_info_str)
+            world_json = json_codec.loads(world_info_str)
             all_objects = world_json.get('data', [])
 
             # --- 3. Filter for allied players ---
@@ -1889,6 +1959,7 @@ class App:
         instance = self.instances[name]
         ui = instance["ui"]
         api = instance["script_api"]
+        world_sub = {"stream": None, "seq": 0}
         
         # TODO: Make this configurable
         HOLY_BARRIER_CAST_ID = 333 # 聖結界施法ID (假設)
@@ -1917,25 +1988,26 @@ class App:
 
                 current_time = time.time()
 
-                # 獲取玩家自己的位置
-                player_info_str = api.get_info(201)
+                # 獲取玩家自己的位置與周圍物件 (agent 推送的最新一幀)
+                extra, world_json = self._next_world_frame(instance, world_sub)
+                if world_json is None:
+                    continue
+                player_info_str = extra[0] if extra else None
                 player_x, player_y = None, None
                 if player_info_str:
                     try:
-                        player_data = json.loads(player_info_str)
+                        player_data = json_codec.loads(player_info_str)
                         player_info = player_data.get('data', player_data)
                         player_x = player_info.get('x')
                         player_y = player_info.get('y')
                     except:
                         pass
 
-                world_info_str = api.get_info(203)
-                if not world_info_str:
+                if world_json.get("status") != "success":
                     self.log_message(f"[{name}] 自動聖結界: 無法獲取周圍物件。")
                     time.sleep(interval)
                     continue
                 
-                world_json = json.loads(world_info_str)
                 all_objects = world_json.get('data', [])
 
 
@@ -2108,13 +2180,12 @@ class App:
                             # 施法後等待遊戲狀態更新
                             time.sleep(1.0) # 增加等待時間以確保狀態更新
 
-                            # 重新獲取周圍物件來驗證
-                            verification_world_info_str = api.get_info(203)
-                            if not verification_world_info_str:
+                            # 重新獲取周圍物件來驗證 (施法後的新一幀)
+                            _, verification_world_json = self._next_world_frame(instance, world_sub)
+                            if not verification_world_json or verification_world_json.get("status") != "success":
                                 self.log_message(f"{log_prefix}驗證失敗:無法獲取物件資訊。")
                                 continue # 繼續下一次嘗試
 
-                            verification_world_json = json.loads(verification_world_info_str)
                             verification_objects = verification_world_json.get('data', [])
                             
                             target_found_and_buffed = False
@@ -2177,6 +2248,7 @@ class App:
                 self.log_message(f"[{name}] 自動聖結界迴圈發生嚴重錯誤: {e}")
                 self.handle_script_error(e, name)
         finally:
+            self._release_world_frame(world_sub)
             self.log_message(f"--- [{name}] 自動聖結界結束 ---")
             if self.root.winfo_exists() and name in self.instances:
                 def _reset_ui():
@@ -2214,10 +2286,10 @@ class App:
 
         instance["is_timed_skilling"] = True
         ui["timed_skill_button"].config(text="停止定時")
-        instance["timed_skill_thread"] = threading.Thread(target=self.timed_skill_loop, args=(name, skill_id, interval), daemon=True)
-        instance["timed_skill_thread"].start()
+        instance["timed_skill_task"] = self.rpc_hub.submit(self.timed_skill_loop(name, skill_id, interval))
 
-    def timed_skill_loop(self, name, skill_id, interval):
+    async def timed_skill_loop(self, name, skill_id, interval):
+        """定時施法協程 (在 rpc_hub 的事件迴圈中執行)"""
         instance = self.instances[name]
         ui = instance["ui"]
         self.log_message(f"--- [{name}] 開始定時施放技能 ID: {skill_id} (間隔 {interval}s) ---")
@@ -2227,13 +2299,19 @@ class App:
                 target_key = "0"
                 
                 self.log_message(f"[{name}] 定時施法: 執行一次技能 {skill_id}...")
-                self.execute_use_skill(name, skill_id, target_key, update_ui=False)
+                try:
+                    api = instance["script_api_async"]
+                    result = await api.use_skill(skill_id, target_key, lane="routine")
+                    self.log_message(f"[{name}] RPC use_skill 返回: {result}")
+                except Exception as e:
+                    self.log_message(f"[{name}] 錯誤: '使用技能' 流程發生未知錯誤: {e}")
+                    self.handle_script_error(e, name)
                 
                 sleep_end_time = time.time() + interval
                 while time.time() < sleep_end_time:
                     if not instance["is_timed_skilling"]:
                         break
-                    time.sleep(0.1)
+                    await asyncio.sleep(0.1)
 
         except Exception as e:
             if instance["is_timed_skilling"]:
@@ -2377,9 +2455,9 @@ class App:
                 "last_notification_time": 0,
                 "last_notified_target": None,
                 "is_timed_targeting": False, 
-                "timed_target_thread": None,
+                "timed_target_task": None,
                 "is_timed_skilling": False, 
-                "timed_skill_thread": None,
+                "timed_skill_task": None,
                 "is_auto_barrier_running": False,
                 "auto_barrier_thread": None,
                 "is_general_afk_running": False,
@@ -3122,7 +3200,7 @@ class App:
         api = instance["script_api"]
         try:
             player_info_str = api.get_info(201)
-            player_data = json.loads(player_info_str)
+            player_data = json_codec.loads(player_info_str)
             info_dict = player_data.get('data', player_data)
             start_map_name = info_dict.get("mapName", "未知地圖")
         except Exception as e:
@@ -3222,17 +3300,16 @@ class App:
         # Get pickup_range from config or default
         pickup_range = int(instance["config"].get("priority_pickup_range", "200"))
 
-        instance["priority_targeting_thread"] = threading.Thread(
-            target=self.priority_targeting_loop, 
-            args=(name, upper_threshold, lower_threshold, skill_id, interval, luring_range, priority_pickup_list, priority_monster_blacklist, use_density_detection, cluster_radius, safety_distance, safety_count, use_stuck_teleport, stuck_time, pickup_range, min_lure_distance, lure_ignore_time, switch_on_hp_loss, lock_duration, low_density_teleport_on, low_density_threshold, low_density_range, low_density_cooldown), 
-            daemon=True
+        self._start_resumable_loop(
+            name, "is_priority_targeting", self.priority_targeting_loop,
+            (name, upper_threshold, lower_threshold, skill_id, interval, luring_range, priority_pickup_list, priority_monster_blacklist, use_density_detection, cluster_radius, safety_distance, safety_count, use_stuck_teleport, stuck_time, pickup_range, min_lure_distance, lure_ignore_time, switch_on_hp_loss, lock_duration, low_density_teleport_on, low_density_threshold, low_density_range, low_density_cooldown)
         )
-        instance["priority_targeting_thread"].start()
 
     def priority_targeting_loop(self, name, upper_threshold, lower_threshold, skill_id, interval, luring_range, priority_pickup_list, priority_monster_blacklist, use_density_detection, cluster_radius, safety_distance, safety_count, use_stuck_teleport, stuck_time, pickup_range, min_lure_distance, lure_ignore_time, switch_on_hp_loss, lock_duration, low_density_teleport_on, low_density_threshold, low_density_range, low_density_cooldown):
         instance = self.instances[name]
         ui = instance["ui"]
         api = instance["script_api"]
+        world_state = instance["world_state"]
 
         def log_to_dialog(msg):
             # 輸出到全域日誌
@@ -3286,62 +3363,53 @@ class App:
         IGNORE_DURATION = 5.0 # Seconds to ignore a failed lure target
         LURE_TIMEOUT = max(5.0, stuck_time + 2.0) # Seconds to wait for aggro before giving up. Must be > stuck_time.
         start_map_name = instance.get("priority_start_map_name") # 記錄起始地圖
+        # 撿取清單與黑名單預先編譯 (名稱以 * 結尾表示前綴比對)
+        pickup_matcher = compile_patterns(priority_pickup_list)
+        blacklist_matcher = compile_patterns(priority_monster_blacklist)
 
         try:
             while instance["is_priority_targeting"]:
                 loop_start_time = time.time()
                 current_time = loop_start_time
                 
-                # 1. Fetch Data
-                player_info_str = api.get_info(201)
-                objects_str = api.get_info(203)
-                
-                if not player_info_str or not objects_str:
-                    time.sleep(1)
-                    continue
+                # 1. Fetch Data (201 + 203，取自實例共用的 WorldState 快取，已解析成 WorldSnapshot)
+                snapshot = world_state.snapshot()
 
-                player_info = json.loads(player_info_str)
-                objects_info = json.loads(objects_str)
-
-                if player_info.get("status") != "success" or objects_info.get("status") != "success":
+                if not snapshot or not snapshot.player.has_position:
                     time.sleep(1)
                     continue
+                player = snapshot.player
                 
                 # 2. 檢查地圖是否變更
-                current_map_name = player_info.get("mapName", "未知地圖")
+                current_map_name = player.map_name or "未知地圖"
                 if start_map_name and current_map_name != start_map_name:
                     log_to_dialog(f"偵測到地圖變更 (從 '{start_map_name}' 到 '{current_map_name}')。自動停止聚怪。")
                     self.log_message(f"[{name}] 偵測到地圖變更 (從 '{start_map_name}' 到 '{current_map_name}')。自動停止聚怪。")
                     instance["is_priority_targeting"] = False
                     continue # 立即結束此迴圈,觸發 finally 中的清理
                 
-                player_x, player_y = player_info.get("x"), player_info.get("y")
-                all_monsters = [obj for obj in objects_info.get("data", []) if obj.get("type") == 6]
-                all_dropped_items = [obj for obj in objects_info.get("data", []) if obj.get("type") == 3]
-                
+                player_x, player_y = player.x, player.y
+                all_monsters = snapshot.monsters
+                all_dropped_items = snapshot.items
+                # 所有怪物與玩家的距離、黑名單標記只計算一次 (有 NumPy 時向量化)，以下各項判斷共用
+                geometry = MonsterGeometry(snapshot, blacklist_matcher)
                 
-                # Update attackers count (排除黑名單怪物)
-                attackers = [m for m in all_monsters 
-                            if m.get("attackMe") and m.get("name") not in priority_monster_blacklist]
+                # Update attackers count (排除黑名單怪物)，attackers 為 [(怪物, 距離)]
+                attackers = geometry.attackers()
                 attacker_count = len(attackers)
 
                 # Calculate nearby monsters for safety check (排除黑名單)
-                nearby_monsters = [m for m in all_monsters 
-                                  if m.get("name") not in priority_monster_blacklist and 
-                                  math.hypot(m.get("x", player_x) - player_x, m.get("y", player_y) - player_y) <= safety_distance]
-                nearby_count = len(nearby_monsters)
+                nearby_count = geometry.count_within(safety_distance)
 
                 # --- Low Density Teleport Check ---
                 if low_density_teleport_on:
                     last_teleport_time = instance.get("last_low_density_teleport_time", 0)
                     if current_time - last_teleport_time > low_density_cooldown:
                         # Count monsters in range
-                        monsters_in_range = [m for m in all_monsters 
-                                           if m.get("name") not in priority_monster_blacklist and 
-                                           math.hypot(m.get("x", player_x) - player_x, m.get("y", player_y) - player_y) <= low_density_range]
+                        in_range_count = geometry.count_within(low_density_range)
                         
-                        if len(monsters_in_range) < low_density_threshold:
-                            log_to_dialog(f"範圍內怪物數量過少 ({len(monsters_in_range)} < {low_density_threshold}) -> 執行隨機順移")
+                        if in_range_count < low_density_threshold:
+                            log_to_dialog(f"範圍內怪物數量過少 ({in_range_count} < {low_density_threshold}) -> 執行隨機順移")
                             
                             # Use Random Teleport Scroll
                             scroll_name = "瞬間移動卷軸(刻印)"
@@ -3353,7 +3421,7 @@ class App:
                                 try:
                                     inv_str = api.get_info(202)
                                     if inv_str:
-                                        inv_data = json.loads(inv_str)
+                                        inv_data = json_codec.loads(inv_str)
                                         if inv_data.get("status") == "success":
                                             for item in inv_data.get("data", []):
                                                 if "瞬間移動卷軸" in item.get("itemName", ""): 
@@ -3364,7 +3432,7 @@ class App:
                                     pass
                             
                             if scroll_key:
-                                api.use_item(str(scroll_key))
+                                api.use_item(str(scroll_key), lane="emergency")
                                 instance["last_low_density_teleport_time"] = current_time
                                 time.sleep(1.0) # Wait for teleport
                                 pending_lure_target = None # Reset target
@@ -3378,39 +3446,16 @@ class App:
 
                 # --- Priority Item Pickup Logic (Preserved) ---
                 if priority_pickup_list:
-                    found_priority_item = None
-                    for item in all_dropped_items:
-                        item_name = item.get("name")
-                        is_match = False
-                        for pattern in priority_pickup_list:
-                            if pattern.endswith('*'):
-                                if item_name.startswith(pattern[:-1]):
-                                    is_match = True
-                                    break
-                            elif item_name == pattern:
-                                is_match = True
-                                break
-                        
-                        if is_match:
-                            # Check distance
-                            item_x = item.get("x")
-                            item_y = item.get("y")
-                            if item_x is not None and item_y is not None:
-                                dist = math.hypot(item_x - player_x, item_y - player_y)
-                                if dist <= pickup_range:
-                                    found_priority_item = item
-                                    break
-                            else:
-                                # If no coordinates, assume valid (or ignore? assuming valid for now)
-                                found_priority_item = item
-                                break
+                    # 範圍內最近的符合物品 (缺少座標的物品距離視為 0，與原本相同視為在範圍內)
+                    found_priority_item = min(
+                        (item for item in all_dropped_items
+                         if pickup_matcher.matches(item.name) and item.distance(player_x, player_y) <= pickup_range),
+                        key=lambda item: item.distance(player_x, player_y), default=None)
                     
                     if found_priority_item:
-                        item_name = found_priority_item.get("name")
-                        item_key = found_priority_item.get("objectKey")
-                        log_to_dialog(f"發現優先撿取物品: {item_name}，正在撿取。")
-                        api.set_target(str(item_key))
-                        api.attack_pickup()
+                        # 直接以選中物品的 objectKey 指定並撿取 (單次 RPC，agent 不必再掃描一次 203)
+                        log_to_dialog(f"發現優先撿取物品: {found_priority_item.name}，正在撿取。")
+                        api.target_and_attack(found_priority_item.key)
                         time.sleep(0.5)
                         continue
 
@@ -3441,21 +3486,16 @@ class App:
                     # 主動切換攻擊最近的怪物
                     if attackers:
                         # 找出最近的攻擊中怪物
-                        nearest_attacker = min(attackers, 
-                                             key=lambda m: math.hypot(m.get("x", player_x) - player_x, 
-                                                                     m.get("y", player_y) - player_y))
-                        nearest_id = nearest_attacker.get("objectKey")
-                        nearest_name = nearest_attacker.get("name")
-                        nearest_dist = math.hypot(nearest_attacker.get("x") - player_x, 
-                                                 nearest_attacker.get("y") - player_y)
+                        nearest_attacker, nearest_dist = min(attackers, key=lambda pair: pair[1])
+                        nearest_name = nearest_attacker.name
                         
                         # 切換到最近的怪物
-                        api.set_target(str(nearest_id))
+                        api.set_target(nearest_attacker.key, lane="routine")
                         # log_to_dialog(f"⚔️ 切換攻擊: {nearest_name} (距離: {nearest_dist:.1f})")
 
                 elif current_state == 'GATHERING':
                     # Check if currently targeting a dropped item (picking up)
-                    if player_info.get("targetType") == 3:
+                    if player.target_type == 3:
                         # log_to_dialog("正在撿取物品 (TargetType=3)，暫停聚怪邏輯...")
                         time.sleep(0.2)
                         continue
@@ -3468,13 +3508,13 @@ class App:
                         initial_hp = pending_lure_target.get('initial_hp', 0)
                         
                         # Find this monster in current list
-                        monster_obj = next((m for m in all_monsters if str(m.get("objectKey")) == str(target_id)), None)
+                        monster_obj = next((m for m in all_monsters if m.key == target_id), None)
                         
                         if not monster_obj:
                             # log_to_dialog(f"目標 {target_name} 消失/死亡 -> 尋找下一個")  # 移除 LOG
                             pending_lure_target = None
                         else:
-                            current_hp = monster_obj.get("curHP", 0)
+                            current_hp = monster_obj.cur_hp or 0
                             
                             # 檢查血量是否減少 (引誘成功)
                             if initial_hp > 0 and current_hp > 0 and current_hp < initial_hp:
@@ -3513,7 +3553,7 @@ class App:
                                     if current_time - check_start_time > stuck_time:
                                         # 時間到了，檢查這段時間內的移動距離
                                         interval_moved_dist = math.hypot(player_x - check_start_x, player_y - check_start_y)
-                                        target_dist = math.hypot(monster_obj.get("x") - player_x, monster_obj.get("y") - player_y)
+                                        target_dist = monster_obj.distance(player_x, player_y)
                                         
                                         # 如果這段時間內移動少於 2 步，且離目標還很遠 (>2)，判定為卡住
                                         if interval_moved_dist < 2.0 and target_dist > 2.0:
@@ -3530,7 +3570,7 @@ class App:
                                                     try:
                                                         inv_str = api.get_info(202)
                                                         if inv_str:
-                                                            inv_data = json.loads(inv_str)
+                                                            inv_data = json_codec.loads(inv_str)
                                                             if inv_data.get("status") == "success":
                                                                 for item in inv_data.get("data", []):
                                                                     if item.get("itemName") == scroll_name:
@@ -3542,7 +3582,7 @@ class App:
 
                                                 if scroll_key:
                                                     log_to_dialog(f"-> 使用 {scroll_name} 脫離卡點")
-                                                    api.use_item(str(scroll_key))
+                                                    api.use_item(str(scroll_key), lane="emergency")
                                                     time.sleep(1.0) # 等待順移
                                                     pending_lure_target = None # Reset target
                                                     continue
@@ -3571,82 +3611,69 @@ class App:
                     
                     else:
                         # No pending target, find a new one
-                        valid_targets = []
-                        for m in all_monsters:
-                            mid = str(m.get("objectKey"))
+                        valid_targets = [] # [(怪物, 距離)]
+                        for m, dist, blocked in zip(all_monsters, geometry.distances, geometry.blocked):
                             # Filter conditions
-                            if m.get("attackMe"): continue # Already attacking
-                            if mid in temp_ignore_list: continue # Recently failed
-                            if m.get("name") in priority_monster_blacklist: continue
+                            if m.attack_me: continue # Already attacking
+                            if m.key in temp_ignore_list: continue # Recently failed
+                            if blocked: continue
                             
-                            dist = math.hypot(m.get("x", player_x) - player_x, m.get("y", player_y) - player_y)
                             if dist > luring_range: continue  # 超出引怪範圍
                             if dist < min_lure_distance: continue  # 太近不引誘 (避免引誘身邊的怪)
                             
-                            valid_targets.append(m)
+                            valid_targets.append((m, dist))
                         
                         if not valid_targets:
                             # 沒有符合引誘條件的目標,嘗試切換到最近的怪物(即使不符合條件)
                             if all_monsters:
                                 # 找出範圍內最近的怪物(忽略所有篩選條件,除了距離)
-                                nearby_monsters = [m for m in all_monsters 
-                                                 if math.hypot(m.get("x", player_x) - player_x, 
-                                                             m.get("y", player_y) - player_y) <= luring_range]
+                                nearby_monsters = geometry.within(luring_range, include_blacklisted=True)
                                 
                                 if nearby_monsters:
-                                    nearest = min(nearby_monsters, 
-                                                key=lambda m: math.hypot(m.get("x", player_x) - player_x, 
-                                                                       m.get("y", player_y) - player_y))
-                                    nearest_id = nearest.get("objectKey")
-                                    nearest_name = nearest.get("name")
-                                    nearest_dist = math.hypot(nearest.get("x") - player_x, nearest.get("y") - player_y)
+                                    nearest, nearest_dist = min(nearby_monsters, key=lambda pair: pair[1])
+                                    nearest_name = nearest.name
                                     
                                     # log_to_dialog(f"⚠️ 無可引誘目標 -> 切換到最近怪物: {nearest_name} (距離: {nearest_dist:.1f})")
-                                    api.set_target(str(nearest_id))
+                                    api.set_target(nearest.key, lane="routine")
                             # else: 範圍內完全沒有怪物,讓 AUTO 處理
                         else:
                             # Selection Logic (Density or Distance)
                             target_to_tag = None
                             target_density_score = None  # 儲存密度分數
                             if use_density_detection:
-                                # ... (Density logic preserved) ...
+                                # 密度分數: cluster_radius 內的其他怪物數量，以網格索引只檢查相鄰格子
                                 target_scores = []
-                                for target_a in valid_targets:
-                                    score = 0
-                                    for target_b in all_monsters:
-                                        if target_a == target_b: continue
-                                        d = math.hypot(target_a.get("x") - target_b.get("x"), target_a.get("y") - target_b.get("y"))
-                                        if d <= cluster_radius:
-                                            score += 1
-                                    target_scores.append({"monster": target_a, "score": score})
+                                grid = SpatialGrid(all_monsters, cluster_radius)
+                                for target_a, dist_a in valid_targets:
+                                    score = grid.count_within(target_a, cluster_radius)
+                                    target_scores.append({"monster": target_a, "score": score, "distance": dist_a})
                                 
                                 if target_scores:
                                     max_score = max(s["score"] for s in target_scores)
-                                    top_targets = [s["monster"] for s in target_scores if s["score"] == max_score]
-                                    target_to_tag = min(top_targets, key=lambda m: math.hypot(m.get("x") - player_x, m.get("y") - player_y))
+                                    top_targets = [s for s in target_scores if s["score"] == max_score]
+                                    best = min(top_targets, key=lambda s: s["distance"])
+                                    target_to_tag, dist = best["monster"], best["distance"]
                                     target_density_score = max_score  # 儲存密度分數
                             else:
-                                target_to_tag = min(valid_targets, key=lambda m: math.hypot(m.get("x") - player_x, m.get("y") - player_y))
+                                target_to_tag, dist = min(valid_targets, key=lambda pair: pair[1])
                             
                             if target_to_tag:
-                                tid = target_to_tag.get("objectKey")
-                                tname = target_to_tag.get("name")
-                                dist = math.hypot(target_to_tag.get("x") - player_x, target_to_tag.get("y") - player_y)
+                                tid = target_to_tag.key
+                                tname = target_to_tag.name
                                 
                                 # 顯示密度資訊(如果啟用)
                                 density_info = f" | 密度: {target_density_score}" if use_density_detection and target_density_score is not None else ""
                                 # log_to_dialog(f"🎯 鎖定目標: {tname} (距離: {dist:.1f}){density_info} -> 執行引誘")
-                                api.set_target(str(tid))
                                 if skill_id:
-                                    api.use_skill(skill_id, str(tid))
+                                    api.target_and_skill(tid, skill_id)
                                 else:
-                                    api.attack_pickup()
+                                    api.target_and_attack(tid)
                                 
                                 pending_lure_target = {
-                                    'id': str(tid),
+                                    'id': tid,
                                     'time': time.time(),
                                     'name': tname,
-                                    'initial_hp': target_to_tag.get("curHP", 0),
+                                    'initial_hp': target_to_tag.cur_hp or 0,
                                     'check_start_time': time.time(), # 初始化檢查點時間
                                     'check_start_x': player_x,       # 初始化檢查點座標
                                     'check_start_y': player_y,
@@ -3655,7 +3682,7 @@ class App:
                                 # We do NOT sleep here heavily, we let the loop check for aggro
 
                 # 計算統計數據並更新狀態顯示
-                blacklist_count = sum(1 for m in all_monsters if m.get("name") in priority_monster_blacklist)
+                blacklist_count = geometry.blacklist_count
                 pending_name = pending_lure_target['name'] if pending_lure_target else None
                 valid_count = len(valid_targets) if 'valid_targets' in locals() else 0
                 
@@ -3863,12 +3890,98 @@ class App:
         ui["connect_button"].config(state='disabled', text="連接中...")
         threading.Thread(target=self.establish_connection, args=(name,), daemon=True).start()
 
-    def establish_connection(self, name):
+    def connect_all(self):
+        """
+        同時連接所有尚未連接的模擬器，並以一個視窗顯示各模擬器的連接進度。
+        每個模擬器的 ADB 檢查、frida-server 啟動與附加都要數秒，逐一按「連接」會依序累加；
+        這裡交給執行緒池並行處理，同時進行的數量由全域設定 connect_all_workers 限制 (預設 3)，
+        避免同時對太多模擬器下 adb 指令。
+        """
+        names = [name for name, instance in self.instances.items()
+                 if not instance.get("script_api") and not instance.get("is_reconnecting")]
+        if not names:
+            messagebox.showinfo("全部連接", "所有模擬器皆已連接。")
+            return
+        try:
+            max_workers = int(getattr(self, "config", {}).get("global_settings", {}).get("connect_all_workers", 3))
+        except (ValueError, TypeError):
+            max_workers = 3
+        max_workers = max(1, min(max_workers, len(names)))
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("全部連接")
+        dialog.transient(self.root)
+
+        main_frame = ttk.Frame(dialog, padding="10")
+        main_frame.pack(expand=True, fill=tk.BOTH)
+
+        status_labels = {}
+        for row, name in enumerate(names):
+            ttk.Label(main_frame, text=f"{name}:").grid(row=row, column=0, sticky='w', padx=(0, 10))
+            status_labels[name] = ttk.Label(main_frame, text="等待中", width=30)
+            status_labels[name].grid(row=row, column=1, sticky='w')
+        summary_label = ttk.Label(main_frame, text=f"連接中 (同時 {max_workers} 個)...")
+        summary_label.grid(row=len(names), column=0, columnspan=2, sticky='w', pady=(10, 0))
+        close_button = ttk.Button(main_frame, text="關閉", command=dialog.destroy, style='Taller.TButton', state='disabled')
+        close_button.grid(row=len(names) + 1, column=0, columnspan=2, pady=(10, 0))
+
+        self.connect_all_button.config(state='disabled')
+        for name in names:
+            self.instances[name]["ui"]["connect_button"].config(state='disabled', text="連接中...")
+
+        def set_status(name, text=None, color=None):
+            def update():
+                label = status_labels[name]
+                if not label.winfo_exists():
+                    return
+                if text is not None:
+                    label.config(text=text)
+                if color is not None:
+                    label.config(foreground=color)
+            self.root.after(0, update)
+
+        def connect_one(name):
+            ok = self.establish_connection(name, interactive=False, progress=lambda stage, n=name: set_status(n, stage))
+            set_status(name, color="green" if ok else "red")
+            return ok
+
+        def run():
+            start = time.time()
+            self.log_message(f"--- 全部連接: {len(names)} 個模擬器，同時 {max_workers} 個 ---")
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="connect-all") as pool:
+                futures = {pool.submit(connect_one, name): name for name in names}
+                results = {futures[future]: future.result() for future in concurrent.futures.as_completed(futures)}
+            failed = [name for name in names if not results[name]]
+            summary = f"完成: {len(names) - len(failed)}/{len(names)} 個成功，耗時 {time.time() - start:.1f} 秒"
+            if failed:
+                summary += f"\n失敗: {', '.join(failed)}"
+            self.log_message(f"--- 全部連接{summary} ---")
+
+            def finish():
+                self.connect_all_button.config(state='normal')
+                if dialog.winfo_exists():
+                    summary_label.config(text=summary)
+                    close_button.config(state='normal')
+            self.root.after(0, finish)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def establish_connection(self, name, interactive=True, progress=None):
+        """
+        連接並載入 RPC 主腳本，成功回傳 True。
+        interactive=False 時 (自動重連、全部連接) 失敗不跳出錯誤視窗，只寫入日誌。
+        progress(stage) 若有提供，於每個步驟開始時以步驟說明呼叫 (於連接的執行緒呼叫)。
+        """
         instance, ui = self.instances[name], self.instances[name]["ui"]
+        report = progress or (lambda stage: None)
         try:
             self.log_message(f"--- [{name}] 開始連接 ---")
+            report("檢查 Frida 環境...")
             port = ui["port_entry"].get()
-            if not port.isdigit():
+            use_fake_agent = port == fake_agent.FAKE_PORT # 離線模擬 agent，不需要模擬器
+            replay_path = port[len(capture.REPLAY_PORT_PREFIX):] if port.startswith(capture.REPLAY_PORT_PREFIX) else None
+            is_offline = use_fake_agent or replay_path is not None
+            if not port.isdigit() and not is_offline:
                 raise ValueError("端口號必須是數字。")
             
             # --- 自動檢測並啟動 Frida ---
@@ -3877,7 +3990,9 @@ class App:
             forward_port = ui["forward_port_entry"].get()
             
             # 檢查必要參數是否已設定
-            if adb_path and device_serial and forward_port:
+            if is_offline:
+                self.log_message(f"[{name}] -> 使用離線模擬 agent,跳過 Frida 自動檢測")
+            elif adb_path and device_serial and forward_port:
                 # 檢查 frida-server 是否已在執行
                 is_running, pid = self.check_frida_server_running(name, adb_path, device_serial)
                 
@@ -3891,6 +4006,7 @@ class App:
                         raise Exception("ADB 裝置連線失敗,無法啟動 Frida")
                     
                     # 執行 Frida 設定 (包括 forward 和啟動 frida-server)
+                    report("啟動 frida-server...")
                     self.execute_frida_setup(name, adb_path, device_serial, forward_port)
                     
                     # 等待一下確保 frida-server 完全啟動
@@ -3906,14 +4022,33 @@ class App:
                 self.log_message(f"[{name}] -> 未設定 ADB 參數,跳過 Frida 自動檢測")
             # --- 自動檢測並啟動 Frida 結束 ---
             
-            pid, device = LineageM.get_pid_by_package(LineageM.package_name, port, logger=lambda msg: self.log_message(f"[{name}] {msg}"))
+            report("尋找遊戲進程...")
+            if use_fake_agent:
+                pid, device = fake_agent.FAKE_PID, fake_agent.FakeDevice()
+            elif replay_path is not None:
+                # replay_speed: 重播倍率，"max" 表示以最快速度重播
+                replay_speed = instance["config"].get("replay_speed", "1")
+                try:
+                    replay_speed = None if replay_speed == "max" else float(replay_speed)
+                except (ValueError, TypeError):
+                    replay_speed = 1.0
+                pid, device = fake_agent.FAKE_PID, capture.ReplayDevice(replay_path, replay_speed)
+            else:
+                pid, device = LineageM.get_pid_by_package(LineageM.package_name, port, logger=lambda msg: self.log_message(f"[{name}] {msg}"))
             if not pid or not device:
                 raise Exception("找不到目標進程，請確認遊戲或應用已開啟。")
+            if use_fake_agent or replay_path is not None:
+                runtime_id = LineageM.describe_runtime(device)
+            else:
+                runtime_id = LineageM.device_registry.runtime_id(port, device)
             
             self.log_message(f"[{name}] 找到進程 {pid}，正在附加...")
+            report(f"附加進程 {pid}...")
             
             # --- Fix: Detach existing session if any ---
             if instance.get("session"):
+                # 先清除舊腳本，分離時觸發的 destroyed 事件才不會被當成意外斷線
+                instance["script_object"] = None
                 try:
                     self.log_message(f"[{name}] 偵測到舊的連線，正在分離...")
                     instance["session"].detach()
@@ -3924,8 +4059,11 @@ class App:
                     instance["session"] = None
             # -------------------------------------------
 
-            instance["session"] = device.attach(pid)
+            session = device.attach(pid)
+            instance["session"] = session
+            session.on('detached', lambda reason, crash, n=name, s=session: self.on_session_detached(n, s, reason))
             self.log_message(f"[{name}] 成功附加到進程！正在載入RPC主腳本...")
+            report("載入 RPC 主腳本...")
 
             c0391_class = ui["c0391_class_name_entry"].get()
             socket_method = ui["socket_utils_method_entry"].get()
@@ -3949,11 +4087,55 @@ class App:
                                                          skill_use_method_name=skill_use_method,
                                                          target_method_name=target_method,
                                                          attack_pickup_method_name=attack_pickup_method,
-                                                         moveto_classname=moveto_classname)
+                                                         moveto_classname=moveto_classname,
+                                                         runtime_id=runtime_id)
             script.on('message', lambda msg, data, n=name: self.on_message_display(msg, data, n))
+            script.on('destroyed', lambda n=name, sc=script: self.on_script_destroyed(n, sc))
             script.load()
-            instance["script_api"] = script.exports_sync
+            try:
+                rpc_timeout = float(instance["config"].get("rpc_timeout", 5))
+            except (ValueError, TypeError):
+                rpc_timeout = 5.0
+            try:
+                action_rate = float(instance["config"].get("action_rate", 10))
+                action_burst = int(instance["config"].get("action_burst", 5))
+            except (ValueError, TypeError):
+                action_rate, action_burst = 10.0, 5
+            if instance.get("script_api"):
+                instance["script_api"].close()
+            if instance.get("capture"):
+                instance["capture"].close()
+                instance["capture"] = None
+            exports, exports_async = script.exports_sync, script.exports_async
+            if instance["config"].get("capture_enabled", False) and not is_offline:
+                # 記錄所有 RPC 與推送的快照，可用 "replay:<檔案>" 重播
+                instance["capture"] = capture.CaptureRecorder(exports, capture.capture_path(name))
+                exports = instance["capture"]
+                exports_async = instance["capture"].async_exports(exports_async)
+                self.log_message(f"[{name}] 錄製 RPC 流量至 {instance['capture'].path}")
+            # 每次 RPC 呼叫最多等待 rpc_timeout 秒，避免遊戲執行緒卡住時功能執行緒無限期等待
+            # 動作呼叫限速: 回村/順移走 emergency 通道立即送出，迴圈中重複的重新指定目標走 routine
+            instance["script_api"] = RpcClient(exports, timeout=rpc_timeout, name=name,
+                                               on_hung=lambda hung, method, elapsed, n=name: self.on_rpc_hung(n, hung, method, elapsed),
+                                               limiter=ActionRateLimiter(rate=action_rate, burst=action_burst))
             instance["script_object"] = script
+            instance["world_tracker"] = WorldDeltaTracker(instance["script_api"])
+            # rpc_hub 上的協程以 exports_async 呼叫，等待回應時不佔用執行緒 (與 script_api 共用動作佇列與看門狗)
+            instance["script_api_async"] = AsyncRpcClient(instance["script_api"], exports_async)
+            try:
+                stream_interval = int(instance["config"].get("world_stream_interval", 200))
+            except (ValueError, TypeError):
+                stream_interval = 200
+            try:
+                state_max_age = float(instance["config"].get("world_state_max_age", 0.3))
+            except (ValueError, TypeError):
+                state_max_age = 0.3
+            instance["world_state"] = WorldState(instance["script_api"], max_age=state_max_age, tracker=instance["world_tracker"],
+                                                 async_api=instance["script_api_async"])
+            # world_stream_encoding 設為 "packed" 時，203 以二進位打包推送，降低解析 JSON 的 CPU 負擔
+            stream_encoding = instance["config"].get("world_stream_encoding", "json")
+            instance["world_stream"] = WorldStream(instance["script_api"], interval_ms=stream_interval,
+                                                   state=instance["world_state"], encoding=stream_encoding)
             self.log_message(f"[{name}] RPC主腳本載入成功！")
 
             def _pre_fetch_keys():
@@ -3971,7 +4153,7 @@ class App:
                         self.log_message(f"[{name}] 預讀失敗: 無法獲取背包列表。")
                         return
                     
-                    inv_data = json.loads(inv_str)
+                    inv_data = json_codec.loads(inv_str)
                     if inv_data.get("status") != "success": return
 
                     found_names = set()
@@ -3996,17 +4178,23 @@ class App:
             if "barrier_toggle_button" in ui:
                 self.root.after(0, lambda: ui["barrier_toggle_button"].config(state='normal'))
             self.root.after(0, lambda: ui["connect_button"].config(state='normal', text="已連接"))
+            report("已連接")
+            return True
 
         except Exception as e:
             self.log_message(f"[{name}] 連接失敗: {e}")
-            self.root.after(0, lambda: messagebox.showerror(f"[{name}] 連接錯誤", f"發生錯誤: {e}"))
+            report(f"失敗: {e}")
+            if interactive:
+                self.root.after(0, lambda: messagebox.showerror(f"[{name}] 連接錯誤", f"發生錯誤: {e}"))
             self.root.after(0, lambda: self.reset_connect_button(name))
+            return False
 
     def process_and_log_json(self, name, payload_str, purpose=None):
+        """payload_str 可為 RPC 回傳的 JSON 字串，或呼叫端已解析的 dict / list (不再重複解析)。"""
         try:
             ui = self.instances[name]["ui"]
             keep_fields_str = ui["keep_fields_entry"].get().strip()
-            parsed_data = json.loads(payload_str)
+            parsed_data = payload_str if isinstance(payload_str, (dict, list)) else json_codec.loads(payload_str)
 
             if purpose == "list_players" and parsed_data.get("status") == "success":
                 all_objects = parsed_data.get("data", [])
@@ -4184,6 +4372,16 @@ class App:
 
     def on_message_display(self, message, data, name):
         if message['type'] == 'send':
+            payload = message['payload']
+            # agent 主動推送的周圍物件快照，交給 world_stream 處理，不寫入日誌
+            if isinstance(payload, dict) and payload.get('type') == 'world':
+                stream = self.instances.get(name, {}).get("world_stream")
+                if stream:
+                    stream.on_frame(payload, data)
+                recorder = self.instances.get(name, {}).get("capture")
+                if recorder:
+                    recorder.record_frame(payload, data)
+                return
             # 檢查 payload 是否以 "[RPC]" 開頭，如果是則不處理，以抑制日誌
             if isinstance(message['payload'], str) and message['payload'].startswith('[RPC]'):
                 pass # 忽略 RPC 訊息
@@ -4260,11 +4458,210 @@ class App:
             if name in self.instances:
                 self.instances[name]["session"] = None
                 self.instances[name]["is_monitoring"] = False
+                if self.instances[name].get("script_api"):
+                    self.instances[name]["script_api"].close()
                 self.instances[name]["script_api"] = None
+                self.instances[name]["script_api_async"] = None
                 self.instances[name]["script_object"] = None
+                self.instances[name]["world_tracker"] = None
+                if self.instances[name].get("world_stream"):
+                    self.instances[name]["world_stream"].close()
+                self.instances[name]["world_stream"] = None
+                self.instances[name]["world_state"] = None
                 if self.root.winfo_exists():
                     self.root.after(0, lambda: self.reset_connect_button(name))
 
+    def _start_resumable_loop(self, name, flag_key, target, args):
+        """
+        啟動 RESUMABLE_LOOPS 中的迴圈，並記住啟動參數供斷線重連後恢復。
+        target 為協程函式時提交到 rpc_hub (欄位保存 concurrent.futures.Future)，否則啟動執行緒。
+
+        迴圈結束時若連線仍正常 (使用者停止或迴圈自行結束) 就移除記錄；
+        若是因為斷線而結束則保留，重連成功後以相同參數重新啟動。
+        """
+        instance = self.instances[name]
+        thread_key = RESUMABLE_LOOPS[flag_key][0]
+        instance.setdefault("resume_loops", {})[flag_key] = (target, args)
+
+        def finished():
+            session = instance.get("session")
+            try:
+                connected = session is not None and not session.is_detached()
+            except Exception:
+                connected = False
+            if connected and not instance.get("is_reconnecting"):
+                resume_loops = instance.get("resume_loops", {})
+                if resume_loops.get(flag_key, (None, None))[1] is args:
+                    resume_loops.pop(flag_key, None)
+
+        if asyncio.iscoroutinefunction(target):
+            async def run_async():
+                try:
+                    await target(*args)
+                finally:
+                    finished()
+
+            instance[thread_key] = self.rpc_hub.submit(run_async())
+            return
+
+        def run():
+            try:
+                target(*args)
+            finally:
+                finished()
+
+        instance[thread_key] = threading.Thread(target=run, daemon=True)
+        instance[thread_key].start()
+
+    @staticmethod
+    def _loop_alive(handle):
+        """_start_resumable_loop 的迴圈 (執行緒或 rpc_hub 的 Future) 是否仍在執行。"""
+        if handle is None:
+            return False
+        if isinstance(handle, threading.Thread):
+            return handle.is_alive()
+        return not handle.done()
+
+    @staticmethod
+    def _join_loop(handle, timeout):
+        """等待迴圈結束，最多 timeout 秒。"""
+        if handle is None:
+            return
+        if isinstance(handle, threading.Thread):
+            handle.join(timeout=timeout)
+        else:
+            concurrent.futures.wait([handle], timeout=timeout)
+
+    def on_rpc_hung(self, name, hung, method_name, elapsed):
+        """RpcClient 看門狗的回呼: agent 停止回應 / 恢復回應。"""
+        if hung:
+            self.log_message(f"[{name}] 警告: RPC {method_name} 已 {elapsed:.0f} 秒未回應，遊戲執行緒可能卡住。")
+        else:
+            self.log_message(f"[{name}] RPC 已恢復回應。")
+
+    def on_session_detached(self, name, session, reason):
+        """Frida session 的 detached 事件 (於 Frida 的執行緒呼叫)。"""
+        instance = self.instances.get(name)
+        if instance is None or reason == "application-requested":
+            return # 程式主動分離 (重新連接/關閉程式)
+        current = instance.get("session")
+        if current is not None and current is not session:
+            return # 已經換成新的連線
+        self.log_message(f"[{name}] 連線已中斷 (原因: {reason})")
+        self._begin_auto_reconnect(name)
+
+    def on_script_destroyed(self, name, script):
+        """RPC 腳本的 destroyed 事件；session 仍在但腳本被卸載時同樣視為斷線。"""
+        instance = self.instances.get(name)
+        if instance is None or instance.get("script_object") is not script:
+            return
+        self.log_message(f"[{name}] RPC 腳本已被卸載")
+        self._begin_auto_reconnect(name)
+
+    def _begin_auto_reconnect(self, name):
+        instance = self.instances[name]
+        if self.is_closing or instance.get("is_reconnecting"):
+            return
+        instance["is_reconnecting"] = True
+
+        # 清除連線狀態 (與 handle_script_error 相同)，讓仍在執行的迴圈盡快結束
+        instance["session"] = None
+        if instance.get("script_api"):
+            instance["script_api"].close()
+        instance["script_api"] = None
+        instance["script_api_async"] = None
+        instance["script_object"] = None
+        instance["world_tracker"] = None
+        if instance.get("world_stream"):
+            instance["world_stream"].close()
+        instance["world_stream"] = None
+        instance["world_state"] = None
+        resume_flags = list(instance.get("resume_loops", {}))
+        for flag_key in resume_flags:
+            instance[flag_key] = False
+
+        if not instance["config"].get("auto_reconnect", True):
+            instance["is_reconnecting"] = False
+            instance["resume_loops"] = {}
+            self.log_message(f"[{name}] 未啟用自動重連，請重新連接。")
+            if self.root.winfo_exists():
+                self.root.after(0, lambda: self.reset_connect_button(name))
+            return
+
+        threading.Thread(target=self._auto_reconnect_thread, args=(name, resume_flags), daemon=True).start()
+
+    def _auto_reconnect_thread(self, name, resume_flags):
+        """以指數退避重新連接，成功後恢復斷線前正在執行的迴圈。"""
+        instance = self.instances[name]
+        try:
+            max_attempts = int(instance["config"].get("auto_reconnect_max_attempts", 10))
+        except (ValueError, TypeError):
+            max_attempts = 10
+        delay = RECONNECT_INITIAL_DELAY
+        connected = False
+        try:
+            for attempt in range(1, max_attempts + 1):
+                self.log_message(f"[{name}] {delay} 秒後嘗試自動重連 ({attempt}/{max_attempts})...")
+                if self.root.winfo_exists():
+                    self.root.after(0, lambda a=attempt: instance["ui"]["connect_button"].config(state='disabled', text=f"重連中({a})..."))
+                time.sleep(delay)
+                if self.is_closing:
+                    return
+                if instance.get("script_api"):
+                    connected = True # 使用者已手動重新連接
+                    break
+                if self.establish_connection(name, interactive=False):
+                    connected = True
+                    break
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        finally:
+            instance["is_reconnecting"] = False
+
+        if not connected:
+            instance["resume_loops"] = {}
+            self.log_message(f"[{name}] 自動重連失敗，請手動重新連接。")
+            return
+
+        # 等待舊的迴圈執行緒結束，避免其結束時的清理覆蓋恢復後的狀態
+        for flag_key in resume_flags:
+            old_loop = instance.get(RESUMABLE_LOOPS[flag_key][0])
+            if self._loop_alive(old_loop):
+                self._join_loop(old_loop, 5)
+        if resume_flags and self.root.winfo_exists():
+            self.root.after(0, lambda: self._resume_loops(name, resume_flags))
+
+    def _resume_loops(self, name, resume_flags):
+        instance = self.instances[name]
+        ui = instance["ui"]
+        for flag_key in resume_flags:
+            entry = instance.get("resume_loops", {}).get(flag_key)
+            thread_key, label = RESUMABLE_LOOPS[flag_key]
+            if instance.get(flag_key):
+                continue # 使用者已手動重新啟動
+            if entry is None or self._loop_alive(instance.get(thread_key)):
+                self.log_message(f"[{name}] 無法恢復{label}，請手動重新啟動。")
+                continue
+            instance[flag_key] = True
+            self._start_resumable_loop(name, flag_key, *entry)
+            self.log_message(f"[{name}] 重連成功，已恢復{label}")
+
+            if flag_key == "is_priority_targeting":
+                if "priority_targeting_button" in ui and ui["priority_targeting_button"].winfo_exists():
+                    ui["priority_targeting_button"].config(text="停止")
+            elif flag_key == "is_monitoring":
+                self.set_action_buttons_state(name, 'disabled')
+                ui["monitor_button"].config(state='normal', text="停止監控")
+            elif flag_key == "is_patrolling":
+                if "patrol_button" in ui and ui["patrol_button"].winfo_exists():
+                    ui["patrol_button"].config(text="停止巡邏")
+                if "patrol_control_button" in ui and ui["patrol_control_button"].winfo_exists():
+                    ui["patrol_control_button"].config(text="自動巡邏 (運行中)")
+            elif flag_key == "is_general_afk_running":
+                if "general_afk_toggle_button" in ui and ui["general_afk_toggle_button"].winfo_exists():
+                    ui["general_afk_toggle_button"].config(text="停止掛機")
+                if "general_afk_button" in ui and ui["general_afk_button"].winfo_exists():
+                    ui["general_afk_button"].config(text="掛機中", style='Red.Taller.TButton')
+
     def reset_connect_button(self, name):
         if self.root.winfo_exists() and name in self.instances:
             ui = self.instances[name]["ui"]
@@ -5170,7 +5567,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                 raise Exception("獲取角色資訊失敗 (RPC get_info(201) 未返回任何資料)")
 
             pos_x, pos_y = None, None
-            player_data = json.loads(player_info_str)
+            player_data = json_codec.loads(player_info_str)
             info_dict = player_data.get('data', player_data)
 
             if 'x' in info_dict and 'y' in info_dict:
@@ -5196,7 +5593,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
         instance, ui = self.instances[name], self.instances[name]["ui"]
         try:
             self.log_message(f"[{name}] 正在使用 itemKey: {item_key} ...")
-            result = api.use_item(str(item_key))
+            result = api.use_item(str(item_key), lane="emergency")
             self.log_message(f"[{name}] RPC use_item 返回: {result}")
 
             if instance.get("detection_start_time"):
@@ -5212,7 +5609,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                 player_info_str = api.get_info(201)
                 current_zone = -1
                 if player_info_str:
-                    try: current_zone = json.loads(player_info_str).get('zone', -1)
+                    try: current_zone = json_codec.loads(player_info_str).get('zone', -1)
                     except json.JSONDecodeError: self.log_message(f"[{name}] 錯誤: 解析玩家資訊JSON失敗。")
                 if current_zone == 1:
                     self.log_message(f"[{name}] 已確認回到安全區域 (zone = {current_zone})。")
@@ -5262,6 +5659,21 @@ skinuse：在GameHelper 找409指令(int i ,long j)
             self.log_message(f"[{name}] RPC moveTo 發生錯誤: {e}")
             self.handle_script_error(e, name)
 
+    async def _moveto_async(self, name, x, y):
+        """execute_moveto_script 的協程版本。"""
+        instance = self.instances[name]
+        try:
+            self.log_message(f"--- [{name}] 準備執行移動指令: X={x}, Y={y} ---")
+            api = instance.get("script_api_async")
+            if not api:
+                raise Exception("RPC 尚未就緒，無法執行移動。")
+            self.log_message(f"[{name}] 正在呼叫 RPC api.moveto({x}, {y})...")
+            result = await api.moveto(x, y)
+            self.log_message(f"[{name}] RPC moveTo 回傳結果: {result}")
+        except Exception as e:
+            self.log_message(f"[{name}] RPC moveTo 發生錯誤: {e}")
+            self.handle_script_error(e, name)
+
     def back_to_village_thread(self, name, internal_call=False):
         instance, ui = self.instances[name], self.instances[name]["ui"]
         if not internal_call and (instance["is_monitoring"] or instance["is_seq_moving"]):
@@ -5299,7 +5711,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                 find_item_start_time = time.time()
                 self.log_message(f"[{name}] 2/3 成功獲取背包列表，正在尋找 '{item_name_to_use}'...")
                 try:
-                    inventory_data = json.loads(inventory_json_str)
+                    inventory_data = json_codec.loads(inventory_json_str)
                     if inventory_data.get("status") == "success":
                         for item in inventory_data.get("data", []):
                             if item.get("itemName") == item_name_to_use:
@@ -5331,7 +5743,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
             player_info_str = api.get_info(201)
             current_zone = -1
             if player_info_str:
-                try: current_zone = json.loads(player_info_str).get('zone', -1)
+                try: current_zone = json_codec.loads(player_info_str).get('zone', -1)
                 except json.JSONDecodeError: self.log_message(f"[{name}] 錯誤: 解析玩家資訊JSON失敗。")
             if current_zone != 1: self.log_message(f"[{name}] 警告: 經過多次嘗試後仍未回到安全區域。目前區域: {current_zone}")
 
@@ -5364,14 +5776,13 @@ skinuse：在GameHelper 找409指令(int i ,long j)
             api = instance["script_api"]
             self.log_message(f"[{name}] 1/3 正在透過RPC獲取背包列表...")
             inventory_json_str = api.get_info(202)
-            self.process_and_log_json(name, inventory_json_str) # Log the full inventory
-
             if not inventory_json_str: raise Exception("RPC get_info(202) 未返回任何資料")
 
             self.log_message(f"[{name}] 2/3 成功獲取背包列表，正在尋找物品...")
             item_key = None
             try:
-                inventory_data = json.loads(inventory_json_str)
+                inventory_data = json_codec.loads(inventory_json_str)
+                self.process_and_log_json(name, inventory_data) # Log the full inventory
                 if inventory_data.get("status") == "success":
                     for item in inventory_data.get("data", []):
                         if item.get("itemName") == item_name:
@@ -5609,7 +6020,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
             if not skills_str:
                 raise Exception("獲取技能列表失敗 (RPC get_info(218) 未返回任何資料)")
             
-            skills_data = json.loads(skills_str)
+            skills_data = json_codec.loads(skills_str)
             if skills_data.get("status") != "success":
                 raise Exception(f"獲取技能列表失敗: {skills_data.get('message', '未知錯誤')}")
 
@@ -5921,7 +6332,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                 self.log_message(f"[{name}] 錯誤: 獲取周圍物件失敗 (RPC get_info(203) 未返回任何資料)")
                 return None
             
-            world_data = json.loads(world_info_str)
+            world_data = json_codec.loads(world_info_str)
             if world_data.get("status") == "success":
                 return world_data.get("data", [])
             else:
@@ -5979,75 +6390,89 @@ skinuse：在GameHelper 找409指令(int i ,long j)
             return None
 
         try:
-            # 1. Get player position
-            player_info_str = api.get_info(201)
-            if not player_info_str:
-                self.log_message(f"[{name}] [分佈偵測] 無法獲取玩家資訊。")
-                return None
-            
-            player_json = json.loads(player_info_str)
-            player_data = player_json.get('data', player_json)
-            px, py = player_data.get('x'), player_data.get('y')
-
-            if px is None or py is None:
-                self.log_message(f"[{name}] [分佈偵測] 無法獲取玩家座標。")
-                return None
-
-            # 2. Get surrounding objects
-            world_info_str = api.get_info(203)
-            if not world_info_str:
-                self.log_message(f"[{name}] [分佈偵測] 無法獲取周圍物件資訊。")
-                return None
-            
-            world_json = json.loads(world_info_str)
-            world_data = world_json.get('data', [])
-            
-            # 3. Filter for monsters and categorize by direction
-            dir_symbols = ["↗", "→", "↘", "↓", "↙", "←", "↖", "↑"]
-            monster_counts = {s: 0 for s in dir_symbols}
-            
-            for obj in world_data:
-                if obj.get("type") == 6: # Type 6 is monster
-                    mx, my = obj.get('x'), obj.get('y')
-                    if mx is None or my is None: continue
-                    
-                    dx = mx - px
-                    dy = my - py
-                    
-                    # 計算角度 (0~360度)
-                    angle = math.degrees(math.atan2(dy, dx))
-                    if angle < 0:
-                        angle += 360
-
-                    # 判斷方位（基於角度）
-                    # 右上(0°), 正右(26.6°), 右下(90°), 正下(153.4°), 左下(180°), 正左(206.6°), 左上(270°), 正上(333.4°)
-                    direction = None
-                    if angle >= 346.7 or angle < 13.3:
-                        direction = "↗" # 右上
-                    elif 13.3 <= angle < 58.3:
-                        direction = "→" # 正右
-                    elif 58.3 <= angle < 121.7:
-                        direction = "↘" # 右下
-                    elif 121.7 <= angle < 166.7:
-                        direction = "↓" # 正下
-                    elif 166.7 <= angle < 193.3:
-                        direction = "↙" # 左下
-                    elif 193.3 <= angle < 238.3:
-                        direction = "←" # 正左
-                    elif 238.3 <= angle < 301.7:
-                        direction = "↖" # 左上
-                    else: # 301.7 <= angle < 346.7
-                        direction = "↑" # 正上
-                    
-                    if direction:
-                        monster_counts[direction] += 1
-            
-            return monster_counts
+            # 1. Get player position and surrounding monsters (只取怪物座標，一次 RPC)
+            player_info_str, world_info_str = api.get_info_batch([201, [203, MONSTER_POSITION_PROJECTION]])
+            return self._count_monster_directions(name, player_info_str, world_info_str)
+        except Exception as e:
+            self.log_message(f"[{name}] [分佈偵測] 執行時發生錯誤: {e}")
+            return None
 
+    async def _get_monster_distribution_async(self, name):
+        """_get_monster_distribution 的協程版本。"""
+        api = self.instances[name].get("script_api_async")
+        if not api:
+            return None
+        try:
+            player_info_str, world_info_str = await api.get_info_batch([201, [203, MONSTER_POSITION_PROJECTION]])
+            return self._count_monster_directions(name, player_info_str, world_info_str)
         except Exception as e:
             self.log_message(f"[{name}] [分佈偵測] 執行時發生錯誤: {e}")
             return None
 
+    def _count_monster_directions(self, name, player_info_str, world_info_str):
+        """依 201 與 203 的原始字串統計各方向的怪物數量，資料不足時回傳 None。"""
+        if not player_info_str:
+            self.log_message(f"[{name}] [分佈偵測] 無法獲取玩家資訊。")
+            return None
+        
+        player_json = json_codec.loads(player_info_str)
+        player_data = player_json.get('data', player_json)
+        px, py = player_data.get('x'), player_data.get('y')
+
+        if px is None or py is None:
+            self.log_message(f"[{name}] [分佈偵測] 無法獲取玩家座標。")
+            return None
+
+        # 2. Check surrounding objects
+        if not world_info_str:
+            self.log_message(f"[{name}] [分佈偵測] 無法獲取周圍物件資訊。")
+            return None
+        
+        world_json = json_codec.loads(world_info_str)
+        world_data = world_json.get('data', [])
+        
+        # 3. Filter for monsters and categorize by direction
+        dir_symbols = ["↗", "→", "↘", "↓", "↙", "←", "↖", "↑"]
+        monster_counts = {s: 0 for s in dir_symbols}
+        
+        for obj in world_data:
+            if obj.get("type") == 6: # Type 6 is monster
+                mx, my = obj.get('x'), obj.get('y')
+                if mx is None or my is None: continue
+                
+                dx = mx - px
+                dy = my - py
+                
+                # 計算角度 (0~360度)
+                angle = math.degrees(math.atan2(dy, dx))
+                if angle < 0:
+                    angle += 360
+
+                # 判斷方位（基於角度）
+                # 右上(0°), 正右(26.6°), 右下(90°), 正下(153.4°), 左下(180°), 正左(206.6°), 左上(270°), 正上(333.4°)
+                direction = None
+                if angle >= 346.7 or angle < 13.3:
+                    direction = "↗" # 右上
+                elif 13.3 <= angle < 58.3:
+                    direction = "→" # 正右
+                elif 58.3 <= angle < 121.7:
+                    direction = "↘" # 右下
+                elif 121.7 <= angle < 166.7:
+                    direction = "↓" # 正下
+                elif 166.7 <= angle < 193.3:
+                    direction = "↙" # 左下
+                elif 193.3 <= angle < 238.3:
+                    direction = "←" # 正左
+                elif 238.3 <= angle < 301.7:
+                    direction = "↖" # 左上
+                else: # 301.7 <= angle < 346.7
+                    direction = "↑" # 正上
+                
+                if direction:
+                    monster_counts[direction] += 1
+        
+        return monster_counts
+
 
 
 
@@ -6130,7 +6555,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
             player_info_str = api.get_info(201)
             if not player_info_str: raise Exception("獲取角色資訊失敗 (RPC get_info(201) 未返回任何資料)")
 
-            player_data = json.loads(player_info_str)
+            player_data = json_codec.loads(player_info_str)
             info_dict = player_data.get('data', player_data)
             pos_x, pos_y = info_dict.get('x'), info_dict.get('y')
 
@@ -6179,100 +6604,14 @@ skinuse：在GameHelper 找409指令(int i ,long j)
         ui["specify_target_button"].config(state='disabled', text="搜尋中...")
         threading.Thread(target=self.execute_specify_closest_target, args=(name, target_names), daemon=True).start()
 
-    def execute_specify_closest_target(self, name, target_names, update_ui=True, log_verbose_output=True):
+    def execute_specify_closest_target(self, name, target_names, update_ui=True, log_verbose_output=True, lane="normal"):
         instance, ui = self.instances[name], self.instances[name]["ui"]
         try:
             if log_verbose_output: self.log_message(f"--- [{name}] 開始搜尋並指定最近目標: {target_names} ---")
             api = instance["script_api"]
-
-            # 1. Get Player Info
-            player_info_str = api.get_info(201)
-            if not player_info_str: raise Exception("獲取角色資訊失敗 (RPC get_info(201) 未返回任何資料)")
-            player_json = json.loads(player_info_str)
-            player_data = player_json.get('data', player_json)
-            px, py = player_data.get('x'), player_data.get('y')
-            if px is None or py is None: raise Exception("在指令 201 的回傳中找不到玩家座標 ('x', 'y')。")
-
-            # 2. Get Surrounding Objects
-            world_info_str = api.get_info(203)
-            if not world_info_str: raise Exception("獲取周圍物件失敗 (RPC get_info(203) 未返回任何資料)")
-            world_json = json.loads(world_info_str)
-            world_data = world_json.get('data', [])
-            if not world_data:
-                if log_verbose_output: self.log_message(f"[{name}] -> 周圍未發現任何物件。")
-                return
-
-            # 3. Decide which logic to use based on the checkbox
-            use_priority_order = ui["specify_target_priority_var"].get()
-
-            closest_target = None
-
-            if use_priority_order:
-                # --- Sequential Priority Logic ---
-                if log_verbose_output: self.log_message(f"[{name}] -> 啟用順序優先級模式。")
-                for target_line in target_names:
-                    # Support multiple targets on the same priority level separated by '|'
-                    sub_patterns = [p.strip() for p in target_line.split('|') if p.strip()]
-                    matched_objects_at_this_level = []
-                    
-                    for sub_pattern in sub_patterns:
-                        for obj in world_data:
-                            obj_name = obj.get("name")
-                            if obj.get("type") not in [2, 6, 3]: continue
-                            
-                            is_matched = False
-                            if sub_pattern.endswith("*"):
-                                if obj_name and obj_name.startswith(sub_pattern[:-1]): is_matched = True
-                            elif obj_name == sub_pattern: is_matched = True
-                            
-                            if is_matched:
-                                # Avoid duplicates if an object matches multiple patterns (unlikely but possible)
-                                if obj not in matched_objects_at_this_level:
-                                    matched_objects_at_this_level.append(obj)
-                    
-                    if matched_objects_at_this_level:
-                        if log_verbose_output: self.log_message(f"[{name}] -> 在優先級 '{target_line}' 找到 {len(matched_objects_at_this_level)} 個目標，選擇最近的一個。")
-                        closest_target = min(matched_objects_at_this_level, key=lambda m: math.hypot(m.get("x", px) - px, m.get("y", py) - py))
-                        break # Found a target at this priority level, stop searching further down the list
-            else:
-                # --- Original "Closest of All" Logic ---
-                if log_verbose_output: self.log_message(f"[{name}] -> 禁用順序優先級，搜尋所有目標中最近的一個。")
-                all_matched_objects = []
-                for obj in world_data:
-                    obj_name = obj.get("name")
-                    if obj.get("type") not in [2, 6, 3]: continue
-                    
-                    for target_name_pattern in target_names:
-                        is_matched = False
-                        if target_name_pattern.endswith("*"):
-                            if obj_name and obj_name.startswith(target_name_pattern[:-1]): is_matched = True
-                        elif obj_name == target_name_pattern: is_matched = True
-                        
-                        if is_matched:
-                            all_matched_objects.append(obj)
-                            break # Move to the next object once it's matched
-                
-                if all_matched_objects:
-                    closest_target = min(all_matched_objects, key=lambda m: math.hypot(m.get("x", px) - px, m.get("y", py) - py))
-
-            # 4. Set target if one was found
-            if closest_target:
-                target_key = closest_target.get("objectKey")
-                target_name = closest_target.get("name")
-                min_distance = math.hypot(closest_target.get("x", px) - px, closest_target.get("y", py) - py)
-                
-                self.log_message(f"[{name}] 指定最近目標: '{target_name}' (距離: {min_distance:.2f})")
-                
-                result = api.set_target(str(target_key))
-                #if log_verbose_output: self.log_message(f"[{name}] -> RPC setTarget 返回: {result}")
-
-                if ui["auto_attack_pickup_var"].get():
-                    #if log_verbose_output: self.log_message(f"[{name}] 自動攻擊/撿取已啟用，執行 attackPickup...")
-                    time.sleep(0.1)
-                    attack_pickup_result = api.attack_pickup()
-                    #if log_verbose_output: self.log_message(f"[{name}] RPC attackPickup 返回: {attack_pickup_result}")
-            else:
-                if log_verbose_output: self.log_message(f"[{name}] -> 在周圍找不到任何符合條件的目標。")
+            options = self._select_nearest_options(name, ui, log_verbose_output)
+            raw = api.select_nearest(target_names, options, lane=lane)
+            self._report_select_nearest(name, raw, options, log_verbose_output)
 
         except Exception as e:
             self.log_message(f"[{name}] 錯誤: '指定最近目標' 流程發生未知錯誤: {e}")
@@ -6280,18 +6619,64 @@ skinuse：在GameHelper 找409指令(int i ,long j)
         finally:
             if update_ui and self.root.winfo_exists():
                 self.root.after(0, lambda: ui["specify_target_button"].config(state='normal', text="最近目標"))
-    def execute_specify_closest_monster(self, name):
+
+    async def _specify_closest_target_async(self, name, target_names):
+        """execute_specify_closest_target 的協程版本，供 rpc_hub 上的定時指定目標使用 (routine 通道，不輸出詳細訊息)。"""
         instance, ui = self.instances[name], self.instances[name]["ui"]
+        try:
+            api = instance["script_api_async"]
+            if api is None:
+                raise Exception("RPC 尚未就緒，無法指定目標。")
+            options = self._select_nearest_options(name, ui, False)
+            raw = await api.select_nearest(target_names, options, lane="routine")
+            self._report_select_nearest(name, raw, options, False)
+        except Exception as e:
+            self.log_message(f"[{name}] 錯誤: '指定最近目標' 流程發生未知錯誤: {e}")
+            self.handle_script_error(e, name)
+
+    def _select_nearest_options(self, name, ui, log_verbose_output):
+        """selectNearest 的選項: 由 agent 依優先順序挑選最近的目標並直接指定 (與攻擊/撿取)，只回傳結果。"""
+        use_priority_order = ui["specify_target_priority_var"].get()
+        if log_verbose_output:
+            self.log_message(f"[{name}] -> {'啟用順序優先級模式。' if use_priority_order else '禁用順序優先級，搜尋所有目標中最近的一個。'}")
+        # 玩家/怪物/掉落物，勾選自動攻擊/撿取時一併攻擊
+        return {
+            "usePriority": bool(use_priority_order),
+            "types": [2, 6, 3],
+            "action": "attack" if ui["auto_attack_pickup_var"].get() else "target",
+        }
+
+    def _report_select_nearest(self, name, raw, options, log_verbose_output):
+        """輸出 selectNearest 的結果；agent 回傳錯誤時拋出例外。"""
+        if raw is None:
+            # routine 通道因限速被放棄，這次不指定
+            return
+        result = json_codec.loads(raw)
+
+        if result.get("status") == "success":
+            if log_verbose_output and options["usePriority"]:
+                self.log_message(f"[{name}] -> 在優先級 '{result.get('pattern', '')}' 找到目標。")
+            self.log_message(f"[{name}] 指定最近目標: '{result.get('name')}' (距離: {result.get('distance', 0):.2f})")
+        elif result.get("status") == "not_found":
+            if log_verbose_output: self.log_message(f"[{name}] -> 在周圍找不到任何符合條件的目標。")
+        else:
+            raise Exception(result.get("message", "selectNearest 失敗"))
+
+    async def execute_specify_closest_monster(self, name):
+        """指定並攻擊最近的怪物 (自動巡邏的協程使用)"""
+        instance = self.instances[name]
         try:
             self.log_message(f"--- [{name}] 開始搜尋並指定最近的怪物 ---")
-            api = instance["script_api"]
+            api = instance["script_api_async"]
+            if api is None:
+                raise Exception("RPC 尚未就緒，無法指定怪物。")
 
             # 1. Get Player Info
-            player_info_str = api.get_info(201)
+            player_info_str = await api.get_info(201)
             if not player_info_str:
                 raise Exception("獲取角色資訊失敗 (RPC get_info(201) 未返回任何資料)")
 
-            player_json = json.loads(player_info_str)
+            player_json = json_codec.loads(player_info_str)
             player_data = player_json.get('data', player_json)
             px, py = player_data.get('x'), player_data.get('y')
 
@@ -6300,11 +6685,11 @@ skinuse：在GameHelper 找409指令(int i ,long j)
             self.log_message(f"[{name}] -> 玩家座標: X={px}, Y={py}")
 
             # 2. Get Surrounding Objects
-            world_info_str = api.get_info(203)
+            world_info_str = await api.get_info(203)
             if not world_info_str:
                 raise Exception("獲取周圍物件失敗 (RPC get_info(203) 未返回任何資料)")
 
-            world_json = json.loads(world_info_str)
+            world_json = json_codec.loads(world_info_str)
             world_data = world_json.get('data', [])
             if not world_data:
                 self.log_message(f"[{name}] -> 周圍未發現任何物件。")
@@ -6334,16 +6719,11 @@ skinuse：在GameHelper 找409指令(int i ,long j)
             target_key = closest_monster.get("objectKey")
             target_name = closest_monster.get("name")
             self.log_message(f"[{name}] 最近的怪物是 '{target_name}' (距離: {min_distance:.2f})，ObjectKey: {target_key}")
-            self.log_message(f"[{name}] -> 正在使用 RPC setTarget 進行指定...")
-            
-            result = api.set_target(str(target_key))
-            self.log_message(f"[{name}] -> RPC setTarget 返回: {result}")
+            self.log_message(f"[{name}] -> 正在使用 RPC targetAndAttack 指定並攻擊/撿取...")
             
-            # 5. Attack after targeting
-            self.log_message(f"[{name}] -> 指定目標後，執行攻擊/撿取...")
-            time.sleep(0.1) # Small delay to ensure target is set
-            attack_result = api.attack_pickup()
-            self.log_message(f"[{name}] -> RPC attackPickup 返回: {attack_result}")
+            # 5. Target and attack in one call
+            attack_result = await api.target_and_attack(str(target_key))
+            self.log_message(f"[{name}] -> RPC targetAndAttack 返回: {attack_result}")
             self.log_message(f"--- [{name}] 指定並攻擊最近怪物 '{target_name}' 完成 ---")
 
         except Exception as e:
@@ -6372,8 +6752,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
 
         instance["is_timed_targeting"] = True
         ui["timed_target_button"].config(text="停止定時")
-        instance["timed_target_thread"] = threading.Thread(target=self.timed_specify_target_loop, args=(name, interval), daemon=True)
-        instance["timed_target_thread"].start()
+        instance["timed_target_task"] = self.rpc_hub.submit(self.timed_specify_target_loop(name, interval))
 
     def toggle_all_timed_specify_target(self):
         """同時啟動或關閉所有獨立控制區塊的定時指定目標"""
@@ -6512,8 +6891,8 @@ skinuse：在GameHelper 找409指令(int i ,long j)
         try:
             while self._is_hp_detecting:
                 try:
-                    # 使用 203 指令獲取周圍物件
-                    world_info_str = api.get_info(203)
+                    # 使用 203 指令獲取周圍怪物 (agent 端只保留血量相關欄位)
+                    world_info_str = api.get_info(203, MONSTER_HP_PROJECTION)
                     
                     if not world_info_str:
                         self.log_message(f"[偵測] 無法獲取周圍物件資料")
@@ -6522,7 +6901,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                         continue
                     
                     # 解析 JSON 資料
-                    world_json = json.loads(world_info_str)
+                    world_json = json_codec.loads(world_info_str)
                     all_objects = world_json.get('data', [])
                     
                     # 尋找所有同名的目標怪物
@@ -6642,29 +7021,34 @@ skinuse：在GameHelper 找409指令(int i ,long j)
 
 
 
-    def timed_specify_target_loop(self, name, interval):
+    async def timed_specify_target_loop(self, name, interval):
+        """定時指定目標協程 (在 rpc_hub 的事件迴圈中執行)"""
         instance = self.instances[name]
         ui = instance["ui"]
         self.log_message(f"--- [{name}] 開始定時指定目標 (間隔 {interval}s) ---")
 
+        target_names_raw, target_names = None, []
         try:
             while instance["is_timed_targeting"]:
-                target_names_raw = ui["specify_target_current_targets_text"].get("1.0", tk.END).strip()
-                if not target_names_raw:
+                raw = ui["specify_target_current_targets_text"].get("1.0", tk.END).strip()
+                if not raw:
                     self.log_message(f"[{name}] 定時指定目標: 目標列表為空，自動停止。")
                     break
 
-                target_names = [name.strip() for name in target_names_raw.split('\n') if name.strip()]
+                if raw != target_names_raw:
+                    # 清單內容改變時才重新拆分 (agent 端以相同的清單快取已編譯的比對器)
+                    target_names_raw = raw
+                    target_names = [line.strip() for line in raw.split('\n') if line.strip()]
                 
                 # self.log_message(f"[{name}] 定時指定目標: 執行一次搜尋...")
-                self.execute_specify_closest_target(name, target_names, update_ui=False, log_verbose_output=False)
+                await self._specify_closest_target_async(name, target_names)
                 
                 # Sleep for the interval, but check for the stop flag periodically
                 sleep_end_time = time.time() + interval
                 while time.time() < sleep_end_time:
                     if not instance["is_timed_targeting"]:
                         break
-                    time.sleep(0.1)
+                    await asyncio.sleep(0.1)
 
         except Exception as e:
             if instance["is_timed_targeting"]:
@@ -6681,22 +7065,40 @@ skinuse：在GameHelper 找409指令(int i ,long j)
 
 
     def _set_auto_state(self, name, enable):
+        api = self._auto_state_api(name, enable, "script_api")
+        if not api:
+            return
+        try:
+            api.toggle_auto(enable)
+            self.log_message(f"[{name}] 監控座標：成功 {'開啟' if enable else '關閉'} AUTO。")
+        except Exception as e:
+            self.log_message(f"[{name}] 錯誤: 自動切換 AUTO 時發生錯誤: {e}")
+
+    async def _set_auto_state_async(self, name, enable):
+        """_set_auto_state 的協程版本。"""
+        api = self._auto_state_api(name, enable, "script_api_async")
+        if not api:
+            return
+        try:
+            await api.toggle_auto(enable)
+            self.log_message(f"[{name}] 監控座標：成功 {'開啟' if enable else '關閉'} AUTO。")
+        except Exception as e:
+            self.log_message(f"[{name}] 錯誤: 自動切換 AUTO 時發生錯誤: {e}")
+
+    def _auto_state_api(self, name, enable, api_key):
+        """切換 AUTO 前的檢查: 回傳 instance[api_key]，無法切換時輸出原因並回傳 None。"""
         instance = self.instances[name]
         action = "開啟" if enable else "關閉"
         self.log_message(f"[{name}] 監控座標：自動 {action} AUTO...")
         auto_method_name = instance["ui"]["auto_method_entry"].get()
         if not auto_method_name:
             self.log_message(f"[{name}] 警告: 無法自動切換AUTO，因為未在進階參數中設定 'Auto Method'。")
-            return
-        api = instance.get("script_api")
+            return None
+        api = instance.get(api_key)
         if not api:
             self.log_message(f"[{name}] 警告: 無法自動切換AUTO，因為未連接。")
-            return
-        try:
-            api.toggle_auto(enable)
-            self.log_message(f"[{name}] 監控座標：成功 {action} AUTO。")
-        except Exception as e:
-            self.log_message(f"[{name}] 錯誤: 自動切換 AUTO 時發生錯誤: {e}")
+            return None
+        return api
 
     def _continuous_moveto_check(self, name, target_x, target_y):
         instance = self.instances[name]
@@ -6708,11 +7110,10 @@ skinuse：在GameHelper 找409指令(int i ,long j)
         try:
             while instance["is_monitoring"]:
                 try:
-                    player_info_str = api.get_info(201)
-                    if not player_info_str:
+                    player_data = instance["world_state"].get(201)
+                    if not player_data:
                         self.log_message(f"[{name}] 連續移動檢查: 無法獲取玩家資訊，中止返回程序。")
                         break
-                    player_data = json.loads(player_info_str)
                     info_dict = player_data.get('data', player_data)
                     current_x, current_y = None, None
                     if 'x' in info_dict and 'y' in info_dict: current_x, current_y = info_dict['x'], info_dict['y']
@@ -6781,7 +7182,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
         try:
             inv_result = api.get_info(202)
             if inv_result:
-                for item in json.loads(inv_result).get('data', []):
+                for item in json_codec.loads(inv_result).get('data', []):
                     if item.get("itemName") == "魔法卷軸(魔法屏障)(刻印)":
                         scroll_key = item.get("itemKey")
                         break
@@ -6820,7 +7221,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                         buff_result = api.get_info(206)
                         has_barrier = False
                         if buff_result:
-                            for buff in json.loads(buff_result).get('data', []):
+                            for buff in json_codec.loads(buff_result).get('data', []):
                                 if "魔法屏障" in buff.get("buffName", ""):
                                     has_barrier = True
                                     break
@@ -6883,7 +7284,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
         if params.get("is_pos_on"): # 只在啟用座標監控時才獲取地圖
             try:
                 player_info_str = api.get_info(201)
-                player_data = json.loads(player_info_str)
+                player_data = json_codec.loads(player_info_str)
                 info_dict = player_data.get('data', player_data)
                 instance["monitor_start_map"] = info_dict.get("mapName", "未知地圖")
                 self.log_message(f"[{name}] 監控啟動於地圖: {instance['monitor_start_map']}")
@@ -6896,17 +7297,16 @@ skinuse：在GameHelper 找409指令(int i ,long j)
         instance["is_monitoring"] = True
         self.set_action_buttons_state(name, 'disabled')
         ui["monitor_button"].config(state='normal', text="停止監控")
-        instance["monitor_thread"] = threading.Thread(target=self.monitoring_loop, args=(name, params), daemon=True)
-        instance["monitor_thread"].start()
+        self._start_resumable_loop(name, "is_monitoring", self.monitoring_loop, (name, params))
 
     def reset_monitoring_ui(self, name):
         if self.root.winfo_exists() and name in self.instances:
             self.set_action_buttons_state(name, 'normal')
             self.instances[name]["ui"]["monitor_button"].config(state='normal', text="開始監控")
 
-    def monitoring_loop(self, name, params):
+    async def monitoring_loop(self, name, params):
+        """監控協程 (在 rpc_hub 的事件迴圈中執行)"""
         instance = self.instances[name]
-        api = instance["script_api"]
         self.log_message(f"--- [{name}] 開始監控 ---") 
         if params.get("is_target_on"): self.log_message(f"[{name}] 目標監控已啟動: {params['targets']} (間隔 {params['target_interval']}s)")
         if params.get("is_pos_on"): self.log_message(f"[{name}] 座標監控已啟動: ({params['x']}, {params['y']}) 範圍 {params['range']} (間隔 {params['pos_interval']}s)")
@@ -6920,14 +7320,12 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                 if params.get("is_target_on") and now - last_checks["target"] > params["target_interval"]:
                     last_checks["target"] = now
                     try:
-                        player_info_str = api.get_info(201)
-                        if not player_info_str: continue
-                        player_data = json.loads(player_info_str)
+                        # 201 與 203 在同一次 RPC 中取得 (WorldState 的增量快照，推送中時直接使用最新一幀)
+                        player_data, world_data = await instance["world_state"].get_many_async([201, 203])
+                        if not player_data: continue
                         info_dict = player_data.get('data', player_data)
                         if info_dict.get('zone', -1) == 1: continue
-                        result = api.get_info(203)
-                        if result:
-                            world_data = json.loads(result)
+                        if world_data:
                             if isinstance(world_data, dict) and 'data' in world_data:
                                 for item in world_data['data']:
                                     if isinstance(item, dict) and item.get("name") in params["targets"]:
@@ -6946,7 +7344,8 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                                         if params.get("is_teleport_on"):
                                             instance["detection_start_time"] = time.time()
                                             self.log_message(f"--- [{name}] 在 [{map_name}] ({pos_x}, {pos_y}) 偵測到目標『{item['name']}』，執行回村 ---")
-                                            self.execute_back_to_village(name)
+                                            # 回村是一次性的多步驟流程，交給執行緒執行，監控隨即結束
+                                            threading.Thread(target=self.execute_back_to_village, args=(name,), daemon=True).start()
                                             instance["is_monitoring"] = False
                                             break
                                         else:
@@ -6957,10 +7356,9 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                 
                 if params.get("is_pos_on") and now - last_checks["pos"] > params["pos_interval"]:
                     last_checks["pos"] = now
-                    pos_result = api.get_info(201)
-                    if pos_result:
+                    player_data = await instance["world_state"].get_async(201)
+                    if player_data:
                         try:
-                            player_data = json.loads(pos_result)
                             info_dict = player_data.get('data', player_data)
 
                             # 檢查地圖是否變更
@@ -6980,7 +7378,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                                     threading.Thread(target=self._continuous_moveto_check, args=(name, params['x'], params['y']), daemon=True).start()
                         except json.JSONDecodeError: self.log_message(f"[{name}] 監控座標錯誤: 解析角色資訊JSON失敗。")
                         except Exception as e: self.log_message(f"[{name}] 監控座標時發生未預期錯誤: {e}")
-                time.sleep(0.2)
+                await asyncio.sleep(0.2)
         except Exception as e:
             if instance["is_monitoring"]:
                 self.log_message(f"[{name}] 監控迴圈發生嚴重錯誤: {e}")
@@ -7482,7 +7880,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
         api = instance["script_api"]
         try:
             player_info_str = api.get_info(201)
-            player_data = json.loads(player_info_str)
+            player_data = json_codec.loads(player_info_str)
             info_dict = player_data.get('data', player_data)
             start_map_name = info_dict.get("mapName", "未知地圖")
         except Exception as e:
@@ -7501,17 +7899,16 @@ skinuse：在GameHelper 找409指令(int i ,long j)
         if "patrol_control_button" in ui and ui["patrol_control_button"].winfo_exists():
             ui["patrol_control_button"].config(text="自動巡邏 (運行中)")
 
-        instance["patrol_thread"] = threading.Thread(target=self.patrol_loop, args=(name, params), daemon=True)
-        instance["patrol_thread"].start()
+        self._start_resumable_loop(name, "is_patrolling", self.patrol_loop, (name, params))
 
-    def execute_move_and_wait(self, name, target_x, target_y, start_map_name, arrival_threshold=5):
+    async def execute_move_and_wait(self, name, target_x, target_y, start_map_name, arrival_threshold=5):
+        """移動並等待抵達 (自動巡邏的協程使用)"""
         instance = self.instances[name]
-        api = instance["script_api"]
         move_interval = 2      # 每隔幾秒重新發送移動指令
         wait_timeout = 20      # 最長等待時間
 
         self.log_message(f"[{name}] 開始移動並等待抵達: ({target_x}, {target_y})")
-        self.execute_moveto_script(name, target_x, target_y) # 發送第一次移動指令
+        await self._moveto_async(name, target_x, target_y) # 發送第一次移動指令
 
         start_time = time.time()
         last_move_time = start_time
@@ -7522,12 +7919,11 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                 return
 
             try:
-                player_info_str = api.get_info(201)
-                if not player_info_str: 
-                    time.sleep(0.5)
+                player_data = await instance["world_state"].get_async(201)
+                if not player_data: 
+                    await asyncio.sleep(0.5)
                     continue
 
-                player_data = json.loads(player_info_str)
                 info_dict = player_data.get('data', player_data)
                 
                 # 在移動等待中，持續檢查地圖
@@ -7554,21 +7950,21 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                     # 如果沒抵達，檢查是否需要重新發送移動指令
                     if time.time() - last_move_time > move_interval:
                         self.log_message(f"[{name}] ...尚未抵達 (距離: {distance:.0f} | 當前地圖: {current_map_name})，重新發送移動指令...")
-                        self.execute_moveto_script(name, target_x, target_y)
+                        await self._moveto_async(name, target_x, target_y)
                         last_move_time = time.time()
                 
-                time.sleep(0.3) # 短暫延遲避免過於頻繁的請求
+                await asyncio.sleep(0.3) # 短暫延遲避免過於頻繁的請求
 
             except Exception as e:
                 self.log_message(f"[{name}] 等待移動時發生錯誤: {e}")
-                time.sleep(1) # 發生錯誤時等待長一點
+                await asyncio.sleep(1) # 發生錯誤時等待長一點
         
         self.log_message(f"[{name}] 警告: 等待移動逾時 ({wait_timeout}秒)。")
 
 
-    def patrol_loop(self, name, params):
+    async def patrol_loop(self, name, params):
+        """自動巡邏協程 (在 rpc_hub 的事件迴圈中執行)"""
         instance = self.instances[name]
-        api = instance["script_api"]
         start_map_name = None  # 用於記錄起始地圖
 
         move_info = ""
@@ -7582,14 +7978,13 @@ skinuse：在GameHelper 找409指令(int i ,long j)
         try:
             while instance["is_patrolling"]:
                 try:
-                    # 1. 獲取當前玩家資訊 (包含地圖)
-                    player_info_str = api.get_info(201)
-                    if not player_info_str:
+                    # 1. 獲取當前玩家資訊 (包含地圖) 與周圍物件，取自實例共用的 WorldState 快取
+                    player_data, world_data = await instance["world_state"].get_many_async([201, 203])
+                    if not player_data:
                         self.log_message(f"[{name}] 巡邏：無法獲取玩家資訊，等待下一輪。")
-                        time.sleep(params["interval"])
+                        await asyncio.sleep(params["interval"])
                         continue
                     
-                    player_data = json.loads(player_info_str)
                     info_dict = player_data.get('data', player_data)
                     current_map_name = info_dict.get("mapName", "未知地圖")
 
@@ -7603,7 +7998,6 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                         continue # 立即結束此迴圈，觸發 finally 中的清理
 
                     # 3. 檢查攻擊者數量與近距離怪物
-                    attackers_result = api.get_info(203)
                     attacker_count = 0
                     nearby_monster_count = 0
                     # nearby_item_count = 0 # 改用 selectType 判斷，不再掃描掉落物
@@ -7611,8 +8005,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                     # 獲取當前選擇的目標類型 (6=怪物, 3=掉落物, 2=玩家)
                     current_select_type = info_dict.get("selectType", 0)
                     
-                    if attackers_result:
-                        world_data = json.loads(attackers_result)
+                    if world_data:
                         if isinstance(world_data, dict) and 'data' in world_data:
                             current_x, current_y = info_dict.get('x'), info_dict.get('y')
                             
@@ -7653,7 +8046,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                             # 5. 根據移動類型計算下一點
                             if params["move_type"] == "隨機移動":
                                 self.log_message(f"[{name}] 巡邏：執行怪物導向移動...")
-                                monster_counts = self._get_monster_distribution(name)
+                                monster_counts = await self._get_monster_distribution_async(name)
 
                                 if monster_counts and sum(monster_counts.values()) > 0:
                                     max_dir_symbol = max(monster_counts, key=monster_counts.get)
@@ -7711,21 +8104,21 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                             if new_x is not None and new_y is not None:
                                 # 根據設定決定是否開關 AUTO
                                 if params.get("toggle_auto", False):
-                                    self._set_auto_state(name, False) # 關閉 AUTO
-                                    time.sleep(0.4) # 等待指令生效
+                                    await self._set_auto_state_async(name, False) # 關閉 AUTO
+                                    await asyncio.sleep(0.4) # 等待指令生效
 
                                 # 移動並等待抵達
-                                self.execute_move_and_wait(name, new_x, new_y, start_map_name, arrival_threshold=params.get("arrival_threshold", 5))
+                                await self.execute_move_and_wait(name, new_x, new_y, start_map_name, arrival_threshold=params.get("arrival_threshold", 5))
 
                                 # 如果勾選了「到位後選取最近的怪」，則執行
                                 if instance["is_patrolling"] and params.get("attack_on_arrival", False):
                                     self.log_message(f"[{name}] 已抵達，開始搜尋最近的怪物...")
-                                    self.execute_specify_closest_monster(name)
-                                    time.sleep(0.2) # 短暫延遲
+                                    await self.execute_specify_closest_monster(name)
+                                    await asyncio.sleep(0.2) # 短暫延遲
 
                                 # 如果之前關了，現在就打開
                                 if params.get("toggle_auto", False):
-                                    self._set_auto_state(name, True) # 開啟 AUTO
+                                    await self._set_auto_state_async(name, True) # 開啟 AUTO
                             else:
                                 self.log_message(f"[{name}] 未能計算出有效的下一點，跳過此次移動。")
                         else:
@@ -7738,7 +8131,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                 
                 # 等待指定間隔
                 if instance["is_patrolling"]:
-                    time.sleep(params["interval"])
+                    await asyncio.sleep(params["interval"])
 
         except Exception as e:
             if instance["is_patrolling"]:
@@ -7748,7 +8141,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
             self.log_message(f"--- [{name}] 自動巡邏結束 ---")
             if params.get("toggle_auto", False):
                 self.log_message(f"[{name}] 巡邏結束，正在關閉 AUTO...")
-                self._set_auto_state(name, False)
+                await self._set_auto_state_async(name, False)
             if self.root.winfo_exists() and name in self.instances:
                 def _reset_ui():
                     ui = self.instances[name]["ui"]
@@ -8003,7 +8396,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
         api = instance["script_api"]
         try:
             player_info_str = api.get_info(201)
-            player_data = json.loads(player_info_str)
+            player_data = json_codec.loads(player_info_str)
             info_dict = player_data.get('data', player_data)
             instance["seq_move_start_map"] = info_dict.get("mapName", "未知地圖")
             self.log_message(f"[{name}] 循序移動啟動於地圖: {instance['seq_move_start_map']}")
@@ -8120,7 +8513,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
         try:
             player_info_str = api.get_info(201)
             if player_info_str:
-                player_data = json.loads(player_info_str)
+                player_data = json_codec.loads(player_info_str)
                 info_dict = player_data.get('data', player_data)
                 
                 # 獲取當前座標
@@ -8185,7 +8578,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                             time.sleep(0.2)
                             continue
                         
-                        player_data = json.loads(player_info_str)
+                        player_data = json_codec.loads(player_info_str)
                         info_dict = player_data.get('data', player_data)
                         
                         # # 檢查地圖是否變更
@@ -9047,7 +9440,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
             if not buff_list_str:
                 raise Exception("獲取 BUFF 列表失敗 (RPC get_info(206) 未返回任何資料)")
             
-            buff_data = json.loads(buff_list_str)
+            buff_data = json_codec.loads(buff_list_str)
             if buff_data.get("status") != "success":
                 raise Exception(f"指令 206 返回失敗狀態: {buff_data.get('message', '未知錯誤')}")
             
@@ -9162,7 +9555,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
             if not skills_str:
                 raise Exception("獲取技能列表失敗 (RPC get_info(218) 未返回任何資料)")
             
-            skills_data = json.loads(skills_str)
+            skills_data = json_codec.loads(skills_str)
             if skills_data.get("status") != "success":
                 raise Exception(f"指令 218 返回失敗狀態: {skills_data.get('message', '未知錯誤')}")
             
@@ -9244,12 +9637,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
             ui["general_afk_button"].config(text="掛機中", style='Red.Taller.TButton')
         
         # 啟動統一的掛機執行緒 (BUFF 優先)
-        instance["general_afk_thread"] = threading.Thread(
-            target=self.general_afk_unified_loop,
-            args=(name, buff_skills, attack_skills),
-            daemon=True
-        )
-        instance["general_afk_thread"].start()
+        self._start_resumable_loop(name, "is_general_afk_running", self.general_afk_unified_loop, (name, buff_skills, attack_skills))
     
     def general_afk_unified_loop(self, name, buff_skills, attack_skills):
         """統一的掛機迴圈 (BUFF 優先)"""
@@ -9278,10 +9666,18 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                 # ==================== 優先檢查: 地圖變更與玩家狀態 ====================
                 # 提前獲取玩家資訊 (201)，用於地圖檢查和後續的攻擊邏輯
                 player_info = None
+                info_batch = {}
                 try:
-                    player_info_str = api.get_info(201)
-                    if player_info_str:
-                        player_data = json.loads(player_info_str)
+                    # 201 / 206 / 218 取自實例共用的 WorldState 快取，過期的指令合併為一次 RPC
+                    codes = [201]
+                    if enabled_buff_skills:
+                        codes.append(206)
+                    if enabled_attack_skills:
+                        codes.append(218)
+                    info_batch = dict(zip(codes, instance["world_state"].get_many(codes)))
+
+                    player_data = info_batch.get(201)
+                    if player_data:
                         player_info = player_data.get("data", player_data)
                         
                         # 檢查地圖變更
@@ -9313,9 +9709,8 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                 # ==================== 第一優先: BUFF 技能 ====================
                 if enabled_buff_skills:
                     try:
-                        buff_list_str = api.get_info(206)
-                        if buff_list_str:
-                            buff_data = json.loads(buff_list_str)
+                        buff_data = info_batch.get(206)
+                        if buff_data:
                             if buff_data.get("status") == "success":
                                 current_buffs = buff_data.get("data", [])
                                 
@@ -9376,9 +9771,8 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                             max_mp = player_info.get("maxMP", 1)  # 避免除以零
                             mp_percent = int((current_mp / max_mp) * 100)
                             
-                            # 獲取技能冷卻狀態
-                            skills_info_str = api.get_info(218)
-                            skills_data = json.loads(skills_info_str) if skills_info_str else {}
+                            # 技能冷卻狀態 (已在回合開始時一併取得)
+                            skills_data = info_batch.get(218) or {}
                             skills_list = skills_data.get("data", []) if skills_data.get("status") == "success" else []
                             
                             # 檢查並使用攻擊技能
@@ -9539,7 +9933,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                         time.sleep(1)
                         continue
                     
-                    buff_data = json.loads(buff_list_str)
+                    buff_data = json_codec.loads(buff_list_str)
                     if buff_data.get("status") != "success":
                         time.sleep(1)
                         continue
@@ -9630,13 +10024,13 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                         time.sleep(0.5)
                         continue
                     
-                    player_data = json.loads(player_info_str)
+                    player_data = json_codec.loads(player_info_str)
                     player_info = player_data.get("data", player_data)
                     current_mp = player_info.get("curMP", 0)
                     
                     # 獲取技能冷卻狀態
                     skills_info_str = api.get_info(218)
-                    skills_data = json.loads(skills_info_str) if skills_info_str else {}
+                    skills_data = json_codec.loads(skills_info_str) if skills_info_str else {}
                     skills_list = skills_data.get("data", []) if skills_data.get("status") == "success" else []
                     
                     # 遍歷每個攻擊技能
@@ -10153,7 +10547,7 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                 if not result_str:
                     return
                 
-                result = json.loads(result_str)
+                result = json_codec.loads(result_str)
                 data = result.get("data", [])
                 
                 # 過濾出玩家 (type=2)
@@ -10253,11 +10647,12 @@ skinuse：在GameHelper 找409指令(int i ,long j)
     def follow_attack_thread(self, name):
         """跟隨攻擊執行緒"""
         instance = self.instances[name]
+        world_sub = {"stream": None, "seq": 0}
         
         while instance.get("is_follow_attack_running"):
             try:
                 api = instance.get("script_api")
-                if not api:
+                if not api or not instance.get("world_stream"):
                     time.sleep(1)
                     continue
                 
@@ -10265,12 +10660,15 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                 dist_limit = instance["config"].get("follow_attack_distance", 3)
                 interval = instance["config"].get("follow_attack_interval", 1000) / 1000.0
                 
-                # 取得自身資訊 (用於計算距離)
-                my_info_str = api.get_info(201)
+                # 取得 agent 推送的最新一幀: 自身資訊 (用於計算距離) 與周圍物件
+                extra, objs_json = self._next_world_frame(instance, world_sub)
+                if objs_json is None:
+                    continue
+                my_info_str = extra[0] if extra else None
                 my_x, my_y = None, None
                 if my_info_str:
                     try:
-                        j = json.loads(my_info_str)
+                        j = json_codec.loads(my_info_str)
                         if j.get("status") == "success":
                             d = j.get("data", {})
                             if isinstance(d, dict) and "x" in d:
@@ -10279,13 +10677,10 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                                 my_x, my_y = j.get("x"), j.get("y")
                     except: pass
 
-                # 取得周圍物件
-                objs_str = api.get_info(203)
-                if not objs_str:
+                if objs_json.get("status") != "success":
                     time.sleep(interval)
                     continue
                     
-                objs_json = json.loads(objs_str)
                 data = objs_json.get("data", [])
                 
                 # 尋找跟隨目標
@@ -10321,15 +10716,14 @@ skinuse：在GameHelper 找409指令(int i ,long j)
                                 is_spamming = True
                             
                             if target_key and not is_spamming:
-                                # 鎖定並攻擊
-                                api.set_target(str(target_key)) # 轉成字串避免 JS 數字精度問題
-                                # time.sleep(0.1) # 給予一點時間讓鎖定生效 (使用者測試後認為不需要延遲)
-                                api.attack_pickup()
+                                # 鎖定並攻擊 (agent 端一次完成)
+                                result = api.target_and_attack(str(target_key), lane="routine") # 轉成字串避免 JS 數字精度問題
                                 # self.log_message(f"[{name}] 跟隨攻擊 -> 鎖定目標: {target_name} (ID: {attack_id})")
                                 
-                                # 更新最後攻擊狀態
-                                instance["last_attack_target_id"] = target_id_val
-                                instance["last_attack_time"] = current_time
+                                # 更新最後攻擊狀態 (routine 通道因限速被放棄時回傳 None，下一輪重試)
+                                if result is not None:
+                                    instance["last_attack_target_id"] = target_id_val
+                                    instance["last_attack_time"] = current_time
                                 
                             elif is_spamming:
                                 # 避免打斷攻擊動作
@@ -10356,6 +10750,8 @@ skinuse：在GameHelper 找409指令(int i ,long j)
             
             time.sleep(interval)
 
+        self._release_world_frame(world_sub)
+
 if __name__ == "__main__":
     root = tk.Tk()
     try:
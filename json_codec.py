@@ -0,0 +1,26 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 目前使用的解析器名稱 (啟動時寫入日誌)
+BACKEND = f"orjson {orjson.__version__}" if orjson is not None else "json (標準函式庫)"
+
+
+def loads(raw):
+    """
+    解析 RPC 回傳的 JSON 字串 (str 或 bytes)，行為與 json.loads 相同。
+
+    有安裝 orjson 時使用 orjson，解析 203 等大型回傳快數倍；沒有安裝時使用標準函式庫。
+    orjson 解析失敗時交給標準函式庫重試，因此錯誤時一律拋出 json.JSONDecodeError
+    (或輸入型別錯誤時的 TypeError)，呼叫端不必區分。
+    注意 orjson 會把超過 64 位元的整數解析成 float；agent 回傳的 objectKey 等皆在 int64 範圍內。
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(raw)
@@ -0,0 +1,447 @@
+import concurrent.futures
+import threading
+import time
+import weakref
+
+# 唯讀的查詢: 相同參數的並行呼叫合併成一次 RPC (single-flight)
+SINGLE_FLIGHT_METHODS = ("get_info", "get_info_batch")
+# 會讓角色執行動作的呼叫，經過 ActionRateLimiter 限速
+# select_nearest 會在 agent 端指定目標 (並攻擊)，是定時指定目標最頻繁的呼叫；
+# pickup_nearest 目前 gui 沒有呼叫，但 agent 仍匯出 (會撿取物品)，任何呼叫端都應受限速
+ACTION_METHODS = ("set_target", "attack_pickup", "use_skill", "use_item", "moveto",
+                  "target_and_attack", "target_and_skill", "select_nearest", "pickup_nearest")
+# 同一組的動作在佇列中只保留最新的一個 (新的指定目標取代尚未送出的舊目標，新的移動取代舊的移動)
+ACTION_COALESCE_GROUPS = {"set_target": "target", "target_and_attack": "target", "target_and_skill": "target",
+                          "select_nearest": "target", "moveto": "move"}
+_LANE_ORDER = {"emergency": 0, "normal": 1, "routine": 2}
+# 所有 RpcClient 共用的執行緒池大小；每個實例另有各自的同時呼叫上限 (max_workers)，卡住的實例不會佔滿整個池
+SHARED_POOL_WORKERS = 16
+
+
+class RpcTimeoutError(TimeoutError):
+    """RPC 呼叫超過期限仍未回應 (agent 端的遊戲執行緒可能卡住)。"""
+
+
+class ActionRateLimiter:
+    """
+    ActionRateLimiter 類別 - 每個實例的動作限速 (token bucket)，分成三個優先通道
+
+    - "emergency": 回村、順移等脫離用的動作，永遠立即送出 (仍會消耗額度)
+    - "normal":    一般動作，額度不足時等待補充
+    - "routine":   每個迴圈週期重複送出的動作 (重新指定目標)，必須保留 routine_reserve 個額度給
+                   normal；最多等待 routine_max_wait 秒，仍無額度就放棄這次呼叫
+
+    ActionQueue 以 try_acquire 取得額度 (不阻塞)，額度不足時回到佇列重新挑選最優先的動作，
+    因此 routine 等待時不會擋住之後加入的 normal。
+
+    參數:
+    rate: float              每秒補充的額度 (動作數)
+    burst: int               額度上限 (可連續送出的動作數)
+    """
+
+    LANES = ("emergency", "normal", "routine")
+
+    def __init__(self, rate=10.0, burst=5, routine_reserve=2, routine_max_wait=0.5):
+        self.rate = rate
+        self.burst = burst
+        self.routine_reserve = min(routine_reserve, burst - 1)
+        self.routine_max_wait = routine_max_wait
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, lane="normal"):
+        """不等待地取得一個額度: 成功回傳 0，額度不足時回傳還需要等待的秒數。"""
+        if lane not in self.LANES:
+            raise ValueError(f"未知的通道: {lane}")
+        with self.lock:
+            self._refill()
+            if lane == "emergency":
+                # 不等待；額度最多欠 burst 個，之後的 normal/routine 會等得比較久
+                self.tokens = max(self.tokens - 1, -self.burst)
+                return 0
+            needed = 1 if lane == "normal" else 1 + self.routine_reserve
+            if self.tokens < needed:
+                return (needed - self.tokens) / self.rate
+            self.tokens -= 1
+            return 0
+
+    def acquire(self, lane="normal"):
+        """取得一個額度，回傳 True；routine 通道等待逾時回傳 False (呼叫端應放棄這次動作)。"""
+        give_up = time.monotonic() + self.routine_max_wait
+        while True:
+            wait = self.try_acquire(lane)
+            if wait <= 0:
+                return True
+            if lane == "routine":
+                remaining = give_up - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+def _forward_result(source, target):
+    """被取代的動作改為回傳取代它的動作 (相同方法) 的結果。"""
+    if not target.set_running_or_notify_cancel():
+        return
+    if source is None or source.cancelled():
+        target.set_result(None)
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+class ActionQueue:
+    """
+    ActionQueue 類別 - 每個實例的動作佇列，所有執行緒的動作依序由單一執行緒送出 (第一個動作加入時啟動)
+
+    佇列依通道優先順序 (emergency > normal > routine) 再依提交順序執行。
+    ACTION_COALESCE_GROUPS 中同一組的動作尚未送出時會被新的動作取代，
+    例如 execute_move_and_wait 與 _continuous_moveto_check 同時要求移動時只送出最新的座標；
+    被同一方法取代的呼叫端取得新動作的結果；被其他方法取代時 (例如定時指定目標的 select_nearest
+    被 set_target 取代) 立即取得 None，與 routine 被限速放棄相同。
+
+    有 limiter 時，送出執行緒先替最優先的動作取得額度才把它移出佇列；額度不足時等待補充，
+    期間有新的動作加入就重新挑選，所以限速等待不會讓較優先的動作排在後面。
+    routine 動作加入後超過 limiter.routine_max_wait 秒仍無額度時放棄，結果為 None。
+
+    參數:
+    run: callable            run(method_name, args, timeout)，實際送出一個動作，timeout 為呼叫端剩餘的等待秒數
+    name: str                實例名稱，用於執行緒名稱
+    limiter: ActionRateLimiter  動作限速，None 表示不限速
+    """
+
+    def __init__(self, run, name="", limiter=None):
+        self.run = run
+        self.limiter = limiter
+        self.entries = []
+        self.seq = 0
+        self.closed = False
+        self.cond = threading.Condition()
+        self.name = name
+        self.thread = None # 第一個動作加入時才啟動，沒有送出過動作的實例不佔用執行緒
+
+    def submit(self, method_name, args, lane="normal", timeout=None, run=None):
+        """
+        加入佇列，回傳 concurrent.futures.Future。timeout 為呼叫端願意等待的秒數 (None 表示不限)，
+        送出時只給 run 剩餘的時間。呼叫端不再等待時可 cancel()，尚未送出的動作會被略過。
+        run 可替這個動作指定送出的方式 (與建構參數 run 相同的簽名，例如 AsyncRpcClient 改用 exports_async 送出)。
+        """
+        future = concurrent.futures.Future()
+        now = time.monotonic()
+        group = ACTION_COALESCE_GROUPS.get(method_name)
+        with self.cond:
+            if self.closed:
+                raise RuntimeError("動作佇列已關閉")
+            if group is not None:
+                for entry in self.entries:
+                    if entry["group"] == group:
+                        self.entries.remove(entry)
+                        # 取代後沿用兩者中較優先的通道
+                        lane = min(lane, entry["lane"], key=_LANE_ORDER.get)
+                        if entry["method_name"] == method_name:
+                            future.add_done_callback(lambda f, old=entry["future"]: _forward_result(f, old))
+                        else:
+                            # 不同方法的回傳值格式不同 (select_nearest 為 JSON)，被取代的呼叫端視同未送出
+                            _forward_result(None, entry["future"])
+                        break
+            self.seq += 1
+            self.entries.append({"order": (_LANE_ORDER[lane], self.seq), "group": group, "future": future,
+                                 "method_name": method_name, "args": args, "lane": lane, "submitted": now,
+                                 "run": run or self.run,
+                                 "deadline": None if timeout is None else now + timeout})
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._worker, name=f"actions-{self.name}", daemon=True)
+                self.thread.start()
+            self.cond.notify()
+        return future
+
+    def _next_entry(self):
+        """等待並取出下一個可以送出的動作 (已取得額度)；佇列關閉時回傳 None。呼叫時須持有 self.cond。"""
+        while True:
+            if self.closed:
+                return None
+            if not self.entries:
+                self.cond.wait()
+                continue
+            entry = min(self.entries, key=lambda e: e["order"])
+            if entry["future"].cancelled():
+                # 呼叫端已逾時放棄
+                self.entries.remove(entry)
+                continue
+            wait = self.limiter.try_acquire(entry["lane"]) if self.limiter is not None else 0
+            if wait <= 0:
+                self.entries.remove(entry)
+                return entry
+            if entry["lane"] == "routine":
+                remaining = entry["submitted"] + self.limiter.routine_max_wait - time.monotonic()
+                if remaining <= 0:
+                    self.entries.remove(entry)
+                    entry["skipped"] = True
+                    return entry
+                wait = min(wait, remaining)
+            # 新的動作加入時 submit 會 notify，醒來後重新挑選最優先的動作
+            self.cond.wait(wait)
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                entry = self._next_entry()
+            if entry is None:
+                return
+            future = entry["future"]
+            if not future.set_running_or_notify_cancel():
+                continue
+            if entry.get("skipped"):
+                future.set_result(None)
+                continue
+            timeout = None
+            if entry["deadline"] is not None:
+                timeout = entry["deadline"] - time.monotonic()
+                if timeout <= 0:
+                    future.set_exception(RpcTimeoutError(f"RPC 呼叫 {entry['method_name']} 在佇列中逾時"))
+                    continue
+            try:
+                future.set_result(entry["run"](entry["method_name"], entry["args"], timeout))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            for entry in self.entries:
+                entry["future"].cancel()
+            self.entries = []
+            self.cond.notify_all()
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def _shared_executor():
+    """所有 RpcClient 共用的執行緒池 (第一次呼叫時建立，執行緒依需要才啟動)。"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = concurrent.futures.ThreadPoolExecutor(max_workers=SHARED_POOL_WORKERS, thread_name_prefix="rpc")
+        return _shared_pool
+
+
+class _Watchdog:
+    """所有 RpcClient 共用的看門狗執行緒: 每秒檢查一次各實例是否有卡住的呼叫 (第一個 RpcClient 建立時啟動)。"""
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.clients = weakref.WeakSet()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def add(self, client):
+        with self.lock:
+            self.clients.add(client)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="rpc-watchdog", daemon=True)
+                self.thread.start()
+
+    def remove(self, client):
+        with self.lock:
+            self.clients.discard(client)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                clients = list(self.clients)
+            for client in clients:
+                client._check_hung()
+
+
+_watchdog = _Watchdog()
+
+
+class RpcClient:
+    """
+    RpcClient 類別 - 為 script.exports_sync 的每一次呼叫加上期限
+
+    exports_sync 在遊戲執行緒卡住時會無限期等待，呼叫的功能執行緒也跟著靜默卡死。
+    本類別把呼叫交給所有實例共用的執行緒池，呼叫端最多等待 timeout 秒，逾時則拋出 RpcTimeoutError；
+    卡住的呼叫仍留在執行緒池中，agent 恢復後自然結束。每個實例同時最多 max_workers 個呼叫在池中，
+    超過時後到的呼叫等待空位 (同樣受 timeout 限制)，一個卡住的實例不會佔滿共用的執行緒池。
+
+    用法與 exports_sync 相同 (api.get_info(201))，需要不同期限時使用 api.call("moveto", x, y, timeout=10)。
+
+    SINGLE_FLIGHT_METHODS 中的查詢若已有相同參數的呼叫在執行，後到的呼叫不再發出 RPC，
+    直接等待並共用同一個結果 (例如監控、浮動視窗與定時指定目標在同一瞬間查詢 201)。
+
+    ACTION_METHODS 的呼叫經由 ActionQueue 依序送出 (可被較新的同類動作取代)，
+    以 lane 關鍵字指定通道 (api.use_item(key, lane="emergency"))，未指定為 "normal"；
+    emergency 不排隊，直接在呼叫端的執行緒送出。
+    提供 limiter 時，動作送出前先經過限速 (由 ActionQueue 取得額度)，routine 通道被放棄時回傳 None。
+
+    所有實例共用一個看門狗執行緒: 任一呼叫超過 hung_after 秒仍未返回時，
+    以 on_hung(True, method_name, elapsed) 通知 agent 無回應，恢復後以 on_hung(False, None, 0) 通知。
+
+    參數:
+    exports: script.exports_sync
+    timeout: float           每次呼叫的預設期限 (秒)
+    name: str                實例名稱，用於執行緒名稱
+    on_hung: callable        看門狗狀態改變時的回呼 (於看門狗執行緒呼叫)
+    hung_after: float        判定 agent 無回應的秒數，預設為 timeout 的兩倍
+    max_workers: int         同時在共用執行緒池中執行的呼叫上限
+    limiter: ActionRateLimiter  動作限速，None 表示不限速
+    """
+
+    def __init__(self, exports, timeout=5.0, name="", on_hung=None, hung_after=None, max_workers=4, limiter=None):
+        self._exports = exports
+        self.limiter = limiter
+        self.timeout = timeout
+        self.hung_after = hung_after or timeout * 2
+        self.on_hung = on_hung
+        self.slots = threading.BoundedSemaphore(max_workers)
+        self.futures = set() # 已交給執行緒池、尚未完成的呼叫 (close 時取消還沒開始的)
+        self.pending = {} # 執行中的呼叫: token -> (method_name, 開始時間)
+        self.lock = threading.Lock()
+        self.inflight = {} # 合併中的查詢: (method_name, repr(args)) -> Future
+        self.flight_lock = threading.Lock()
+        self.is_hung = False
+        self.closed = threading.Event()
+        self.actions = ActionQueue(self._run_action, name=name, limiter=limiter)
+        _watchdog.add(self)
+
+    def __getattr__(self, method_name):
+        if method_name.startswith("_"):
+            raise AttributeError(method_name)
+
+        def call(*args, **kwargs):
+            return self.call(method_name, *args, **kwargs)
+
+        return call
+
+    def call(self, method_name, *args, timeout=None, lane=None):
+        if self.closed.is_set():
+            raise RuntimeError("RPC 連線已關閉")
+        deadline = timeout or self.timeout
+        if method_name not in ACTION_METHODS:
+            return self._call_direct(method_name, args, deadline)
+        lane = lane or "normal"
+        if lane == "emergency":
+            if self.limiter is not None:
+                self.limiter.acquire(lane)
+            return self._call_direct(method_name, args, deadline)
+        future = self.actions.submit(method_name, args, lane, timeout=deadline)
+        try:
+            return future.result(deadline)
+        except concurrent.futures.TimeoutError:
+            future.cancel() # 尚未送出就不再送出，避免過時的動作晚到
+            raise RpcTimeoutError(f"RPC 呼叫 {method_name} 逾時 ({deadline} 秒)") from None
+
+    def _run_action(self, method_name, args, timeout):
+        """ActionQueue 送出動作，期限為呼叫端剩餘的等待時間。"""
+        return self._call_direct(method_name, args, timeout or self.timeout)
+
+    def _call_direct(self, method_name, args, deadline):
+        method = getattr(self._exports, method_name)
+        start = time.monotonic()
+        if method_name in SINGLE_FLIGHT_METHODS:
+            key = (method_name, repr(args))
+            with self.flight_lock:
+                future = self.inflight.get(key)
+            if future is None:
+                # 等待空位時不持有 flight_lock，取得空位後再確認一次是否已有相同的查詢
+                self._acquire_slot(method_name, deadline)
+                with self.flight_lock:
+                    future = self.inflight.get(key)
+                    if future is None:
+                        future = self._submit(self._invoke_shared, key, method_name, method, args)
+                        self.inflight[key] = future
+                    else:
+                        self.slots.release()
+        else:
+            self._acquire_slot(method_name, deadline)
+            future = self._submit(self._invoke, method_name, method, args)
+        try:
+            result = future.result(max(deadline - (time.monotonic() - start), 0))
+        except concurrent.futures.TimeoutError:
+            if method_name not in SINGLE_FLIGHT_METHODS:
+                # 還在執行緒池排隊就不再送出；合併中的查詢可能還有其他呼叫端在等待，保留
+                future.cancel()
+            raise RpcTimeoutError(f"RPC 呼叫 {method_name} 逾時 ({deadline} 秒)") from None
+        # get_info_batch 的 list 由多個呼叫端共用，各自取得一份複本
+        return list(result) if isinstance(result, list) else result
+
+    def _acquire_slot(self, method_name, deadline):
+        """取得本實例在共用執行緒池中的空位；等待超過 deadline 時拋出 RpcTimeoutError。"""
+        if not self.slots.acquire(timeout=deadline):
+            raise RpcTimeoutError(f"RPC 呼叫 {method_name} 逾時 ({deadline} 秒，等待中的呼叫過多)")
+
+    def _submit(self, fn, *args):
+        """交給共用的執行緒池 (呼叫前須已取得空位，完成或取消時歸還)。"""
+        try:
+            future = _shared_executor().submit(fn, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        with self.lock:
+            self.futures.add(future)
+        future.add_done_callback(self._release_slot)
+        return future
+
+    def _release_slot(self, future):
+        with self.lock:
+            self.futures.discard(future)
+        self.slots.release()
+
+    def _invoke_shared(self, key, method_name, method, args):
+        try:
+            return self._invoke(method_name, method, args)
+        finally:
+            # 在回傳前移除，之後的呼叫會發出新的 RPC，不會拿到呼叫前就開始的舊結果
+            with self.flight_lock:
+                self.inflight.pop(key, None)
+
+    def _invoke(self, method_name, method, args):
+        token = object()
+        with self.lock:
+            self.pending[token] = (method_name, time.time())
+        try:
+            return method(*args)
+        finally:
+            with self.lock:
+                self.pending.pop(token, None)
+
+    def _check_hung(self):
+        """由共用的看門狗執行緒每秒呼叫一次。"""
+        if self.closed.is_set():
+            return
+        now = time.time()
+        with self.lock:
+            oldest = min(self.pending.values(), key=lambda entry: entry[1], default=None)
+        hung = oldest is not None and now - oldest[1] >= self.hung_after
+        if hung != self.is_hung:
+            self.is_hung = hung
+            if self.on_hung:
+                try:
+                    if hung:
+                        self.on_hung(True, oldest[0], now - oldest[1])
+                    else:
+                        self.on_hung(False, None, 0)
+                except Exception:
+                    pass
+
+    def close(self):
+        """停止看門狗檢查並取消本實例尚未開始的呼叫 (不等待卡住的呼叫；共用的執行緒池不關閉)。"""
+        self.closed.set()
+        _watchdog.remove(self)
+        self.actions.close()
+        with self.lock:
+            futures = list(self.futures)
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,84 @@
+import functools
+
+_LEVEL = None # 前綴樹節點中記錄「在此結束的前綴」優先級的鍵 (字元鍵皆為 str，不會衝突)
+
+
+class TargetMatcher:
+    """
+    TargetMatcher 類別 - 預先編譯的目標名稱清單
+
+    完全相同的名稱放入 dict，以 * 結尾的前綴放入前綴樹 (以字元為鍵的巢狀 dict)，
+    查詢一個名稱只需一次 dict 查詢加上沿名稱逐字走訪前綴樹，與清單長度無關。
+    規則與 agent 的 compileMatcher / matchLevel (selectNearest 使用) 相同: 名稱完全相同，或以 * 結尾表示前綴比對。
+
+    一般不直接建立，使用 compile_patterns / compile_lines 取得快取的實例。
+
+    參數:
+    levels: list of list     每一項為一個優先級的名稱 (索引越小越優先)
+    """
+
+    def __init__(self, levels):
+        self.levels = [list(patterns) for patterns in levels]
+        self.exact = {}
+        self.trie = {}
+        for level, patterns in enumerate(self.levels):
+            for pattern in patterns:
+                if pattern.endswith("*"):
+                    node = self.trie
+                    for ch in pattern[:-1]:
+                        node = node.setdefault(ch, {})
+                    node.setdefault(_LEVEL, level)
+                else:
+                    self.exact.setdefault(pattern, level)
+
+    def __bool__(self):
+        return bool(self.exact or self.trie)
+
+    def level(self, name):
+        """name 符合的最優先級 (索引)，不符合任何名稱時回傳 None。"""
+        if not isinstance(name, str):
+            return None
+        best = self.exact.get(name)
+        node = self.trie
+        for ch in name:
+            level = node.get(_LEVEL)
+            if level is not None and (best is None or level < best):
+                best = level
+            node = node.get(ch)
+            if node is None:
+                return best
+        level = node.get(_LEVEL)
+        if level is not None and (best is None or level < best):
+            best = level
+        return best
+
+    def matches(self, name):
+        return self.level(name) is not None
+
+    __contains__ = matches
+
+
+@functools.lru_cache(maxsize=64)
+def _compile(levels):
+    return TargetMatcher(levels)
+
+
+def compile_patterns(patterns):
+    """
+    單一優先級的名稱清單 (撿取清單、黑名單、浮動視窗目標等)，每一項為一個名稱，不拆分 |。
+    相同的清單重複呼叫會取得同一個已編譯的實例。
+    """
+    return _compile((tuple(patterns),))
+
+
+def compile_lines(lines):
+    """
+    指定目標的清單: 每一行為一個優先級，同一行可用 | 分隔多個名稱 (與 agent 的 selectNearest 相同)。
+    空白的行與名稱會被略過。相同的清單重複呼叫會取得同一個已編譯的實例。
+    """
+    levels = []
+    for line in lines:
+        patterns = tuple(part.strip() for part in str(line).split("|") if part.strip())
+        if patterns:
+            levels.append(patterns)
+    return _compile(tuple(levels))
@@ -0,0 +1,264 @@
+import concurrent.futures
+import threading
+import time
+
+import pytest
+
+from rpc_client import ActionQueue, ActionRateLimiter, RpcClient, RpcTimeoutError, _forward_result
+
+
+class Recorder:
+    """ActionQueue 的 run: 記錄送出的動作；gate 未開啟前第一個動作會停在送出中，讓後續動作排隊。"""
+
+    def __init__(self):
+        self.sent = []
+        self.timeouts = []
+        self.gate = threading.Event()
+        self.started = threading.Event()
+
+    def __call__(self, method_name, args, timeout):
+        self.started.set()
+        self.gate.wait(5)
+        self.sent.append((method_name,) + tuple(args))
+        self.timeouts.append(timeout)
+        return f"{method_name}:{','.join(map(str, args))}"
+
+
+@pytest.fixture
+def recorder():
+    return Recorder()
+
+
+@pytest.fixture
+def queue(recorder):
+    queue = ActionQueue(recorder, name="test")
+    yield queue
+    recorder.gate.set()
+    queue.close()
+
+
+def _block_worker(queue, recorder):
+    """送出一個動作並等它進入送出中，之後提交的動作都會留在佇列。"""
+    first = queue.submit("use_item", ("hp",))
+    assert recorder.started.wait(2)
+    return first
+
+
+def test_same_group_keeps_latest_and_forwards_result(queue, recorder):
+    _block_worker(queue, recorder)
+    old = queue.submit("set_target", ("a",), lane="routine")
+    new = queue.submit("set_target", ("b",), lane="normal")
+    assert len(queue.entries) == 1
+    recorder.gate.set()
+    assert new.result(2) == "set_target:b"
+    assert old.result(2) == "set_target:b"
+    assert ("set_target", "a") not in recorder.sent
+
+
+def test_replaced_by_another_method_resolves_to_none(queue, recorder):
+    _block_worker(queue, recorder)
+    timed = queue.submit("select_nearest", (["哥布林"], {"action": "attack"}), lane="routine")
+    manual = queue.submit("target_and_attack", ("b",), lane="normal")
+    # 定時指定目標尚未送出就被新的指定目標取代，呼叫端不會拿到格式不同的回傳值
+    assert timed.result(0) is None
+    assert len(queue.entries) == 1
+    recorder.gate.set()
+    assert manual.result(2) == "target_and_attack:b"
+    assert [call[0] for call in recorder.sent] == ["use_item", "target_and_attack"]
+
+
+def test_stale_select_nearest_calls_collapse_to_one(queue, recorder):
+    _block_worker(queue, recorder)
+    calls = [queue.submit("select_nearest", (["哥布林"], {"n": i}), lane="routine") for i in range(5)]
+    assert len(queue.entries) == 1
+    recorder.gate.set()
+    results = [call.result(2) for call in calls]
+    assert len(set(results)) == 1
+    assert [call[0] for call in recorder.sent].count("select_nearest") == 1
+
+
+def test_coalescing_keeps_the_more_urgent_lane(queue, recorder):
+    _block_worker(queue, recorder)
+    queue.submit("moveto", (1, 1), lane="normal")
+    queue.submit("moveto", (2, 2), lane="routine")
+    (entry,) = queue.entries
+    assert entry["lane"] == "normal"
+    assert entry["args"] == (2, 2)
+
+
+def test_different_groups_are_not_coalesced(queue, recorder):
+    _block_worker(queue, recorder)
+    target = queue.submit("set_target", ("a",))
+    move = queue.submit("moveto", (3, 4))
+    skill = queue.submit("use_skill", (7, "0"))
+    recorder.gate.set()
+    assert [f.result(2) for f in (target, move, skill)] == ["set_target:a", "moveto:3,4", "use_skill:7,0"]
+
+
+def test_normal_lane_runs_before_earlier_routine(queue, recorder):
+    _block_worker(queue, recorder)
+    routine = queue.submit("use_skill", (1, "0"), lane="routine")
+    normal = queue.submit("use_item", ("mp",), lane="normal")
+    recorder.gate.set()
+    routine.result(2)
+    normal.result(2)
+    assert recorder.sent[1:] == [("use_item", "mp"), ("use_skill", 1, "0")]
+
+
+def test_cancelled_entry_is_not_sent(queue, recorder):
+    _block_worker(queue, recorder)
+    dropped = queue.submit("use_item", ("x",))
+    kept = queue.submit("use_item", ("y",))
+    assert dropped.cancel()
+    recorder.gate.set()
+    assert kept.result(2) == "use_item:y"
+    assert ("use_item", "x") not in recorder.sent
+
+
+def test_run_gets_the_callers_remaining_time(queue, recorder):
+    _block_worker(queue, recorder)
+    expired = queue.submit("use_item", ("late",), timeout=0.05)
+    waiting = queue.submit("use_item", ("ok",), timeout=5)
+    time.sleep(0.1)
+    recorder.gate.set()
+    with pytest.raises(RpcTimeoutError):
+        expired.result(2)
+    assert waiting.result(2) == "use_item:ok"
+    assert ("use_item", "late") not in recorder.sent
+    assert 0 < recorder.timeouts[-1] < 5
+
+
+def test_limiter_wait_does_not_block_a_later_normal_action(recorder):
+    recorder.gate.set()
+    limiter = ActionRateLimiter(rate=5, burst=1, routine_reserve=0, routine_max_wait=2)
+    queue = ActionQueue(recorder, name="limited", limiter=limiter)
+    try:
+        queue.submit("use_item", ("hp",)).result(2) # 用掉唯一的額度
+        routine = queue.submit("use_skill", (1, "0"), lane="routine")
+        time.sleep(0.05)
+        normal = queue.submit("use_item", ("mp",), lane="normal")
+        normal.result(2)
+        routine.result(2)
+        assert recorder.sent[1:] == [("use_item", "mp"), ("use_skill", 1, "0")]
+    finally:
+        queue.close()
+
+
+def test_routine_gives_up_without_tokens(recorder):
+    recorder.gate.set()
+    limiter = ActionRateLimiter(rate=0.5, burst=1, routine_reserve=0, routine_max_wait=0.05)
+    queue = ActionQueue(recorder, name="limited", limiter=limiter)
+    try:
+        queue.submit("use_item", ("hp",)).result(2)
+        assert queue.submit("set_target", ("a",), lane="routine").result(2) is None
+        assert ("set_target", "a") not in recorder.sent
+    finally:
+        queue.close()
+
+
+def test_close_cancels_pending_entries(recorder):
+    queue = ActionQueue(recorder, name="closing")
+    _block_worker(queue, recorder)
+    pending = queue.submit("use_item", ("x",))
+    queue.close()
+    recorder.gate.set()
+    assert pending.cancelled()
+    with pytest.raises(RuntimeError):
+        queue.submit("use_item", ("y",))
+
+
+class GatedExports:
+    """所有呼叫在 gate 開啟前不返回，記錄送到 agent 的呼叫。"""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.lock = threading.Lock()
+
+    def __getattr__(self, method_name):
+        def call(*args):
+            with self.lock:
+                self.calls.append((method_name,) + args)
+            self.gate.wait(5)
+            return f"{method_name}-ok"
+
+        return call
+
+
+def test_client_timeout_withdraws_unsent_action():
+    exports = GatedExports()
+    client = RpcClient(exports, timeout=3)
+    try:
+        busy = threading.Thread(target=lambda: client.use_item("hp"))
+        busy.start()
+        with pytest.raises(RpcTimeoutError):
+            client.call("moveto", 1, 2, timeout=0.1)
+        exports.gate.set()
+        busy.join(3)
+        assert client.use_item("mp") == "use_item-ok"
+        assert ("moveto", 1, 2) not in exports.calls
+    finally:
+        client.close()
+
+
+def test_client_emergency_skips_the_queue():
+    exports = GatedExports()
+    client = RpcClient(exports, timeout=3)
+    try:
+        busy = threading.Thread(target=lambda: client.use_item("hp"))
+        busy.start()
+        escape = threading.Thread(target=lambda: client.use_item("escape", lane="emergency"))
+        escape.start()
+        # busy 仍卡在送出中，emergency 不排在它後面
+        end = time.monotonic() + 2
+        while ("use_item", "escape") not in exports.calls and time.monotonic() < end:
+            time.sleep(0.01)
+        assert ("use_item", "escape") in exports.calls
+        exports.gate.set()
+        busy.join(3)
+        escape.join(3)
+    finally:
+        client.close()
+
+
+def test_client_drops_queued_routine_action_without_tokens():
+    exports = GatedExports()
+    exports.gate.set()
+    limiter = ActionRateLimiter(rate=0.1, burst=1, routine_reserve=0, routine_max_wait=0.05)
+    client = RpcClient(exports, timeout=3, limiter=limiter)
+    try:
+        assert client.use_item("hp") == "use_item-ok"
+        assert client.set_target("a", lane="routine") is None
+        assert ("set_target", "a") not in exports.calls
+    finally:
+        client.close()
+
+
+def test_forward_result_copies_value():
+    source, target = concurrent.futures.Future(), concurrent.futures.Future()
+    source.set_result("done")
+    _forward_result(source, target)
+    assert target.result(0) == "done"
+
+
+def test_forward_result_copies_exception():
+    source, target = concurrent.futures.Future(), concurrent.futures.Future()
+    source.set_exception(RpcTimeoutError("slow"))
+    _forward_result(source, target)
+    with pytest.raises(RpcTimeoutError):
+        target.result(0)
+
+
+def test_forward_result_cancelled_source_resolves_to_none():
+    source, target = concurrent.futures.Future(), concurrent.futures.Future()
+    source.cancel()
+    _forward_result(source, target)
+    assert target.result(0) is None
+
+
+def test_forward_result_skips_cancelled_target():
+    source, target = concurrent.futures.Future(), concurrent.futures.Future()
+    target.cancel()
+    source.set_result("done")
+    _forward_result(source, target)
+    assert target.cancelled()
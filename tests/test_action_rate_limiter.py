@@ -0,0 +1,133 @@
+import threading
+
+import pytest
+
+import rpc_client
+from rpc_client import ActionRateLimiter, RpcClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rpc_client.time, "monotonic", clock)
+    return clock
+
+
+def test_normal_spends_burst_then_reports_wait(clock):
+    limiter = ActionRateLimiter(rate=10, burst=2, routine_reserve=0)
+    assert limiter.try_acquire("normal") == 0
+    assert limiter.try_acquire("normal") == 0
+    assert limiter.try_acquire("normal") == pytest.approx(0.1)
+    clock.now += 0.1
+    assert limiter.try_acquire("normal") == 0
+
+
+def test_refill_is_capped_at_burst(clock):
+    limiter = ActionRateLimiter(rate=10, burst=2, routine_reserve=0)
+    clock.now += 60
+    for _ in range(2):
+        assert limiter.try_acquire("normal") == 0
+    assert limiter.try_acquire("normal") > 0
+
+
+def test_routine_leaves_reserve_for_normal(clock):
+    limiter = ActionRateLimiter(rate=10, burst=5, routine_reserve=2)
+    for _ in range(3):
+        assert limiter.try_acquire("routine") == 0
+    # 剩下 2 個額度保留給 normal
+    assert limiter.try_acquire("routine") == pytest.approx(0.1)
+    assert limiter.try_acquire("normal") == 0
+    assert limiter.try_acquire("normal") == 0
+    assert limiter.try_acquire("normal") > 0
+
+
+def test_routine_reserve_is_below_burst(clock):
+    limiter = ActionRateLimiter(rate=10, burst=2, routine_reserve=5)
+    assert limiter.routine_reserve == 1
+    assert limiter.try_acquire("routine") == 0
+
+
+def test_emergency_never_waits_and_debt_is_bounded(clock):
+    limiter = ActionRateLimiter(rate=10, burst=2)
+    for _ in range(10):
+        assert limiter.try_acquire("emergency") == 0
+    assert limiter.tokens == -2
+    # 欠下的額度要先補回，normal 才能送出
+    assert limiter.try_acquire("normal") == pytest.approx(0.3)
+
+
+def test_unknown_lane_is_rejected(clock):
+    with pytest.raises(ValueError):
+        ActionRateLimiter().try_acquire("urgent")
+
+
+def test_blocking_acquire_gives_up_on_routine():
+    limiter = ActionRateLimiter(rate=1, burst=1, routine_reserve=0, routine_max_wait=0.05)
+    assert limiter.acquire("routine") is True
+    assert limiter.acquire("routine") is False
+
+
+def test_blocking_acquire_waits_for_normal():
+    limiter = ActionRateLimiter(rate=50, burst=1)
+    assert limiter.acquire("normal") is True
+    assert limiter.acquire("normal") is True
+
+
+class RecordingExports:
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __getattr__(self, method_name):
+        def call(*args):
+            with self.lock:
+                self.calls.append((method_name,) + args)
+            return f"{method_name}-ok"
+
+        return call
+
+
+def test_client_drops_routine_action_without_tokens():
+    exports = RecordingExports()
+    limiter = ActionRateLimiter(rate=0.1, burst=1, routine_reserve=0, routine_max_wait=0.05)
+    client = RpcClient(exports, timeout=3, limiter=limiter)
+    try:
+        assert client.use_item("hp") == "use_item-ok"
+        # 被放棄的 routine 動作回傳 None，不會送到 agent
+        assert client.set_target("a", lane="routine") is None
+        assert client.use_item("escape", lane="emergency") == "use_item-ok"
+        assert exports.calls == [("use_item", "hp"), ("use_item", "escape")]
+    finally:
+        client.close()
+
+
+def test_client_does_not_limit_reads():
+    exports = RecordingExports()
+    limiter = ActionRateLimiter(rate=0.1, burst=1, routine_reserve=0, routine_max_wait=0.05)
+    client = RpcClient(exports, timeout=3, limiter=limiter)
+    try:
+        client.use_item("hp")
+        assert [client.get_info(201) for _ in range(3)] == ["get_info-ok"] * 3
+    finally:
+        client.close()
+
+
+def test_client_limits_select_nearest():
+    exports = RecordingExports()
+    limiter = ActionRateLimiter(rate=0.1, burst=1, routine_reserve=0, routine_max_wait=0.05)
+    client = RpcClient(exports, timeout=3, limiter=limiter)
+    try:
+        assert client.select_nearest(["哥布林"], {"action": "attack"}) == "select_nearest-ok"
+        # 定時指定目標走 routine，額度不足時放棄而不是送到 agent
+        assert client.select_nearest(["哥布林"], {"action": "attack"}, lane="routine") is None
+        assert [call[0] for call in exports.calls] == ["select_nearest"]
+    finally:
+        client.close()
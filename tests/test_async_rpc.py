@@ -0,0 +1,196 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import fake_agent
+from async_rpc import AsyncRpcClient
+from rpc_client import ActionRateLimiter, RpcClient, RpcTimeoutError
+from world_state import WorldState
+
+
+class SyncExports:
+    """RpcClient 的 exports_sync: 動作經由 ActionQueue 送出時記錄在 sent。"""
+
+    def __init__(self):
+        self.sent = []
+
+    def use_item(self, key):
+        self.sent.append(("use_item", key))
+        return f"used-{key}"
+
+    def select_nearest(self, lines, options):
+        self.sent.append(("select_nearest", tuple(lines)))
+        return json.dumps({"status": "not_found"})
+
+
+class AsyncExports:
+    """exports_async: get_info 在 release 之前不返回，記錄實際送到 agent 的呼叫。"""
+
+    def __init__(self):
+        self.calls = []
+        self.release = asyncio.Event()
+
+    async def get_info(self, code):
+        self.calls.append(("get_info", code))
+        await self.release.wait()
+        return f"info-{code}"
+
+    async def get_info_batch(self, codes):
+        self.calls.append(("get_info_batch", tuple(codes)))
+        return [f"info-{code}" for code in codes]
+
+    async def use_item(self, key):
+        self.calls.append(("use_item", key))
+        return f"direct-{key}"
+
+
+@pytest.fixture
+def client():
+    client = RpcClient(SyncExports(), timeout=2, name="async-test")
+    yield client
+    client.close()
+
+
+def test_single_flight_coalesces_identical_reads(client):
+    async def run():
+        exports = AsyncExports()
+        api = AsyncRpcClient(client, exports)
+        tasks = [asyncio.ensure_future(api.get_info(201)) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        assert len(api.inflight) == 1
+        exports.release.set()
+        results = await asyncio.gather(*tasks)
+        assert results == ["info-201"] * 5
+        assert exports.calls == [("get_info", 201)]
+        assert api.inflight == {}
+        # 完成後的查詢會發出新的 RPC
+        assert await api.get_info(201) == "info-201"
+        assert len(exports.calls) == 2
+
+    asyncio.run(run())
+
+
+def test_read_timeout_raises_and_clears_pending(client):
+    async def run():
+        exports = AsyncExports()
+        api = AsyncRpcClient(client, exports)
+        task = asyncio.ensure_future(api.get_info(201, timeout=0.1))
+        await asyncio.sleep(0.01)
+        # 執行中的呼叫登記在 RpcClient 的 pending，由共用的看門狗檢查
+        assert [entry[0] for entry in client.pending.values()] == ["get_info"]
+        with pytest.raises(RpcTimeoutError):
+            await task
+        exports.release.set()
+        await asyncio.sleep(0.01)
+        assert client.pending == {}
+
+    asyncio.run(run())
+
+
+def test_batch_results_are_copies(client):
+    async def run():
+        api = AsyncRpcClient(client, AsyncExports())
+        first, second = await asyncio.gather(api.get_info_batch([201, 203]), api.get_info_batch([201, 203]))
+        assert first == second == ["info-201", "info-203"]
+        assert first is not second
+
+    asyncio.run(run())
+
+
+def test_actions_are_queued_then_sent_with_exports_async(client):
+    async def run():
+        exports = AsyncExports()
+        api = AsyncRpcClient(client, exports)
+        # 同步呼叫端的動作佔住佇列，協程的動作排在其後
+        gate = threading.Event()
+        client._exports.use_item = lambda key: gate.wait(5) and client._exports.sent.append(("use_item", key))
+        blocked = threading.Thread(target=client.use_item, args=("first",))
+        blocked.start()
+        task = asyncio.ensure_future(api.use_item("hp"))
+        await asyncio.sleep(0.05)
+        assert exports.calls == []
+        gate.set()
+        assert await task == "direct-hp"
+        blocked.join(2)
+        assert client._exports.sent == [("use_item", "first")]
+        assert exports.calls == [("use_item", "hp")]
+
+    asyncio.run(run())
+
+
+def test_queued_action_timeout(client):
+    async def run():
+        class SlowExports(AsyncExports):
+            async def use_item(self, key):
+                await asyncio.sleep(1)
+
+        api = AsyncRpcClient(client, SlowExports())
+        with pytest.raises(RpcTimeoutError):
+            await api.use_item("hp", timeout=0.1)
+
+    asyncio.run(run())
+
+
+def test_emergency_is_sent_directly(client):
+    async def run():
+        exports = AsyncExports()
+        api = AsyncRpcClient(client, exports)
+        assert await api.use_item("scroll", lane="emergency") == "direct-scroll"
+        assert exports.calls == [("use_item", "scroll")]
+        assert client._exports.sent == []
+
+    asyncio.run(run())
+
+
+def test_routine_action_dropped_when_rate_limited():
+    client = RpcClient(SyncExports(), timeout=2, name="async-limited",
+                       limiter=ActionRateLimiter(rate=0.01, burst=3, routine_reserve=2, routine_max_wait=0.05))
+    try:
+        async def run():
+            exports = AsyncExports()
+            api = AsyncRpcClient(client, exports)
+            assert await api.use_item("a") == "direct-a"
+            # 剩餘額度只夠保留給 normal，routine 等待後放棄
+            assert await api.select_nearest(["哥布林"], {}, lane="routine") is None
+            assert exports.calls == [("use_item", "a")]
+
+        asyncio.run(run())
+    finally:
+        client.close()
+
+
+def test_closed_client_rejects_calls(client):
+    async def run():
+        api = AsyncRpcClient(client, AsyncExports())
+        client.close()
+        with pytest.raises(RuntimeError):
+            await api.get_info(201)
+
+    asyncio.run(run())
+
+
+def test_world_state_async_reads_share_the_cache():
+    script = fake_agent.FakeDevice(monster_count=5, seed=1).attach(fake_agent.FAKE_PID).create_script("")
+    client = RpcClient(script.exports_sync, timeout=2, name="async-world")
+    try:
+        api = AsyncRpcClient(client, script.exports_async)
+        state = WorldState(client, max_age=10, async_api=api)
+
+        async def run():
+            player, world = await state.get_many_async([201, 203])
+            assert player["status"] == world["status"] == "success"
+            assert any(obj.get("type") == 6 for obj in world["data"])
+            again = await state.get_async(201)
+            assert again is player
+            return player
+
+        player = asyncio.run(run())
+        # 執行緒與協程共用同一份快取
+        assert state.get(201) is player
+        counts = script.exports_sync.call_counts
+        assert counts.get("get_world_delta") == 1
+        assert "get_info" not in counts
+    finally:
+        client.close()
@@ -0,0 +1,119 @@
+import gzip
+import json
+import os
+
+import pytest
+
+import capture
+from capture import CaptureRecorder, ReplayDevice, ReplayExports, read_capture
+
+
+class CountingExports:
+    def __init__(self):
+        self.count = 0
+
+    def get_info(self, code):
+        self.count += 1
+        return json.dumps({"status": "success", "code": code, "n": self.count})
+
+    def use_item(self, key):
+        return "used"
+
+    def moveto(self, x, y):
+        raise Exception("路徑不通")
+
+
+def _record(path, exports=None):
+    recorder = CaptureRecorder(exports or CountingExports(), str(path))
+    recorder.get_info(201)
+    recorder.get_info(203)
+    recorder.use_item("hp")
+    with pytest.raises(Exception):
+        recorder.moveto(1, 2)
+    recorder.record_frame({"type": "world", "seq": 1}, b"\x01\x02")
+    return recorder
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "a.jsonl.gz"
+    _record(path).close()
+    records = list(read_capture(str(path)))
+    assert [r["m"] for r in records] == ["get_info", "get_info", "use_item", "moveto", "frame"]
+    assert records[0]["a"] == [201]
+    assert json.loads(records[1]["r"])["code"] == 203
+    assert records[3]["e"] == "路徑不通"
+    assert records[4]["p"] == {"type": "world", "seq": 1}
+
+
+def test_replay_returns_recorded_results_in_order(tmp_path):
+    path = tmp_path / "a.jsonl.gz"
+    recorder = CaptureRecorder(CountingExports(), str(path))
+    for _ in range(3):
+        recorder.get_info(201)
+    recorder.close()
+    replay = ReplayExports(list(read_capture(str(path))), script=None, speed=None)
+    assert [json.loads(replay.get_info(201))["n"] for _ in range(4)] == [1, 2, 3, 3]
+    assert json.loads(replay.get_info(999))["status"] == "error"
+
+
+def test_replay_records_actions_and_raises_recorded_errors(tmp_path):
+    path = tmp_path / "a.jsonl.gz"
+    _record(path).close()
+    replay = ReplayExports(list(read_capture(str(path))), script=None, speed=None)
+    assert replay.use_item("hp") == "used"
+    with pytest.raises(Exception, match="路徑不通"):
+        replay.moveto(1, 2)
+    assert [(m, a) for _, m, a in replay.actions] == [("use_item", ("hp",)), ("moveto", (1, 2))]
+
+
+def test_truncated_tail_is_skipped(tmp_path):
+    path = tmp_path / "a.jsonl.gz"
+    recorder = _record(path)
+    for code in range(2000):
+        recorder.get_info(code)
+    recorder.close()
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) // 2])
+    records = list(read_capture(str(path)))
+    assert 5 <= len(records) < 2005
+    assert all("m" in r for r in records)
+
+
+def test_replay_device_rejects_empty_capture(tmp_path):
+    path = tmp_path / "empty.jsonl.gz"
+    with gzip.open(path, "wt", encoding="utf-8"):
+        pass
+    with pytest.raises(Exception):
+        ReplayDevice(str(path)).attach(0)
+
+
+def test_crash_then_restart_keeps_earlier_records(tmp_path):
+    path = tmp_path / "a.jsonl.gz"
+    recorder = CaptureRecorder(CountingExports(), str(path))
+    for code in range(50):
+        recorder.get_info(code)
+    # 程式中斷: 已 flush 但 gzip 尾端沒有寫入
+    recorder.file.flush()
+    crashed = path.read_bytes()
+    recorder.close()
+
+    restarted = tmp_path / "b.jsonl.gz"
+    _record(restarted).close()
+    # 舊版以附加模式錄製時，下一段會直接接在不完整的一段之後
+    path.write_bytes(crashed + restarted.read_bytes())
+
+    records = list(read_capture(str(path)))
+    assert [r["a"] for r in records] == [[code] for code in range(50)]
+    assert len(list(read_capture(str(restarted)))) == 5
+
+
+def test_capture_path_is_per_session(monkeypatch):
+    monkeypatch.setattr(capture, "CAPTURE_DIR", "caps")
+    first, second = capture.capture_path("emu1"), capture.capture_path("emu1")
+    assert first.startswith("caps")
+    assert "emu1-" in first
+    assert first != second
+
+
+def test_capture_dir_does_not_depend_on_cwd():
+    assert os.path.isabs(capture.CAPTURE_DIR)
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+import json_codec
+
+
+@pytest.fixture(params=["default", "stdlib"])
+def codec(request, monkeypatch):
+    """分別以目前的解析器 (有安裝時為 orjson) 與標準函式庫測試。"""
+    if request.param == "stdlib":
+        monkeypatch.setattr(json_codec, "orjson", None)
+    return json_codec
+
+
+SAMPLE = '{"status": "success", "data": [{"objectKey": 9007199254740993, "name": "巨大牛人", "x": -1.5, "attackMe": true, "buff": []}]}'
+
+
+def test_matches_json_loads(codec):
+    assert codec.loads(SAMPLE) == json.loads(SAMPLE)
+
+
+def test_accepts_bytes(codec):
+    assert codec.loads(SAMPLE.encode("utf-8")) == json.loads(SAMPLE)
+
+
+def test_large_object_key_keeps_precision(codec):
+    assert codec.loads(SAMPLE)["data"][0]["objectKey"] == 9007199254740993
+
+
+@pytest.mark.parametrize("raw", ["", "not json", "{", "[RPC] 錯誤"])
+def test_invalid_input_raises_json_decode_error(codec, raw):
+    with pytest.raises(json.JSONDecodeError):
+        codec.loads(raw)
+
+
+def test_wrong_type_raises_type_error(codec):
+    with pytest.raises(TypeError):
+        codec.loads(None)
+
+
+def test_backend_name():
+    assert json_codec.BACKEND.startswith("orjson" if json_codec.orjson is not None else "json")
@@ -0,0 +1,85 @@
+import math
+
+import pytest
+
+import world_state
+from world_state import MonsterGeometry, WorldSnapshot
+
+PLAYER = {"status": "success", "data": {"x": 0, "y": 0}}
+MONSTERS = [
+    {"objectKey": 1, "type": 6, "name": "哥布林", "x": 3, "y": 4, "attackMe": True},
+    {"objectKey": 2, "type": 6, "name": "巨大牛人", "x": 6, "y": 8, "attackMe": True},
+    {"objectKey": 3, "type": 6, "name": "哥布林", "x": 20, "y": 0},
+    {"objectKey": 4, "type": 6, "name": "幽靈"},
+    {"objectKey": 5, "type": 3, "name": "金幣", "x": 1, "y": 1},
+]
+BLACKLIST = {"巨大牛人"}
+
+
+@pytest.fixture(params=["python", "numpy"])
+def np_mode(request, monkeypatch):
+    """分別以 Python 迴圈與 NumPy (有安裝時) 計算，兩者結果必須相同。"""
+    if request.param == "python":
+        monkeypatch.setattr(world_state, "np", None)
+    elif world_state.np is None:
+        pytest.skip("沒有安裝 NumPy")
+    return request.param
+
+
+def _geometry():
+    return MonsterGeometry(WorldSnapshot(PLAYER, {"status": "success", "data": MONSTERS}), BLACKLIST)
+
+
+def _keys(pairs):
+    return [m.key for m, _ in pairs]
+
+
+def test_distances_and_blacklist(np_mode):
+    geometry = _geometry()
+    assert geometry.distances == pytest.approx([5, 10, 20, 0])
+    assert geometry.blocked == [False, True, False, False]
+    assert geometry.blacklist_count == 1
+
+
+def test_count_within(np_mode):
+    geometry = _geometry()
+    # 缺少座標的怪物距離為 0，一律在範圍內
+    assert geometry.count_within(5) == 2
+    assert geometry.count_within(10) == 2
+    assert geometry.count_within(10, include_blacklisted=True) == 3
+    assert geometry.count_within(100) == 3
+
+
+def test_attackers_exclude_blacklist(np_mode):
+    assert _keys(_geometry().attackers()) == ["1"]
+    assert _geometry().attackers()[0][1] == pytest.approx(5)
+
+
+def test_within(np_mode):
+    geometry = _geometry()
+    assert _keys(geometry.within(10)) == ["1", "4"]
+    assert _keys(geometry.within(10, include_blacklisted=True)) == ["1", "2", "4"]
+
+
+def test_monster_columns_without_numpy(monkeypatch):
+    monkeypatch.setattr(world_state, "np", None)
+    snapshot = WorldSnapshot(PLAYER, {"status": "success", "data": MONSTERS})
+    assert snapshot.monster_columns() is None
+
+
+def test_geometry_matches_per_monster_distance(np_mode):
+    geometry = _geometry()
+    for monster, dist in zip(geometry.monsters, geometry.distances):
+        assert dist == pytest.approx(monster.distance(0, 0))
+        assert not math.isnan(dist)
+
+
+def test_object_columns():
+    np = pytest.importorskip("numpy")
+    snapshot = WorldSnapshot(PLAYER, {"status": "success", "data": MONSTERS})
+    columns = snapshot.monster_columns()
+    assert columns is snapshot.monster_columns()
+    assert columns.distances(0, 0).tolist() == pytest.approx([5, 10, 20, 0])
+    assert columns.name_mask({"哥布林"}).tolist() == [True, False, True, False]
+    assert columns.attack_me.tolist() == [True, True, False, False]
+    assert np.isnan(columns.x[3])
@@ -0,0 +1,72 @@
+import struct
+
+from world_state import decode_packed_world
+
+MISSING_32 = -2 ** 31
+MISSING_64 = -2 ** 63
+INT64_FIELDS = ("objectKey", "playerID", "earthObjectID", "attackID")
+INT32_FIELDS = ("type", "x", "y", "curHP", "maxHP")
+
+
+def pack_world(objects, version=1):
+    """以 Python 重現 agent 的 packWorld，產生 decode_packed_world 的輸入。"""
+    count = len(objects)
+    names, name_index = [], {}
+    for obj in objects:
+        if "name" in obj and obj["name"] not in name_index:
+            name_index[obj["name"]] = len(names)
+            names.append(obj["name"])
+    buffs = [value for obj in objects for buff in obj.get("buff", []) for value in (buff["skillID"], buff["remainTime"])]
+    name_raw = "\0".join(names).encode("utf-8")
+
+    cols64 = [obj.get(field, MISSING_64) for field in INT64_FIELDS for obj in objects]
+    cols32 = [obj.get(field, MISSING_32) for field in INT32_FIELDS for obj in objects]
+    cols32 += [name_index.get(obj.get("name"), -1) for obj in objects]
+    cols32 += [len(obj.get("buff", [])) for obj in objects]
+    flags = bytes(1 if obj.get("attackMe") else 0 for obj in objects)
+
+    return (struct.pack("<4i", version, count, len(buffs) // 2, len(name_raw))
+            + struct.pack(f"<{len(cols64)}q", *cols64)
+            + struct.pack(f"<{len(cols32)}i", *cols32)
+            + struct.pack(f"<{len(buffs)}i", *buffs)
+            + flags + name_raw)
+
+
+def test_round_trip():
+    objects = [
+        {"objectKey": 12345678901234567, "playerID": 7, "earthObjectID": 8, "attackID": 0,
+         "type": 1, "x": 10, "y": -20, "curHP": 50, "maxHP": 100, "name": "巨大牛人",
+         "buff": [{"skillID": 1, "remainTime": 30}, {"skillID": 2, "remainTime": 0}], "attackMe": True},
+        {"objectKey": 2, "playerID": 0, "earthObjectID": 0, "attackID": 0,
+         "type": 2, "x": 0, "y": 0, "curHP": 1, "maxHP": 1, "name": "金幣", "buff": [], "attackMe": False},
+    ]
+    assert decode_packed_world(pack_world(objects)) == {"status": "success", "data": objects}
+
+
+def test_missing_fields_are_omitted():
+    world = decode_packed_world(pack_world([{"objectKey": 1, "x": 5}]))
+    assert world["data"] == [{"objectKey": 1, "x": 5, "buff": [], "attackMe": False}]
+
+
+def test_shared_names_and_buff_offsets():
+    objects = [
+        {"objectKey": 1, "name": "哥布林", "buff": [{"skillID": 9, "remainTime": 1}]},
+        {"objectKey": 2},
+        {"objectKey": 3, "name": "哥布林", "buff": [{"skillID": 4, "remainTime": 2}, {"skillID": 5, "remainTime": 3}]},
+    ]
+    data = decode_packed_world(pack_world(objects))["data"]
+    assert [obj.get("name") for obj in data] == ["哥布林", None, "哥布林"]
+    assert [[buff["skillID"] for buff in obj["buff"]] for obj in data] == [[9], [], [4, 5]]
+
+
+def test_empty_world():
+    assert decode_packed_world(pack_world([])) == {"status": "success", "data": []}
+
+
+def test_unknown_version_is_an_error():
+    assert decode_packed_world(pack_world([], version=2))["status"] == "error"
+
+
+def test_accepts_bytearray():
+    data = bytearray(pack_world([{"objectKey": 1, "name": "a"}]))
+    assert decode_packed_world(data)["data"][0]["name"] == "a"
@@ -0,0 +1,193 @@
+import threading
+import time
+
+import pytest
+
+from rpc_client import RpcClient, RpcTimeoutError
+
+
+class BlockingExports:
+    """get_info / get_info_batch 在 release 之前不返回，記錄實際送到 agent 的呼叫。"""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+
+    def _record(self, name, args):
+        with self.lock:
+            self.calls.append((name, args))
+
+    def get_info(self, code):
+        self._record("get_info", (code,))
+        self.release.wait(5)
+        return f"info-{code}"
+
+    def get_info_batch(self, codes):
+        self._record("get_info_batch", (codes,))
+        self.release.wait(5)
+        return [f"info-{code}" for code in codes]
+
+
+def _call_in_threads(fn, count):
+    results = [None] * count
+
+    def run(i):
+        results[i] = fn()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def _wait_until(predicate, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > end:
+            raise AssertionError("等待逾時")
+        time.sleep(0.01)
+
+
+def test_single_flight_coalesces_identical_reads():
+    exports = BlockingExports()
+    client = RpcClient(exports, timeout=3)
+    try:
+        threads, results = _call_in_threads(lambda: client.get_info(201), 5)
+        _wait_until(lambda: len(client.inflight) == 1 and exports.calls)
+        time.sleep(0.05) # 讓其餘執行緒也進入等待
+        exports.release.set()
+        for thread in threads:
+            thread.join(3)
+        assert results == ["info-201"] * 5
+        assert exports.calls == [("get_info", (201,))]
+        assert client.inflight == {}
+    finally:
+        client.close()
+
+
+def test_single_flight_keeps_different_arguments_apart():
+    exports = BlockingExports()
+    exports.release.set()
+    client = RpcClient(exports, timeout=3)
+    try:
+        assert client.get_info(201) == "info-201"
+        assert client.get_info(203) == "info-203"
+        # 前一次呼叫已完成，相同參數會再發出新的 RPC
+        assert client.get_info(201) == "info-201"
+        assert [args for _, args in exports.calls] == [(201,), (203,), (201,)]
+    finally:
+        client.close()
+
+
+def test_single_flight_batch_results_are_copied_per_caller():
+    exports = BlockingExports()
+    client = RpcClient(exports, timeout=3)
+    try:
+        threads, results = _call_in_threads(lambda: client.get_info_batch([201, 203]), 2)
+        _wait_until(lambda: exports.calls)
+        time.sleep(0.05)
+        exports.release.set()
+        for thread in threads:
+            thread.join(3)
+        assert results[0] == results[1] == ["info-201", "info-203"]
+        assert results[0] is not results[1]
+        assert len(exports.calls) == 1
+    finally:
+        client.close()
+
+
+def test_single_flight_timeout_leaves_shared_call_running():
+    exports = BlockingExports()
+    client = RpcClient(exports, timeout=3)
+    try:
+        slow = threading.Thread(target=lambda: client.get_info(201))
+        slow.start()
+        _wait_until(lambda: exports.calls)
+        with pytest.raises(RpcTimeoutError):
+            client.call("get_info", 201, timeout=0.1)
+        # 逾時的呼叫端不取消共用的查詢，另一個呼叫端仍取得結果
+        future = client.inflight[("get_info", repr((201,)))]
+        assert not future.cancelled()
+        exports.release.set()
+        slow.join(3)
+        assert future.result() == "info-201"
+    finally:
+        client.close()
+
+
+def test_clients_share_one_watchdog_and_pool():
+    clients = [RpcClient(BlockingExports(), timeout=3, name=f"emu{i}") for i in range(3)]
+    try:
+        for client in clients:
+            client._exports.release.set()
+            client.get_info(201)
+        watchdogs = [t for t in threading.enumerate() if t.name == "rpc-watchdog"]
+        assert len(watchdogs) == 1
+        assert not [t for t in threading.enumerate() if t.name.startswith("rpc-watchdog-")]
+        # 沒有送出過動作的實例不啟動動作執行緒
+        assert all(client.actions.thread is None for client in clients)
+    finally:
+        for client in clients:
+            client.close()
+
+
+def test_per_client_cap_keeps_a_hung_instance_from_filling_the_pool():
+    hung = BlockingExports()
+    hung_client = RpcClient(hung, timeout=3, max_workers=2)
+    healthy = BlockingExports()
+    healthy.release.set()
+    healthy_client = RpcClient(healthy, timeout=3)
+    try:
+        threads = [threading.Thread(target=lambda code=code: hung_client.get_info(code)) for code in (1, 2)]
+        for thread in threads:
+            thread.start()
+        _wait_until(lambda: len(hung.calls) == 2)
+        # 空位已滿，第三個呼叫等待空位直到逾時，不會再佔用共用的執行緒
+        with pytest.raises(RpcTimeoutError):
+            hung_client.call("get_info", 3, timeout=0.1)
+        assert len(hung.calls) == 2
+        assert healthy_client.get_info(201) == "info-201"
+        hung.release.set()
+        for thread in threads:
+            thread.join(3)
+        assert hung_client.get_info(4) == "info-4"
+    finally:
+        hung_client.close()
+        healthy_client.close()
+
+
+def test_close_leaves_other_clients_running():
+    exports = BlockingExports()
+    exports.release.set()
+    client = RpcClient(exports, timeout=3)
+    other = RpcClient(exports, timeout=3)
+    client.get_info(201)
+    client.close()
+    try:
+        with pytest.raises(RuntimeError):
+            client.get_info(201)
+        # 共用的執行緒池不隨單一實例關閉
+        assert other.get_info(203) == "info-203"
+        assert client.futures == set()
+    finally:
+        other.close()
+
+
+def test_watchdog_reports_hung_and_recovered_calls():
+    events = []
+    exports = BlockingExports()
+    client = RpcClient(exports, timeout=3, hung_after=0.05, on_hung=lambda *args: events.append(args))
+    try:
+        caller = threading.Thread(target=lambda: client.get_info(201))
+        caller.start()
+        _wait_until(lambda: exports.calls)
+        time.sleep(0.1)
+        client._check_hung()
+        assert events[0][:2] == (True, "get_info")
+        exports.release.set()
+        caller.join(3)
+        client._check_hung()
+        assert events[1] == (False, None, 0)
+    finally:
+        client.close()
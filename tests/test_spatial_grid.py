@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from world_state import SpatialGrid, WorldObject
+
+
+def _objects(points):
+    return [WorldObject({"objectKey": i, "x": x, "y": y}) for i, (x, y) in enumerate(points)]
+
+
+def _pairwise(objects, obj, radius):
+    return sum(1 for other in objects if other is not obj and other.distance(obj.x, obj.y) <= radius)
+
+
+@pytest.mark.parametrize("radius,cell_size", [(3, 3), (5, 3), (2, 7), (0.5, 1)])
+def test_matches_pairwise_count(radius, cell_size):
+    rng = random.Random(radius * 100 + cell_size)
+    objects = _objects((rng.randint(-30, 30), rng.randint(-30, 30)) for _ in range(200))
+    grid = SpatialGrid(objects, cell_size)
+    for obj in objects:
+        assert grid.count_within(obj, radius) == _pairwise(objects, obj, radius)
+
+
+def test_boundary_distance_is_included():
+    objects = _objects([(0, 0), (3, 0), (3, 4), (4, 4)])
+    grid = SpatialGrid(objects, 5)
+    assert grid.count_within(objects[0], 5) == 2
+
+
+def test_query_object_is_not_counted():
+    objects = _objects([(1, 1), (1, 1)])
+    grid = SpatialGrid(objects, 3)
+    assert grid.count_within(objects[0], 0) == 1
+
+
+def test_objects_without_coordinates_always_count():
+    objects = _objects([(0, 0), (50, 50), (None, None), (3, None)])
+    grid = SpatialGrid(objects, 5)
+    assert grid.count_within(objects[0], 5) == 2
+    assert grid.count_within(objects[1], 5) == 2
+    assert grid.count_within(objects[2], 5) == 3
+
+
+def test_matches_pairwise_count_with_missing_coordinates():
+    rng = random.Random(24)
+    points = [(rng.randint(-20, 20), rng.randint(-20, 20)) for _ in range(100)]
+    points += [(None, None), (None, 4), (7, None)]
+    rng.shuffle(points)
+    objects = _objects(points)
+    grid = SpatialGrid(objects, 4)
+    for obj in objects:
+        assert grid.count_within(obj, 4) == _pairwise(objects, obj, 4)
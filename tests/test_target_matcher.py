@@ -0,0 +1,57 @@
+from target_matcher import TargetMatcher, compile_lines, compile_patterns
+
+
+def test_exact_and_prefix_patterns():
+    matcher = compile_patterns(["哥布林", "巨大*"])
+    assert "哥布林" in matcher
+    assert "哥布林王" not in matcher
+    assert "巨大牛人" in matcher
+    assert "巨大" in matcher
+    assert "巨" not in matcher
+
+
+def test_star_alone_matches_everything():
+    matcher = compile_patterns(["*"])
+    assert matcher.matches("任何名稱")
+    assert matcher.matches("")
+
+
+def test_patterns_are_not_split_on_pipe():
+    matcher = compile_patterns(["a|b"])
+    assert "a|b" in matcher
+    assert "a" not in matcher
+
+
+def test_non_string_names_never_match():
+    matcher = compile_patterns(["*"])
+    assert matcher.level(None) is None
+    assert matcher.level(123) is None
+
+
+def test_empty_list_is_falsy():
+    assert not compile_patterns([])
+    assert compile_patterns(["a"])
+
+
+def test_lines_split_on_pipe_and_keep_priority():
+    matcher = compile_lines(["王 | 將軍*", "", "  ", "小兵|*"])
+    assert matcher.levels == [["王", "將軍*"], ["小兵", "*"]]
+    assert matcher.level("王") == 0
+    assert matcher.level("將軍甲") == 0
+    assert matcher.level("小兵") == 1
+    assert matcher.level("路人") == 1
+
+
+def test_most_urgent_level_wins_across_exact_and_prefix():
+    matcher = TargetMatcher([["巨大*"], ["巨大牛人"], ["巨*"]])
+    assert matcher.level("巨大牛人") == 0
+    matcher = TargetMatcher([["巨*"], ["巨大*"]])
+    assert matcher.level("巨大牛人") == 0
+    matcher = TargetMatcher([["巨大牛人"], ["巨*"]])
+    assert matcher.level("巨大牛人") == 0
+    assert matcher.level("巨石") == 1
+
+
+def test_same_list_returns_cached_instance():
+    assert compile_patterns(["a", "b*"]) is compile_patterns(("a", "b*"))
+    assert compile_lines(["a|b", "c"]) is compile_lines(["a | b", "c"])
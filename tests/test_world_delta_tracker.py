@@ -0,0 +1,115 @@
+import json
+
+import pytest
+
+from world_state import WorldDeltaTracker
+
+
+class ScriptedApi:
+    """依序回傳預先準備的 getWorldDelta 回應，並記錄每次呼叫的參數。"""
+
+    def __init__(self, *payloads):
+        self.payloads = list(payloads)
+        self.calls = []
+
+    def get_world_delta(self, channel, seq, extra_codes, options=None):
+        self.calls.append((channel, seq, extra_codes, options))
+        payload = self.payloads.pop(0)
+        if isinstance(payload, Exception):
+            raise payload
+        return payload if isinstance(payload, str) else json.dumps(payload)
+
+
+def _obj(key, name, x=0, y=0):
+    return {"objectKey": key, "name": name, "x": x, "y": y}
+
+
+def _names(world):
+    return sorted(obj["name"] for obj in world["data"])
+
+
+def test_full_snapshot_then_delta():
+    api = ScriptedApi(
+        {"status": "success", "full": True, "seq": 1, "data": [_obj(1, "a"), _obj(2, "b")]},
+        {"status": "success", "full": False, "seq": 2,
+         "added": [_obj(3, "c")], "changed": [_obj(1, "a2")], "removed": ["2"]},
+    )
+    tracker = WorldDeltaTracker(api, channel="test", options={"types": [1]})
+    assert _names(tracker.fetch()) == ["a", "b"]
+    assert _names(tracker.fetch()) == ["a2", "c"]
+    assert api.calls == [("test", -1, [], {"types": [1]}), ("test", 1, [], {"types": [1]})]
+    assert tracker.seq == 2
+
+
+def test_string_and_integer_keys_are_the_same_object():
+    big = 12345678901234567
+    api = ScriptedApi(
+        {"status": "success", "full": True, "seq": 1, "data": [_obj(str(big), "boss")]},
+        {"status": "success", "full": False, "seq": 2, "added": [], "changed": [_obj(big, "boss2")], "removed": []},
+        {"status": "success", "full": False, "seq": 3, "added": [], "changed": [], "removed": [str(big)]},
+    )
+    tracker = WorldDeltaTracker(api)
+    tracker.fetch()
+    assert _names(tracker.fetch()) == ["boss2"]
+    assert tracker.fetch()["data"] == []
+
+
+def test_extra_results_are_returned_separately():
+    api = ScriptedApi({"status": "success", "full": True, "seq": 1, "data": [], "extra": ['{"x": 1}']})
+    extra, world = WorldDeltaTracker(api).fetch_with([201])
+    assert extra == ['{"x": 1}']
+    assert "extra" not in world
+    assert api.calls[0][2] == [201]
+
+
+def test_untracked_full_list_is_used_directly():
+    api = ScriptedApi(
+        {"status": "success", "full": True, "seq": -1, "data": [{"name": "no-key"}]},
+        {"status": "success", "full": True, "seq": -1, "data": [{"name": "again"}]},
+    )
+    tracker = WorldDeltaTracker(api)
+    assert _names(tracker.fetch()) == ["no-key"]
+    assert _names(tracker.fetch()) == ["again"]
+    assert [call[1] for call in api.calls] == [-1, -1]
+    assert tracker.objects == {}
+
+
+def test_error_status_requests_full_snapshot_next_time():
+    api = ScriptedApi(
+        {"status": "success", "full": True, "seq": 5, "data": [_obj(1, "a")]},
+        {"status": "error", "message": "not ready"},
+        {"status": "success", "full": True, "seq": 1, "data": [_obj(1, "a")]},
+    )
+    tracker = WorldDeltaTracker(api)
+    tracker.fetch()
+    assert tracker.fetch()["status"] == "error"
+    tracker.fetch()
+    assert [call[1] for call in api.calls] == [-1, 5, -1]
+
+
+@pytest.mark.parametrize("failure", [RuntimeError("rpc lost"), "not json"])
+def test_failed_call_requests_full_snapshot_next_time(failure):
+    api = ScriptedApi(
+        {"status": "success", "full": True, "seq": 3, "data": [_obj(1, "a")]},
+        failure,
+        {"status": "success", "full": True, "seq": 1, "data": [_obj(1, "a")]},
+    )
+    tracker = WorldDeltaTracker(api)
+    tracker.fetch()
+    with pytest.raises(Exception):
+        tracker.fetch()
+    tracker.fetch()
+    assert [call[1] for call in api.calls] == [-1, 3, -1]
+
+
+def test_reset_clears_objects_and_seq():
+    api = ScriptedApi(
+        {"status": "success", "full": True, "seq": 4, "data": [_obj(1, "a")]},
+        {"status": "success", "full": True, "seq": 1, "data": []},
+    )
+    tracker = WorldDeltaTracker(api)
+    tracker.fetch()
+    tracker.reset()
+    assert tracker.objects == {}
+    assert tracker.fetch()["data"] == []
+    assert api.calls[1][1] == -1
@@ -0,0 +1,60 @@
+from world_state import Player, WorldObject, WorldSnapshot, WorldState
+
+
+MONSTER = {"objectKey": 12345678901234567, "type": 6, "name": "哥布林", "x": 3, "y": 4,
+           "curHP": 5, "maxHP": 10, "attackMe": 1, "buff": [{"skillID": 1, "remainTime": 2}]}
+
+
+def test_world_object_fields():
+    obj = WorldObject(MONSTER)
+    assert obj.key == "12345678901234567"
+    assert (obj.type, obj.name, obj.x, obj.y, obj.cur_hp, obj.max_hp) == (6, "哥布林", 3, 4, 5, 10)
+    assert obj.attack_me is True
+    assert obj.clan_name is None
+    assert obj.raw is MONSTER
+
+
+def test_world_object_distance_without_coordinates_is_zero():
+    assert WorldObject(MONSTER).distance(0, 0) == 5
+    assert WorldObject({"objectKey": 1}).distance(0, 0) == 0
+    assert WorldObject(MONSTER).distance(None, 0) == 0
+
+
+def test_player_reads_nested_or_top_level_fields():
+    nested = Player({"status": "success", "zone": 2, "data": {"worldX": 7, "worldY": 8, "curHP": 1}})
+    assert (nested.x, nested.y, nested.zone, nested.cur_hp) == (7, 8, 2, 1)
+    flat = Player({"x": 1, "y": 2, "mapName": "說話之島"})
+    assert (flat.x, flat.y, flat.map_name) == (1, 2, "說話之島")
+    assert flat.has_position
+    assert not Player({"data": {}}).has_position
+
+
+def test_snapshot_splits_by_type_and_finds_by_key():
+    world = {"status": "success", "data": [MONSTER, {"objectKey": 2, "type": 3}, {"objectKey": 3, "type": 2},
+                                           {"objectKey": 4, "type": 6}]}
+    snapshot = WorldSnapshot({"data": {"x": 0, "y": 0}}, world)
+    assert [obj.key for obj in snapshot.monsters] == ["12345678901234567", "4"]
+    assert [obj.key for obj in snapshot.items] == ["2"]
+    assert [obj.key for obj in snapshot.players] == ["3"]
+    assert snapshot.find(12345678901234567) is snapshot.monsters[0]
+    assert snapshot.find("2") is snapshot.items[0]
+    assert snapshot.find(99) is None
+
+
+def test_state_reuses_snapshot_until_cache_changes():
+    state = WorldState(api=None, max_age=60)
+    state.update(201, {"status": "success", "data": {"x": 0, "y": 0}})
+    state.update(203, {"status": "success", "data": [MONSTER]})
+    first = state.snapshot()
+    assert state.snapshot() is first
+    state.update(203, {"status": "success", "data": []})
+    second = state.snapshot()
+    assert second is not first
+    assert second.objects == ()
+
+
+def test_state_snapshot_requires_successful_results():
+    state = WorldState(api=None, max_age=60)
+    state.update(201, {"status": "success", "data": {}})
+    state.update(203, {"status": "error", "message": "not ready"})
+    assert state.snapshot() is None
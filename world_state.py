@@ -0,0 +1,650 @@
+import asyncio
+import math
+import struct
+import threading
+import time
+
+import json_codec
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _normalize_key(key):
+    """
+    objectKey 統一轉成整數: 16 位以上的 objectKey 在 agent 端以字串保存精度，
+    視 JSON 解析方式可能為字串或整數，被移除的 objectKey 則一律為字串。
+    """
+    if isinstance(key, str) and key.lstrip("-").isdigit():
+        return int(key)
+    return key
+
+
+def _parse_info(raw):
+    """解析 get_info 的原始字串；空字串回傳 None，非 JSON (agent 端的錯誤訊息) 轉成 error 結構。"""
+    if not raw:
+        return None
+    try:
+        return json_codec.loads(raw)
+    except ValueError:
+        return {"status": "error", "message": str(raw)}
+
+
+_PACKED_MISSING_32 = -2 ** 31
+_PACKED_MISSING_64 = -2 ** 63
+_PACKED_INT64_FIELDS = ("objectKey", "playerID", "earthObjectID", "attackID")
+_PACKED_INT32_FIELDS = ("type", "x", "y", "curHP", "maxHP")
+
+
+def decode_packed_world(data):
+    """
+    解析 agent 以 encoding="packed" 推送的二進位快照 (格式見 LineageM.py 的 packWorld)，
+    回傳與 json.loads(get_info(203)) 相同結構的 dict。
+
+    各欄以 memoryview.cast 直接讀取，不複製緩衝區。cast 使用本機位元組順序，
+    Android (ARM) 與 PC (x86) 皆為 little-endian。
+    缺少的欄位不會出現在物件中，物件只包含打包的欄位 (沒有 clanName 等)。
+    """
+    mv = memoryview(data)
+    version, count, buff_total, name_len = struct.unpack_from("<4i", mv, 0)
+    if version != 1:
+        return {"status": "error", "message": f"不支援的打包版本: {version}"}
+
+    offset32 = 16 + 32 * count
+    offset_buff = offset32 + 28 * count
+    offset_flag = offset_buff + 8 * buff_total
+    offset_name = offset_flag + count
+
+    cols64 = mv[16:offset32].cast("q")
+    cols32 = mv[offset32:offset_buff].cast("i")
+    buffs = mv[offset_buff:offset_flag].cast("i")
+    flags = mv[offset_flag:offset_name]
+    names = str(mv[offset_name:offset_name + name_len], "utf-8").split("\0") if name_len else []
+
+    objects = []
+    b = 0
+    for i in range(count):
+        obj = {}
+        for col, field in enumerate(_PACKED_INT64_FIELDS):
+            value = cols64[col * count + i]
+            if value != _PACKED_MISSING_64:
+                obj[field] = value
+        for col, field in enumerate(_PACKED_INT32_FIELDS):
+            value = cols32[col * count + i]
+            if value != _PACKED_MISSING_32:
+                obj[field] = value
+        name_idx = cols32[5 * count + i]
+        if name_idx >= 0:
+            obj["name"] = names[name_idx]
+        buff_count = cols32[6 * count + i]
+        obj["buff"] = [{"skillID": buffs[k], "remainTime": buffs[k + 1]} for k in range(b, b + 2 * buff_count, 2)]
+        b += 2 * buff_count
+        obj["attackMe"] = bool(flags[i])
+        objects.append(obj)
+    return {"status": "success", "data": objects}
+
+
+class WorldObject:
+    """
+    WorldObject 類別 - 指令 203 中一個周圍物件的精簡模型
+
+    以 __slots__ 儲存常用欄位，取代迴圈中反覆的 dict.get()；缺少的欄位為 None (attack_me 為 False)。
+    key 為 str(objectKey)，可直接傳給 set_target 等 RPC 或作為忽略清單的鍵。
+    raw 保留原始 dict，需要其他欄位 (buff 等) 時使用，只能讀取。
+    """
+
+    __slots__ = ("object_key", "key", "type", "name", "x", "y", "cur_hp", "max_hp", "attack_me",
+                 "clan_name", "player_id", "earth_object_id", "attack_id", "raw")
+
+    def __init__(self, obj):
+        get = obj.get
+        self.object_key = get("objectKey")
+        self.key = str(self.object_key)
+        self.type = get("type")
+        self.name = get("name")
+        self.x = get("x")
+        self.y = get("y")
+        self.cur_hp = get("curHP")
+        self.max_hp = get("maxHP")
+        self.attack_me = bool(get("attackMe"))
+        self.clan_name = get("clanName")
+        self.player_id = get("playerID")
+        self.earth_object_id = get("earthObjectID")
+        self.attack_id = get("attackID")
+        self.raw = obj
+
+    def distance(self, x, y):
+        """與 (x, y) 的直線距離；任一方缺少座標時為 0 (與原本 m.get("x", player_x) 的預設相同)。"""
+        if self.x is None or self.y is None or x is None or y is None:
+            return 0.0
+        return math.hypot(self.x - x, self.y - y)
+
+    def __repr__(self):
+        return f"WorldObject({self.key}, {self.name!r}, type={self.type}, ({self.x}, {self.y}))"
+
+
+class Player:
+    """
+    Player 類別 - 指令 201 (玩家自身資訊) 的精簡模型
+
+    欄位位於 data 之下或直接位於最上層皆可，座標另接受 worldX / worldY。
+    raw 為實際讀取欄位的 dict，只能讀取。
+    """
+
+    __slots__ = ("x", "y", "map_name", "map_id", "zone", "cur_hp", "max_hp", "cur_mp", "max_mp",
+                 "target_type", "raw")
+
+    def __init__(self, info):
+        data = info.get("data")
+        data = data if isinstance(data, dict) else info
+        get = data.get
+        self.x = get("x", get("worldX"))
+        self.y = get("y", get("worldY"))
+        self.map_name = get("mapName")
+        self.map_id = get("mapId")
+        self.zone = get("zone", info.get("zone"))
+        self.cur_hp = get("curHP")
+        self.max_hp = get("maxHP")
+        self.cur_mp = get("curMP")
+        self.max_mp = get("maxMP")
+        self.target_type = get("targetType")
+        self.raw = data
+
+    @property
+    def has_position(self):
+        return self.x is not None and self.y is not None
+
+
+class WorldSnapshot:
+    """
+    WorldSnapshot 類別 - 同一時間點的玩家資訊 (201) 與周圍物件 (203)
+
+    由 WorldState.snapshot() 對每一份快取結果只建立一次，所有迴圈共用同一個物件，只能讀取。
+    objects 依原始順序保存所有物件；monsters / items / players 為依 type (6 / 3 / 2) 分類的子集合。
+    """
+
+    __slots__ = ("timestamp", "player", "objects", "monsters", "items", "players", "_monster_columns")
+
+    def __init__(self, player_info, world_info, timestamp=None):
+        self.timestamp = timestamp or time.time()
+        self.player = Player(player_info)
+        self.objects = tuple(WorldObject(obj) for obj in world_info.get("data", []))
+        self.monsters = tuple(obj for obj in self.objects if obj.type == 6)
+        self.items = tuple(obj for obj in self.objects if obj.type == 3)
+        self.players = tuple(obj for obj in self.objects if obj.type == 2)
+        self._monster_columns = None
+
+    def monster_columns(self):
+        """monsters 的 ObjectColumns (第一次呼叫時建立，之後共用)；沒有安裝 NumPy 時回傳 None。"""
+        if np is None:
+            return None
+        if self._monster_columns is None:
+            self._monster_columns = ObjectColumns(self.monsters)
+        return self._monster_columns
+
+    def find(self, key):
+        """以 objectKey (字串或整數) 尋找物件，找不到回傳 None。"""
+        key = str(key)
+        return next((obj for obj in self.objects if obj.key == key), None)
+
+
+class ObjectColumns:
+    """
+    ObjectColumns 類別 - 一組 WorldObject 的欄位陣列 (NumPy)，供向量化計算距離與篩選
+
+    x / y 為 float64 (缺少座標為 nan)，cur_hp 為 int64 (缺少為 0)，attack_me 為 bool；
+    名稱以 name_code (索引至 names) 表示，名單比對只需對不重複的名稱各比對一次。
+    陣列順序與 objects 相同，只能讀取。
+    """
+
+    __slots__ = ("objects", "x", "y", "cur_hp", "attack_me", "name_code", "names")
+
+    def __init__(self, objects):
+        self.objects = objects
+        nan = float("nan")
+        self.x = np.array([nan if obj.x is None else obj.x for obj in objects], dtype=np.float64)
+        self.y = np.array([nan if obj.y is None else obj.y for obj in objects], dtype=np.float64)
+        self.cur_hp = np.array([obj.cur_hp or 0 for obj in objects], dtype=np.int64)
+        self.attack_me = np.array([obj.attack_me for obj in objects], dtype=bool)
+        codes = {}
+        self.name_code = np.array([codes.setdefault(obj.name, len(codes)) for obj in objects], dtype=np.int32)
+        self.names = list(codes)
+
+    def distances(self, x, y):
+        """與 (x, y) 的距離陣列；缺少座標的物件距離為 0 (與 WorldObject.distance 相同)。"""
+        return np.nan_to_num(np.hypot(self.x - x, self.y - y), nan=0.0)
+
+    def name_mask(self, names):
+        """名稱在 names (set / list / TargetMatcher) 中的物件為 True。"""
+        codes = [code for code, name in enumerate(self.names) if name in names]
+        return np.isin(self.name_code, codes)
+
+
+class MonsterGeometry:
+    """
+    MonsterGeometry 類別 - 一輪迴圈中所有怪物與玩家的距離與黑名單標記，只計算一次
+
+    有安裝 NumPy 時以 ObjectColumns 向量化計算，否則以 Python 迴圈計算一次；
+    之後的範圍計數、攻擊者與篩選都使用同一份結果，不再重複計算距離。
+
+    參數:
+    snapshot: WorldSnapshot
+    blacklist: set 或 TargetMatcher  黑名單怪物名稱 (以 in 判斷)
+    """
+
+    def __init__(self, snapshot, blacklist):
+        player = snapshot.player
+        self.monsters = snapshot.monsters
+        columns = snapshot.monster_columns()
+        if columns is not None:
+            self._distances = columns.distances(player.x, player.y)
+            self._blocked = columns.name_mask(blacklist)
+            self._attack_me = columns.attack_me
+            self.distances = self._distances.tolist()
+            self.blocked = self._blocked.tolist()
+            self.blacklist_count = int(np.count_nonzero(self._blocked))
+        else:
+            self._distances = None
+            self.distances = [m.distance(player.x, player.y) for m in self.monsters]
+            self.blocked = [m.name in blacklist for m in self.monsters]
+            self.blacklist_count = sum(self.blocked)
+
+    def count_within(self, radius, include_blacklisted=False):
+        """距離玩家 radius 以內的怪物數量 (預設排除黑名單)。"""
+        if self._distances is not None:
+            mask = self._distances <= radius
+            if not include_blacklisted:
+                mask &= ~self._blocked
+            return int(np.count_nonzero(mask))
+        return sum(1 for d, b in zip(self.distances, self.blocked) if d <= radius and (include_blacklisted or not b))
+
+    def attackers(self):
+        """正在攻擊玩家且不在黑名單中的怪物，回傳 [(怪物, 距離)]。"""
+        if self._distances is not None:
+            indices = np.flatnonzero(self._attack_me & ~self._blocked).tolist()
+        else:
+            indices = [i for i, m in enumerate(self.monsters) if m.attack_me and not self.blocked[i]]
+        return [(self.monsters[i], self.distances[i]) for i in indices]
+
+    def within(self, radius, include_blacklisted=False):
+        """距離玩家 radius 以內的怪物，回傳 [(怪物, 距離)]。"""
+        if self._distances is not None:
+            mask = self._distances <= radius
+            if not include_blacklisted:
+                mask &= ~self._blocked
+            indices = np.flatnonzero(mask).tolist()
+        else:
+            indices = [i for i, d in enumerate(self.distances) if d <= radius and (include_blacklisted or not self.blocked[i])]
+        return [(self.monsters[i], self.distances[i]) for i in indices]
+
+
+class SpatialGrid:
+    """
+    SpatialGrid 類別 - 以均勻網格索引一組 WorldObject，計算某個物件周圍的物件數量
+
+    物件依座標放入邊長 cell_size 的格子，查詢半徑 radius 時只檢查涵蓋該範圍的相鄰格子
+    (cell_size 等於 radius 時為 3x3 格)，不必與所有物件逐一比較距離。
+    缺少座標的物件與任何物件的距離視為 0 (與 WorldObject.distance 相同)，一律計入。
+
+    參數:
+    objects: 序列 of WorldObject
+    cell_size: float         格子邊長，通常使用查詢時的半徑
+    """
+
+    def __init__(self, objects, cell_size):
+        self.objects = objects
+        self.cell_size = max(float(cell_size), 1.0)
+        self.cells = {}
+        self.unplaced = [] # 缺少座標的物件
+        for obj in objects:
+            if obj.x is None or obj.y is None:
+                self.unplaced.append(obj)
+            else:
+                cell = (int(obj.x // self.cell_size), int(obj.y // self.cell_size))
+                self.cells.setdefault(cell, []).append(obj)
+
+    def count_within(self, obj, radius):
+        """與 obj 距離 radius 以內的其他物件數量 (不含 obj 本身)。"""
+        if obj.x is None or obj.y is None:
+            return sum(1 for other in self.objects if other is not obj)
+        x, y = obj.x, obj.y
+        cx, cy = int(x // self.cell_size), int(y // self.cell_size)
+        span = int(math.ceil(radius / self.cell_size))
+        count = sum(1 for other in self.unplaced if other is not obj)
+        for gx in range(cx - span, cx + span + 1):
+            for gy in range(cy - span, cy + span + 1):
+                for other in self.cells.get((gx, gy), ()):
+                    if other is not obj and math.hypot(other.x - x, other.y - y) <= radius:
+                        count += 1
+        return count
+
+
+class WorldDeltaTracker:
+    """
+    WorldDeltaTracker 類別 - 透過 agent 的 getWorldDelta 增量同步指令 203 (周圍物件)
+
+    agent 只回傳自上次序號以來 新增/變更/移除 的物件 (以 objectKey 為鍵)，
+    本類別在本地重建完整的物件列表。序號不同步時 agent 會自動回傳完整快照。
+
+    同一個實例的所有執行緒應共用同一個 tracker (同一個 channel)，
+    序號才能與 agent 端保持一致。
+
+    參數:
+    api: RPC 介面 (script.exports_sync)
+    channel: str             agent 端的頻道名稱，不同頻道各自保留上一次的快照
+    options: dict            agent 端的過濾條件 (types / fields)，預設 None 表示完整物件
+    """
+
+    def __init__(self, api, channel="default", options=None):
+        self.api = api
+        self.channel = channel
+        self.options = options
+        self.seq = -1
+        self.objects = {}
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.seq = -1
+            self.objects = {}
+
+    def fetch(self):
+        """取得目前的周圍物件，回傳與 json.loads(get_info(203)) 相同結構的 dict。"""
+        _, world = self.fetch_with([])
+        return world
+
+    def fetch_with(self, extra_codes):
+        """
+        在同一次 RPC 中取得周圍物件與其他指令的結果。
+
+        Returns:
+            tuple: (extra_results: list[str], world: dict)
+                   extra_results 與 extra_codes 順序相同，內容為 get_info 的原始字串
+        """
+        with self.lock:
+            try:
+                raw = self.api.get_world_delta(self.channel, self.seq, list(extra_codes), self.options)
+                payload = json_codec.loads(raw)
+            except Exception:
+                # 回應遺失或解析失敗時，下一次要求完整快照
+                self.seq = -1
+                raise
+            return self._apply(payload)
+
+    async def fetch_with_async(self, extra_codes):
+        """
+        fetch_with 的協程版本 (api 為 AsyncRpcClient)。
+        等待回應時不持有 self.lock；呼叫端須確保同一個 tracker 同一時間只有一個查詢，且不與 fetch_with 混用。
+        """
+        try:
+            raw = await self.api.get_world_delta(self.channel, self.seq, list(extra_codes), self.options)
+            payload = json_codec.loads(raw)
+        except Exception:
+            self.seq = -1
+            raise
+        with self.lock:
+            return self._apply(payload)
+
+    def _apply(self, payload):
+        """套用 get_world_delta 的回應，回傳 (extra_results, world)。呼叫時須持有 self.lock。"""
+        extra = payload.pop("extra", [])
+        if payload.get("status") != "success":
+            self.seq = -1
+            return extra, payload
+
+        if payload.get("full") and payload.get("seq", -1) < 0:
+            # agent 無法以 objectKey 追蹤 (有物件缺少 objectKey)，直接使用完整列表
+            self.seq = -1
+            self.objects = {}
+            return extra, {"status": "success", "data": payload.get("data", [])}
+
+        # 三種路徑都以相同方式正規化 objectKey，否則同一物件可能以字串與整數各存一份
+        if payload.get("full"):
+            self.objects = {_normalize_key(obj.get("objectKey")): obj for obj in payload.get("data", [])}
+        else:
+            for key in payload.get("removed", []):
+                self.objects.pop(_normalize_key(key), None)
+            for obj in payload.get("added", []):
+                self.objects[_normalize_key(obj.get("objectKey"))] = obj
+            for obj in payload.get("changed", []):
+                self.objects[_normalize_key(obj.get("objectKey"))] = obj
+        self.seq = payload.get("seq", -1)
+
+        return extra, {"status": "success", "data": list(self.objects.values())}
+
+
+class WorldStream:
+    """
+    WorldStream 類別 - 接收 agent 主動推送 (startWorldStream) 的周圍物件快照
+
+    agent 在遊戲進程內定時查詢 203 (與 extra_codes)，透過 send() 推送給 Python，
+    由 on_message_display 轉交 on_frame。各個迴圈以 wait_next 等待新的一幀，
+    不再各自呼叫 get_info，所有迴圈看到的也是同一份快照。
+
+    agent 端的推送以參考計數控制: 第一個 acquire 時啟動，最後一個 release 時停止。
+
+    參數:
+    api: RPC 介面 (script.exports_sync)
+    interval_ms: int         agent 端的查詢間隔 (毫秒)
+    extra_codes: list        每一幀一併查詢的其他指令 (預設 201 玩家自身資訊)
+    state: WorldState        若提供，每一幀同時寫入該快取
+    encoding: str            "json" 或 "packed" (203 以二進位打包傳送，見 decode_packed_world)
+    """
+
+    def __init__(self, api, interval_ms=200, extra_codes=(201,), state=None, encoding="json"):
+        self.api = api
+        self.interval_ms = interval_ms
+        self.extra_codes = list(extra_codes)
+        self.state = state
+        self.encoding = encoding
+        self.seq = 0
+        self.extra = []
+        self.world = None
+        self.timestamp = 0
+        self.subscribers = 0
+        self.cond = threading.Condition()
+        # 啟動/停止推送的 RPC 不可在 cond 內呼叫: on_frame 由 Frida 的訊息執行緒呼叫，會造成互相等待
+        self.sub_lock = threading.Lock()
+
+    def acquire(self):
+        with self.sub_lock:
+            if self.subscribers == 0:
+                self.api.start_world_stream(self.interval_ms, self.extra_codes, None, self.encoding)
+            self.subscribers += 1
+
+    def release(self):
+        with self.sub_lock:
+            if self.subscribers <= 0:
+                return
+            self.subscribers -= 1
+            if self.subscribers == 0:
+                try:
+                    self.api.stop_world_stream()
+                except Exception:
+                    pass
+
+    def on_frame(self, payload, data=None):
+        """處理 agent 推送的一幀 ({type: "world", seq, world, extra})，打包格式時 203 位於 data。"""
+        raw = payload.get("world")
+        try:
+            if payload.get("encoding") == "packed" and data:
+                world = decode_packed_world(data)
+            else:
+                world = json_codec.loads(raw)
+        except (TypeError, ValueError, struct.error, IndexError):
+            world = {"status": "error", "message": str(raw)}
+        extra = payload.get("extra", [])
+        now = time.time()
+        if self.state is not None:
+            self.state.update(203, world, now)
+            for code, raw_extra in zip(self.extra_codes, extra):
+                self.state.update(code, _parse_info(raw_extra), now)
+        with self.cond:
+            # 使用本地序號: agent 每次重新啟動推送時 seq 從頭計算，不能用來判斷是否為新的一幀
+            self.seq += 1
+            self.extra = extra
+            self.world = world
+            self.timestamp = now
+            self.cond.notify_all()
+
+    def latest(self):
+        """回傳目前最新的一幀 (seq, extra, world)，尚未收到任何快照時 world 為 None。"""
+        with self.cond:
+            return self.seq, self.extra, self.world
+
+    def wait_next(self, last_seq, timeout=1.0):
+        """
+        等待比 last_seq 更新的一幀。若已有更新的幀則立即回傳。
+
+        Returns:
+            tuple: (seq, extra, world)
+                   extra 與 extra_codes 順序相同，為 get_info 的原始字串；
+                   逾時仍無新幀時 world 為 None
+        """
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq != last_seq and self.world is not None, timeout):
+                return last_seq, [], None
+            return self.seq, self.extra, self.world
+
+    def close(self):
+        with self.cond:
+            self.world = None
+            self.cond.notify_all()
+
+
+class WorldState:
+    """
+    WorldState 類別 - 每個實例共用的資訊快取 (201/202/203/206/218)
+
+    各功能迴圈透過 get / get_many 讀取已解析的結果，結果在 max_age 秒內直接重用，
+    過期的指令才合併成一次 RPC 重新取得 (203 走增量快照)。
+    若 WorldStream 正在推送，每一幀會直接寫入快取，203/201 不必另外查詢。
+
+    回傳的 dict 由所有迴圈共用，呼叫端只能讀取，不可修改內容。
+
+    rpc_hub 上的協程使用 get_async / get_many_async (需提供 async_api)，與執行緒共用同一份快取，
+    查詢時以獨立的增量頻道向 agent 查詢，不會與執行緒互相等待。
+
+    參數:
+    api: RPC 介面 (script.exports_sync)
+    max_age: float           快取有效秒數
+    tracker: WorldDeltaTracker  203 使用的增量同步 (預設建立獨立頻道)
+    async_api: AsyncRpcClient   協程查詢使用的非同步介面
+    """
+
+    def __init__(self, api, max_age=0.3, tracker=None, async_api=None):
+        self.api = api
+        self.max_age = max_age
+        self.entries = {}
+        self.lock = threading.Lock()
+        # 同一時間只讓一個執行緒向 agent 查詢，其他執行緒等待後直接使用新結果
+        self.fetch_lock = threading.Lock()
+        self.tracker = tracker or WorldDeltaTracker(api, channel="state")
+        self.async_api = async_api
+        self.async_tracker = WorldDeltaTracker(async_api, channel="state-async")
+        self.async_fetch_lock = None # 協程的 fetch_lock (asyncio.Lock)，第一次在事件迴圈中查詢時建立
+        self.snapshot_cache = None # (201 結果, 203 結果, WorldSnapshot)
+
+    def update(self, code, data, timestamp=None):
+        with self.lock:
+            self.entries[code] = (timestamp or time.time(), data)
+
+    def invalidate(self, code=None):
+        with self.lock:
+            if code is None:
+                self.entries = {}
+            else:
+                self.entries.pop(code, None)
+
+    def _lookup(self, codes, max_age, results):
+        now = time.time()
+        missing = []
+        with self.lock:
+            for code in codes:
+                entry = self.entries.get(code)
+                if entry and now - entry[0] <= max_age:
+                    results[code] = entry[1]
+                elif code not in missing:
+                    missing.append(code)
+        return missing
+
+    def get(self, code, max_age=None):
+        """取得單一指令的解析結果 (dict)，agent 未回傳資料時為 None。"""
+        return self.get_many([code], max_age)[0]
+
+    def get_many(self, codes, max_age=None):
+        """
+        取得多個指令的解析結果，回傳 list，順序與 codes 相同。
+        max_age 可覆寫預設的快取有效秒數 (0 表示強制重新查詢)。
+        """
+        if max_age is None:
+            max_age = self.max_age
+        results = {}
+        if self._lookup(codes, max_age, results):
+            with self.fetch_lock:
+                # 等待鎖的期間其他執行緒可能已經更新快取
+                missing = self._lookup(codes, max_age, results)
+                if missing:
+                    now = time.time()
+                    if 203 in missing:
+                        others = [code for code in missing if code != 203]
+                        raw_list, world = self.tracker.fetch_with(others)
+                        fetched = dict(zip(others, [_parse_info(raw) for raw in raw_list]))
+                        fetched[203] = world
+                    else:
+                        raw_list = self.api.get_info_batch(missing)
+                        fetched = dict(zip(missing, [_parse_info(raw) for raw in raw_list]))
+                    with self.lock:
+                        for code, data in fetched.items():
+                            self.entries[code] = (now, data)
+                    results.update(fetched)
+        return [results.get(code) for code in codes]
+
+    async def get_async(self, code, max_age=None):
+        """get 的協程版本。"""
+        return (await self.get_many_async([code], max_age))[0]
+
+    async def get_many_async(self, codes, max_age=None):
+        """get_many 的協程版本，過期的指令以 async_api 查詢 (只能在同一個事件迴圈中呼叫)。"""
+        if max_age is None:
+            max_age = self.max_age
+        results = {}
+        if self._lookup(codes, max_age, results):
+            if self.async_fetch_lock is None:
+                self.async_fetch_lock = asyncio.Lock()
+            async with self.async_fetch_lock:
+                missing = self._lookup(codes, max_age, results)
+                if missing:
+                    now = time.time()
+                    if 203 in missing:
+                        others = [code for code in missing if code != 203]
+                        raw_list, world = await self.async_tracker.fetch_with_async(others)
+                        fetched = dict(zip(others, [_parse_info(raw) for raw in raw_list]))
+                        fetched[203] = world
+                    else:
+                        raw_list = await self.async_api.get_info_batch(missing)
+                        fetched = dict(zip(missing, [_parse_info(raw) for raw in raw_list]))
+                    with self.lock:
+                        for code, data in fetched.items():
+                            self.entries[code] = (now, data)
+                    results.update(fetched)
+        return [results.get(code) for code in codes]
+
+    def snapshot(self, max_age=None):
+        """
+        取得目前 201 與 203 組成的 WorldSnapshot；任一指令沒有成功的結果時回傳 None。
+        快取的結果未更新前重複呼叫會回傳同一個物件，不會重新建立。
+        """
+        player_info, world_info = self.get_many([201, 203], max_age)
+        if not player_info or not world_info:
+            return None
+        if player_info.get("status") != "success" or world_info.get("status") != "success":
+            return None
+        cached = self.snapshot_cache
+        if cached and cached[0] is player_info and cached[1] is world_info:
+            return cached[2]
+        snapshot = WorldSnapshot(player_info, world_info)
+        self.snapshot_cache = (player_info, world_info, snapshot)
+        return snapshot